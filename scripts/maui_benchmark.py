@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Benchmark the build scripts' own overhead against stub toolchains.
+
+Copies the repo into a scratch workspace, puts generated stub `dotnet`,
+`gradlew`, `nuget`, `xcrun`, `emulator` and `adb` executables in front of
+PATH and runs the `main` of maui_build, sdk_libs, maui_publish and maui_run
+there phase by phase. The stubs print realistic volumes of build output,
+report file-lock errors and write artifacts, so the numbers reflect the
+orchestration (output pumping, scheduling, sanitizing, cleaning) rather than
+the real toolchains. Runs on a plain Linux box.
+
+For every phase the wall time, CPU time, peak memory of the script process
+and its read/write syscalls are reported (all syscalls when strace is
+available).
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Left out of the workspace copy: VCS data and build state of the real repo
+WORKSPACE_IGNORE = shutil.ignore_patterns('.git', '.artifacts', 'artifacts_copy', 'global.json', '__pycache__', '*.nupkg')
+
+STUB_TOOLS = ['dotnet', 'nuget', 'xcrun', 'emulator', 'adb', 'open']
+
+# Runs `<module>.main` in the workspace and records the process' own resource
+# usage on exit. maui_publish.main reads sys.argv instead of taking argv.
+PHASE_RUNNER = r'''
+import json, os, sys
+module_name, result_path, argv = sys.argv[1], sys.argv[2], sys.argv[3:]
+sys.path.insert(0, os.path.join(os.getcwd(), 'scripts'))
+sys.argv = [module_name + '.py'] + argv
+code = 0
+try:
+    module = __import__(module_name)
+    code = module.main() if module_name == 'maui_publish' else module.main(argv)
+except SystemExit as e:
+    code = e.code if isinstance(e.code, int) else 1
+finally:
+    usage = {}
+    for proc_file in ('/proc/self/io', '/proc/self/status'):
+        try:
+            with open(proc_file) as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if key in ('syscr', 'syscw', 'VmHWM'):
+                        usage[key] = int(value.split()[0])
+        except OSError:
+            pass
+    with open(result_path, 'w') as f:
+        json.dump(usage, f)
+sys.exit(code or 0)
+'''
+
+STUB_SOURCE = r'''#!__PYTHON__
+# Stub toolchain for maui_benchmark.py; behaviour is picked by the name it is run as.
+import glob, json, os, plistlib, re, shutil, sys, time, zipfile
+
+ROOT = os.environ['BENCH_ROOT']
+STATE = os.environ['BENCH_STATE']
+OUTPUT_LINES = int(os.environ.get('BENCH_OUTPUT_LINES', '2000'))
+ARTIFACT_FILES = int(os.environ.get('BENCH_ARTIFACT_FILES', '20'))
+LOCK_ERRORS = int(os.environ.get('BENCH_LOCK_ERRORS', '0'))
+TOOL_DELAY = float(os.environ.get('BENCH_TOOL_DELAY', '0'))
+
+AARS = {
+    ':sdk-core:': 'sdk-core/build/libs/adjust-sdk-release.aar',
+    ':tests:test-library:': 'tests/test-library/build/libs/test-library-release.aar',
+    ':tests:test-options:': 'tests/test-options/build/outputs/aar/test-options-release.aar',
+    ':plugins:sdk-plugin-oaid:': 'plugins/sdk-plugin-oaid/build/libs/sdk-plugin-oaid.aar',
+    ':plugins:sdk-plugin-meta-referrer:': 'plugins/sdk-plugin-meta-referrer/build/libs/sdk-plugin-meta-referrer.aar',
+    ':plugins:sdk-plugin-google-lvl:': 'plugins/sdk-plugin-google-lvl/build/libs/sdk-plugin-google-lvl.aar',
+}
+
+def emit(name, lines):
+    out = sys.stdout
+    for i in range(lines):
+        if i % 50 == 0:
+            out.write('/src/%s/Platforms/Android/File%d.cs(12,5): warning CS0618: '
+                      "'Member' is obsolete: 'Use the new API instead' [/src/%s.csproj]\n" % (name, i, name))
+        else:
+            out.write('  %s -> Compiling %s/obj/Generated/File%d.g.cs (%d of %d)\n' % (name, name, i, i, lines))
+    out.flush()
+
+def write_file(path, size=4096):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+
+def take_lock_error():
+    """True for the first BENCH_LOCK_ERRORS builds of the whole benchmark run."""
+    counter = os.path.join(STATE, 'lock_errors')
+    try:
+        with open(counter) as f:
+            used = int(f.read() or 0)
+    except OSError:
+        used = 0
+    if used >= LOCK_ERRORS:
+        return False
+    with open(counter, 'w') as f:
+        f.write(str(used + 1))
+    return True
+
+def referenced_projects(csproj):
+    """Lower-cased names of `csproj` and every project it references."""
+    names = set()
+    pending = [csproj]
+    while pending:
+        path = pending.pop()
+        name = os.path.basename(path).replace('.csproj', '').lower()
+        if name in names:
+            continue
+        names.add(name)
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            continue
+        for reference in re.findall(r'<ProjectReference\s+Include="([^"]+)"', text):
+            pending.append(os.path.join(os.path.dirname(path), reference.replace('\\', '/')))
+    return names
+
+def declared_frameworks(csproj, prefix):
+    """The TargetFramework(s) of `csproj` that start with `prefix`, conditions ignored."""
+    try:
+        with open(csproj, encoding='utf-8') as f:
+            text = re.sub(r'<!--.*?-->', '', f.read(), flags=re.S)
+    except OSError:
+        return []
+    frameworks = []
+    for value in re.findall(r'<TargetFrameworks?(?:\s[^>]*)?>([^<]+)</TargetFrameworks?>', text):
+        for framework in value.split(';'):
+            framework = framework.strip()
+            if framework.startswith(prefix) and '$' not in framework and framework not in frameworks:
+                frameworks.append(framework)
+    return frameworks
+
+def net_prefix(args):
+    """TFM prefix of the .NET version a build targets: the sandbox, else the root global.json."""
+    for arg in args:
+        if arg.startswith('-p:ArtifactsSandbox='):
+            return arg.split('=', 1)[1] + '.'
+    try:
+        with open(os.path.join(ROOT, 'global.json')) as f:
+            return 'net%s.' % json.load(f)['sdk']['version'].split('.')[0]
+    except (OSError, ValueError, KeyError):
+        return 'net'
+
+def write_nuspec_outputs(csproj, config, args):
+    """Write the .artifacts files the nuspecs ship that this build produces."""
+    names = referenced_projects(csproj)
+    prefix = net_prefix(args)
+    for nuspec in glob.glob(os.path.join(ROOT, '*.nuspec')):
+        with open(nuspec, encoding='utf-8') as f:
+            sources = re.findall(r'<file\s+src="(\.artifacts/[^"]+)"', f.read())
+        for src in sources:
+            parts = src.split('/')
+            # .artifacts/{Project}/bin/{Config}/{TFM}/{File}
+            if len(parts) == 6 and parts[1].lower() in names and parts[3] == config and parts[4].startswith(prefix):
+                write_file(os.path.join(ROOT, *parts))
+
+def dotnet(args):
+    if args[:1] == ['--version']:
+        print('10.0.101')
+    elif args[:1] == ['--list-sdks']:
+        print('8.0.402 [/usr/share/dotnet/sdk]')
+        print('10.0.101 [/usr/share/dotnet/sdk]')
+    elif args[:1] == ['build'] and len(args) > 1:
+        csproj = args[1]
+        name = os.path.basename(csproj).replace('.csproj', '')
+        config = 'Debug'
+        for flag in ('--configuration', '-c'):
+            if flag in args:
+                config = args[args.index(flag) + 1]
+        time.sleep(TOOL_DELAY)
+        if '-t:Run' not in args and take_lock_error():
+            locked = os.path.join(ROOT, '.artifacts', name, 'obj', config, 'locked.dll')
+            write_file(locked, 16)
+            emit(name, OUTPUT_LINES // 2)
+            print("/src/%s.csproj : error MSB3027: Could not copy \"%s\" to \"%s\". The file is locked by: "
+                  "\"dotnet (1234)\" [/src/%s.csproj]" % (name, locked, locked, name))
+            print("/src/%s.csproj : error MSB3021: Unable to copy file \"%s\". The process cannot access the file "
+                  "'%s' because it is being used by another process. [/src/%s.csproj]" % (name, locked, locked, name))
+            return 1
+        emit(name, OUTPUT_LINES)
+        # Without -f every TFM the csproj declares for the .NET version is built
+        tfms = [args[args.index('-f') + 1]] if '-f' in args else declared_frameworks(csproj, net_prefix(args))
+        tfms = tfms or ['net8.0-android34.0']
+        tfm = tfms[0]
+        rid = ''
+        mirror_mode = 'copy'
+        for arg in args:
+            if arg.startswith('-p:RuntimeIdentifier='):
+                rid = arg.split('=', 1)[1]
+            elif arg.startswith('-p:ArtifactsMirrorMode='):
+                mirror_mode = arg.split('=', 1)[1]
+        # Directory.Build.props layout: {kind}/{Config}/{TFM}/, or {kind}/{RID}/{Config}/{TFM}/{RID}/
+        for kind, built_tfm in [(kind, built_tfm) for kind in ('bin', 'obj') for built_tfm in tfms]:
+            base = os.path.join(ROOT, '.artifacts', name, kind, rid, config, built_tfm, rid)
+            for i in range(ARTIFACT_FILES):
+                write_file(os.path.join(base, 'File%d.dll' % i))
+            # CopyArtifactsToVisibleFolder
+            if mirror_mode != 'none':
+                mirror = os.path.join(ROOT, 'artifacts_copy', 'build_' + kind, name, rid)
+                os.makedirs(mirror, exist_ok=True)
+                for i in range(ARTIFACT_FILES):
+                    src = os.path.join(base, 'File%d.dll' % i)
+                    dst = os.path.join(mirror, 'File%d.dll' % i)
+                    if os.path.lexists(dst):
+                        os.remove(dst)
+                    if mirror_mode == 'hardlink':
+                        os.link(src, dst)
+                    elif mirror_mode == 'symlink':
+                        os.symlink(src, dst)
+                    else:
+                        shutil.copy2(src, dst)
+        # Apps also get what maui_run.py run-matrix deploys
+        bin_dir = os.path.join(ROOT, '.artifacts', name, 'bin', rid, config, tfm, rid)
+        if name.startswith(('TestApp', 'ExampleApp')) and 'android' in tfm:
+            # A Debug (fast deployment) APK has no assemblies/ entries unless they are embedded
+            with zipfile.ZipFile(os.path.join(bin_dir, 'com.adjust.examples-Signed.apk'), 'w') as apk:
+                apk.writestr(zipfile.ZipInfo('AndroidManifest.xml', (2024, 1, 1, 0, 0, 0)), b'\0' * 4096)
+                apk.writestr(zipfile.ZipInfo('classes.dex', (2024, 1, 1, 0, 0, 0)), b'\0' * 64 * 1024)
+                if config == 'Release' or '-p:EmbedAssembliesIntoApk=true' in args:
+                    for i in range(ARTIFACT_FILES):
+                        apk.writestr(zipfile.ZipInfo('assemblies/File%d.dll' % i, (2024, 1, 1, 0, 0, 0)), b'\0' * 4096)
+        elif name.startswith(('TestApp', 'ExampleApp')) and 'ios' in tfm:
+            write_file(os.path.join(bin_dir, name + '.app', name), 64 * 1024)
+            with open(os.path.join(bin_dir, name + '.app', 'Info.plist'), 'wb') as f:
+                plistlib.dump({'CFBundleIdentifier': 'com.adjust.examples'}, f)
+        if not rid:
+            write_nuspec_outputs(csproj, config, args)
+        if '-t:Install' in args or '-t:Run' in args:
+            adb_target = [arg for arg in args if arg.startswith('-p:AdbTarget=-s ')]
+            record_install(adb_target[0].split(' ', 1)[1] if adb_target else None)
+        print('Build succeeded.')
+    return 0
+
+def gradlew(args):
+    time.sleep(TOOL_DELAY)
+    for task in args:
+        for prefix, output in AARS.items():
+            if task.startswith(prefix):
+                emit(task, OUTPUT_LINES // 4)
+                write_file(os.path.join(os.getcwd(), output), 64 * 1024)
+    print('BUILD SUCCESSFUL')
+    return 0
+
+def build_frameworks(args):
+    time.sleep(TOOL_DELAY)
+    emit('AdjustSdk', OUTPUT_LINES // 4)
+    if '-test' in args:
+        framework = os.path.join('sdk_distribution', 'test-static-framework-device', 'AdjustTestLibrary.framework')
+    else:
+        framework = os.path.join('sdk_distribution', 'xcframeworks-dynamic', 'AdjustSdk-iOS-tvOS-xcframework',
+                                 'AdjustSdk.xcframework')
+    for i in range(ARTIFACT_FILES):
+        write_file(os.path.join(os.getcwd(), framework, 'ios-arm64', 'File%d' % i))
+    return 0
+
+def nuget(args):
+    if args[:1] == ['pack'] and len(args) > 1:
+        with open(args[1], encoding='utf-8') as f:
+            nuspec = f.read()
+        package_id = re.search(r'<id>(.*?)</id>', nuspec).group(1)
+        version = re.search(r'<version>(.*?)</version>', nuspec).group(1)
+        emit(package_id, OUTPUT_LINES // 20)
+        output_dir = args[args.index('-OutputDirectory') + 1] if '-OutputDirectory' in args else '.'
+        with zipfile.ZipFile(os.path.join(output_dir, '%s.%s.nupkg' % (package_id, version)), 'w') as package:
+            package.writestr(os.path.basename(args[1]), nuspec)
+    return 0
+
+def xcrun(args):
+    if args[:1] == ['--version']:
+        print('xcrun version 70.')
+    elif args[:3] == ['simctl', 'list', 'devices'] and '--json' in args:
+        print(json.dumps({'devices': {'com.apple.CoreSimulator.SimRuntime.iOS-18-0': [
+            {'name': 'iPhone 15', 'udid': '5A3B1C2D-0000-4000-8000-000000000015', 'state': 'Booted'},
+            {'name': 'iPhone 16', 'udid': '5A3B1C2D-0000-4000-8000-000000000016', 'state': 'Shutdown'},
+        ]}}))
+    elif args[:3] == ['xctrace', 'list', 'devices']:
+        print('== Devices ==')
+        print('uPhone (26.1) (00008120-001645063C43A01E)')
+        print('== Simulators ==')
+        print('iPhone 15 Simulator (18.0) (5A3B1C2D-0000-4000-8000-000000000015)')
+    elif args[:2] == ['simctl', 'get_app_container']:
+        container = os.path.join(STATE, 'simulators', args[2], args[3] + '.app')
+        os.makedirs(container, exist_ok=True)
+        print(container)
+    return 0
+
+def running_emulators():
+    try:
+        with open(os.path.join(STATE, 'emulators.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_running_emulators(emulators):
+    with open(os.path.join(STATE, 'emulators.json'), 'w') as f:
+        json.dump(emulators, f)
+
+def emulator(args):
+    if '-list-avds' in args:
+        print('Pixel_5_API_34')
+        print('Pixel_7_API_35')
+    elif '-avd' in args:
+        # Booting from a snapshot is quicker than a cold boot
+        time.sleep(TOOL_DELAY * (1 if '-snapshot' in args else 5))
+        port = args[args.index('-port') + 1] if '-port' in args else '5554'
+        emulators = running_emulators()
+        emulators['emulator-' + port] = args[args.index('-avd') + 1]
+        save_running_emulators(emulators)
+    return 0
+
+def record_install(serial):
+    """Give the app on `serial` a new install stamp, reported as lastUpdateTime by dumpsys."""
+    path = os.path.join(STATE, 'installs.json')
+    try:
+        with open(path) as f:
+            installs = json.load(f)
+    except (OSError, ValueError):
+        installs = {}
+    installs[serial or 'emulator'] = str(time.time_ns())
+    with open(path, 'w') as f:
+        json.dump(installs, f)
+
+def install_stamp(serial):
+    try:
+        with open(os.path.join(STATE, 'installs.json')) as f:
+            return json.load(f).get(serial or 'emulator')
+    except (OSError, ValueError):
+        return None
+
+def adb(args):
+    serial = args[args.index('-s') + 1] if '-s' in args else None
+    if args[-1:] == ['devices']:
+        print('List of devices attached')
+        for running in running_emulators():
+            print('%s\tdevice' % running)
+    elif args[-3:] == ['emu', 'avd', 'name']:
+        print(running_emulators().get(serial, ''))
+        print('OK')
+    elif args[-2:] == ['emu', 'kill']:
+        emulators = running_emulators()
+        emulators.pop(serial, None)
+        save_running_emulators(emulators)
+    elif args[-5:-1] == ['emu', 'avd', 'snapshot', 'save']:
+        avd = running_emulators().get(serial, '')
+        os.makedirs(os.path.join(os.path.expanduser('~'), '.android', 'avd', avd + '.avd', 'snapshots', args[-1]),
+                    exist_ok=True)
+        print('OK')
+    elif args[-2:] == ['getprop', 'sys.boot_completed']:
+        print('1')
+    elif 'install' in args:
+        time.sleep(TOOL_DELAY)
+        record_install(serial)
+        print('Performing Streamed Install')
+        print('Success')
+    elif 'monkey' in args:
+        print('Events injected: 1')
+    elif args[-3:-1] == ['dumpsys', 'package']:
+        if install_stamp(serial):
+            print('    lastUpdateTime=%s' % install_stamp(serial))
+    elif args[-3:-1] == ['pm', 'path']:
+        print('package:/data/app/%s/base.apk' % args[-1])
+    elif 'run-as' in args and 'find' in args:
+        for i in range(ARTIFACT_FILES):
+            print('files/.__override__/arm64-v8a/File%d.dll' % i)
+    elif 'push' in args:
+        print('1 file pushed, 0 skipped.')
+    return 0
+
+def main(argv):
+    tool = os.path.basename(argv[0])
+    args = argv[1:]
+    if tool == 'benchstub.py':
+        tool, args = args[0], args[1:]
+    handlers = {'dotnet': dotnet, 'gradlew': gradlew, 'build_frameworks': build_frameworks,
+                'nuget': nuget, 'xcrun': xcrun, 'emulator': emulator, 'adb': adb}
+    handler = handlers.get(tool)
+    return handler(args) if handler else 0
+
+sys.exit(main(sys.argv))
+'''
+
+def make_executable(path):
+    st = os.stat(path)
+    os.chmod(path, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+def create_workspace(path):
+    """Copy the repo to `path` and install the stub toolchain into it."""
+    print('> Creating workspace in %s' % path)
+    shutil.copytree(ROOT, path, ignore=WORKSPACE_IGNORE, dirs_exist_ok=True)
+
+    stub_dir = os.path.join(path, '.bench', 'bin')
+    os.makedirs(stub_dir, exist_ok=True)
+    os.makedirs(os.path.join(path, '.bench', 'state'), exist_ok=True)
+    os.makedirs(os.path.join(path, '.bench', 'home', '.nuget', 'local'), exist_ok=True)
+    stub = os.path.join(stub_dir, 'benchstub.py')
+    with open(stub, 'w') as f:
+        f.write(STUB_SOURCE.replace('__PYTHON__', sys.executable))
+    make_executable(stub)
+    for tool in STUB_TOOLS:
+        os.symlink('benchstub.py', os.path.join(stub_dir, tool))
+
+    # sdk_libs runs gradlew and build_frameworks.sh from the native SDK checkouts
+    gradle_root = os.path.join(path, 'android_sdk', 'Adjust')
+    os.makedirs(gradle_root, exist_ok=True)
+    os.symlink(stub, os.path.join(gradle_root, 'gradlew'))
+    ios_scripts = os.path.join(path, 'ios_sdk', 'scripts')
+    os.makedirs(ios_scripts, exist_ok=True)
+    with open(os.path.join(ios_scripts, 'build_frameworks.sh'), 'w') as f:
+        f.write('exec "%s" build_frameworks "$@"\n' % stub)
+    return stub_dir
+
+def populate_artifacts(path, files_per_dir):
+    """Create a synthetic .artifacts tree like the one a full build leaves behind."""
+    artifacts = os.path.join(path, '.artifacts')
+    projects = set()
+    for dirpath, _, filenames in os.walk(path):
+        if os.sep + '.' in dirpath[len(path):]:
+            continue
+        projects.update(name[:-len('.csproj')] for name in filenames if name.endswith('.csproj'))
+    count = 0
+    for project in sorted(projects):
+        for kind in ('bin', 'obj'):
+            for config in ('Debug', 'Release'):
+                base = os.path.join(artifacts, project, kind, config, 'net8.0-android34.0')
+                os.makedirs(base, exist_ok=True)
+                for i in range(files_per_dir):
+                    with open(os.path.join(base, 'File%d.xml' % i), 'w') as f:
+                        f.write('<?xml version="1.0"?><root/>')
+                    count += 1
+        os.makedirs(os.path.join(artifacts, project, 'obj', 'Debug', 'actool', 'cache'), exist_ok=True)
+    print('> Populated %s with %d files across %d projects' % (artifacts, count, len(projects)))
+
+def phases(selected):
+    """(name, module, argv, prepare_artifacts) for each benchmark phase."""
+    all_phases = [
+        ('build-clean', 'maui_build', ['clean', 'net8'], True),
+        ('build-cold', 'maui_build', ['sdk', 'net8', 'debug', '--no-cache'], False),
+        ('build-cached', 'maui_build', ['sdk', 'net8', 'debug'], False),
+        ('build-parallel', 'maui_build', ['all', 'net8', 'debug', '-j', '4', '--no-cache'], True),
+        ('build-sandbox', 'maui_build', ['bindings', 'debug', '--sandbox', '--no-cache'], False),
+        ('build-hardlink', 'maui_build', ['sdk', 'net8', 'debug', '--no-cache', '--mirror', 'hardlink'], False),
+        ('build-reflink', 'maui_build', ['sdk', 'net8', 'debug', '--no-cache', '--mirror', 'reflink'], False),
+        ('build-view', 'maui_build', ['sdk', 'net8', 'debug', '--no-cache', '--mirror', 'view'], False),
+        ('libs', 'sdk_libs', ['build', 'core', 'test', 'plugins'], False),
+        ('libs-batched', 'sdk_libs', ['build', 'core', 'test', 'plugins', '--batch-gradle'], False),
+        ('publish', 'maui_publish', ['all', 'all', '--build-missing'], False),
+        ('run-android', 'maui_run', ['run-android', 'example'], False),
+        ('run-ios', 'maui_run', ['run-ios', 'example'], False),
+        ('run-android-fast', 'maui_run', ['run-android', 'example', '--fast'], False),
+        ('run-ios-fast', 'maui_run', ['run-ios', 'example', '--fast'], False),
+        ('emulators-warm', 'maui_run', ['emulators', 'warm', '-n', '3', '--avd', 'Pixel_5_API_34',
+                                        '--avd', 'Pixel_7_API_35'], False),
+        ('run-matrix', 'maui_run', ['run-matrix', '--avd', 'Pixel_5_API_34', '--avd', 'Pixel_7_API_35',
+                                    '--ios-sim', 'iPhone 15', '--ios-sim', 'iPhone 16'], False),
+    ]
+    if not selected:
+        return all_phases
+    unknown = set(selected) - {name for name, *_ in all_phases}
+    if unknown:
+        print('Unknown phase(s): %s' % ', '.join(sorted(unknown)))
+        sys.exit(1)
+    return [phase for phase in all_phases if phase[0] in selected]
+
+def run_phase(workspace, stub_dir, name, module, argv, env, log_file):
+    result_path = os.path.join(workspace, '.bench', 'state', 'usage.json')
+    cmd = [sys.executable, '-c', PHASE_RUNNER, module, result_path, *argv]
+    strace_path = None
+    if shutil.which('strace'):
+        strace_path = os.path.join(workspace, '.bench', 'state', 'strace.txt')
+        cmd = ['strace', '-f', '-c', '-o', strace_path, *cmd]
+
+    log_file.write('===== %s: %s %s\n' % (name, module, ' '.join(argv)))
+    log_file.flush()
+    start = time.monotonic()
+    process = subprocess.Popen(cmd, cwd=workspace, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.monotonic() - start
+
+    usage = {}
+    if os.path.exists(result_path):
+        with open(result_path) as f:
+            usage = json.load(f)
+        os.remove(result_path)
+    syscalls = None
+    if strace_path and os.path.exists(strace_path):
+        with open(strace_path) as f:
+            total = re.search(r'^\s*100\.00\s+\S+\s+\S+\s+\S+\s+(\d+)', f.read(), re.MULTILINE)
+        syscalls = int(total.group(1)) if total else None
+
+    return {
+        'phase': name,
+        'command': '%s %s' % (module, ' '.join(argv)),
+        'exit_code': process.returncode,
+        'wall_s': round(wall, 3),
+        'user_s': round(rusage.ru_utime, 3),
+        'sys_s': round(rusage.ru_stime, 3),
+        # ru_maxrss is in kB on Linux; VmHWM is the script's own high-water mark
+        'peak_rss_mb': round(usage.get('VmHWM', rusage.ru_maxrss) / 1024, 1),
+        'read_syscalls': usage.get('syscr'),
+        'write_syscalls': usage.get('syscw'),
+        'syscalls': syscalls,
+        'context_switches': rusage.ru_nvcsw + rusage.ru_nivcsw,
+    }
+
+def print_results(results):
+    header = '%-16s %4s %8s %8s %8s %9s %9s %9s %9s' % (
+        'phase', 'exit', 'wall s', 'user s', 'sys s', 'peak MB', 'reads', 'writes', 'syscalls')
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print('%-16s %4d %8.2f %8.2f %8.2f %9.1f %9s %9s %9s' % (
+            result['phase'], result['exit_code'], result['wall_s'], result['user_s'], result['sys_s'],
+            result['peak_rss_mb'], result['read_syscalls'] if result['read_syscalls'] is not None else '-',
+            result['write_syscalls'] if result['write_syscalls'] is not None else '-',
+            result['syscalls'] if result['syscalls'] is not None else '-'))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the build scripts against stub toolchains')
+    parser.add_argument('phases', nargs='*', metavar='PHASE',
+        help='Phases to run (default: all): ' + ', '.join(name for name, *_ in phases(None)))
+    parser.add_argument('--output-lines', type=int, default=20000,
+        help='Lines of output each stub dotnet build prints (default: 20000)')
+    parser.add_argument('--artifact-files', type=int, default=200,
+        help='Files per bin/obj config dir in the synthetic .artifacts tree (default: 200)')
+    parser.add_argument('--lock-errors', type=int, default=2,
+        help='Number of stub builds that fail with a file-lock error first (default: 2)')
+    parser.add_argument('--tool-delay', type=float, default=0.0,
+        help='Seconds each stub build sleeps, to model toolchain time (default: 0)')
+    parser.add_argument('--repeat', type=int, default=1, help='Run the phases N times (default: 1)')
+    parser.add_argument('--workspace', help='Workspace directory (default: a new temporary directory)')
+    parser.add_argument('--keep', action='store_true', default=False, help='Keep the workspace afterwards')
+    parser.add_argument('--json', metavar='FILE', help='Also write the results as JSON')
+    args = parser.parse_args(argv)
+
+    selected = phases(args.phases)
+    workspace = os.path.abspath(args.workspace) if args.workspace else tempfile.mkdtemp(prefix='maui_bench_')
+    stub_dir = create_workspace(workspace)
+
+    env = os.environ.copy()
+    env.update({
+        'PATH': stub_dir + os.pathsep + env.get('PATH', ''),
+        # maui_publish works on ~/.nuget; keep it inside the workspace
+        'HOME': os.path.join(workspace, '.bench', 'home'),
+        'BENCH_ROOT': workspace,
+        'BENCH_STATE': os.path.join(workspace, '.bench', 'state'),
+        'BENCH_OUTPUT_LINES': str(args.output_lines),
+        'BENCH_ARTIFACT_FILES': str(args.artifact_files // 10 or 1),
+        'BENCH_LOCK_ERRORS': str(args.lock_errors),
+        'BENCH_TOOL_DELAY': str(args.tool_delay),
+        'PYTHONDONTWRITEBYTECODE': '1',
+    })
+    if not shutil.which('strace'):
+        print('> strace not found: reporting read/write syscalls of the script process only')
+
+    results = []
+    log_path = os.path.join(workspace, '.bench', 'output.log')
+    try:
+        with open(log_path, 'w') as log_file:
+            for iteration in range(args.repeat):
+                for name, module, phase_argv, prepare_artifacts in selected:
+                    if prepare_artifacts:
+                        populate_artifacts(workspace, args.artifact_files)
+                    print('> [%d/%d] %s: %s %s' % (iteration + 1, args.repeat, name, module, ' '.join(phase_argv)))
+                    results.append(run_phase(workspace, stub_dir, name, module, phase_argv, env, log_file))
+        print()
+        print_results(results)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent=2)
+    finally:
+        if not args.keep and not args.workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+        else:
+            print('> Workspace kept at %s (script output in %s)' % (workspace, log_path))
+
+    return 1 if any(result['exit_code'] for result in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
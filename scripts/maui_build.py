@@ -8,8 +8,18 @@ import sys
 import time
 import pty
 import select
-from shutil import which
+import threading
+import hashlib
+import re
+import signal
+import fcntl
+import xml.etree.ElementTree as ET
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 import json
+import contextlib
+import itertools
+import ctypes
 
 CORE_BINDING_ANDROID_NAME = 'AdjustSdk.AndroidBinding'
 CORE_BINDING_IOS_NAME = 'AdjustSdk.iOSBinding'
@@ -80,11 +90,12 @@ SDKS = ['core', 'oaid', 'meta_referrer', 'google_lvl', 'plugins']
 PLATFORMS = ['android', 'ios']
 NET_VERSIONS = ['net8', 'net10']
 
+NET_SDK_VERSIONS = {'net8': '8.0.402', 'net10': '10.0.101'}
+
+BUILD_TRACE_FILE = os.path.join(ROOT, '.artifacts', 'build_trace.jsonl')
+
 def set_net_version(net_version: bool):
-    if net_version == 'net8':
-        version = "8.0.402"
-    else:
-        version = "10.0.101"
+    version = NET_SDK_VERSIONS['net8' if net_version == 'net8' else 'net10']
     global_json = {"sdk": {"version": version, "rollForward": "latestFeature"}}
     with open(os.path.join(ROOT, "global.json"), "w") as f:
         json.dump(global_json, f, indent=2)
@@ -99,247 +110,1100 @@ def removing(str_list: list[str], *args):
 def has_none(from_list: list[str], in_list: list[str]) -> bool:
     return not any(arg in in_list for arg in from_list)
 
-def shutdown_build_server():
+class BuildTrace:
+    """Records timed spans of a build run (commands, waits, sanitizer and clean passes).
+
+    Each finished span is appended as one JSON line to the trace file, so a
+    trace survives a failed or interrupted build. Spans nest per thread: a
+    span opened while another one is open on the same thread becomes its
+    child. Every span carries the pid of its run, which tells concurrent runs
+    apart in the shared default trace file.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.ids = itertools.count(1)
+        self.file = None
+        self.origin = time.monotonic()
+        self.origin_wall = time.time()
+
+    def open(self, path, append=False):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, 'a' if append else 'w')
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    @contextlib.contextmanager
+    def span(self, name, category, **attrs):
+        """Time the enclosed block. Yields the span's attrs, which the block may extend."""
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        record = {
+            'id': next(self.ids),
+            'parent': stack[-1]['id'] if stack else None,
+            'pid': os.getpid(),
+            'name': name,
+            'cat': category,
+            'thread': threading.current_thread().name,
+            'start': time.monotonic() - self.origin,
+            'attrs': attrs,
+        }
+        stack.append(record)
+        try:
+            yield attrs
+        except SystemExit as e:
+            attrs.setdefault('exit_code', e.code)
+            raise
+        finally:
+            stack.pop()
+            record['dur'] = time.monotonic() - self.origin - record['start']
+            with self.lock:
+                self.spans.append(record)
+                if self.file:
+                    self.file.write(json.dumps(record, default=str) + '\n')
+                    self.file.flush()
+
+    def write_chrome_trace(self, path):
+        """Write the spans in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        with self.lock:
+            spans = list(self.spans)
+        tids = {}
+        events = []
+        for record in spans:
+            tid = tids.setdefault(record['thread'], len(tids) + 1)
+            events.append({
+                'name': record['name'],
+                'cat': record['cat'],
+                'ph': 'X',
+                'ts': round(record['start'] * 1e6),
+                'dur': round(record['dur'] * 1e6),
+                'pid': os.getpid(),
+                'tid': tid,
+                'args': record['attrs'],
+            })
+        for thread_name, tid in tids.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                           'args': {'name': thread_name}})
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+    def report(self):
+        """Print the slowest projects, time lost to retries and delays, and the critical path."""
+        with self.lock:
+            spans = list(self.spans)
+        by_id = {record['id']: record for record in spans}
+
+        def inside(record, category):
+            parent = by_id.get(record['parent'])
+            while parent:
+                if parent['cat'] == category:
+                    return True
+                parent = by_id.get(parent['parent'])
+            return False
+
+        def describe(record):
+            attrs = record['attrs']
+            details = [value for value in (attrs.get('config'), attrs.get('net')) if value]
+            if attrs.get('cached'):
+                details.append('cached')
+            return '%s (%s)' % (record['name'], ', '.join(details)) if details else record['name']
+
+        wall = time.monotonic() - self.origin
+        log('> Build report: %.1fs wall time' % wall)
+
+        projects = [record for record in spans if record['cat'] == 'project']
+        if projects:
+            log('> Slowest projects:')
+            for record in sorted(projects, key=lambda r: r['dur'], reverse=True)[:10]:
+                log('>   %7.1fs  %s' % (record['dur'], describe(record)))
+
+        # Exclusive time: a span's duration minus that of its direct children
+        totals = {}
+        for record in spans:
+            totals[record['cat']] = totals.get(record['cat'], 0.0) + record['dur']
+            parent = by_id.get(record['parent'])
+            if parent:
+                totals[parent['cat']] = totals.get(parent['cat'], 0.0) - record['dur']
+        log('> Time by kind (exclusive): ' +
+            ', '.join('%s %.1fs' % (category, max(total, 0.0)) for category, total in sorted(totals.items())))
+
+        retries = [record for record in spans if record['cat'] == 'retry']
+        failed_attempts = [record for record in spans
+                           if record['cat'] == 'attempt' and record['attrs'].get('retried')]
+        lost = sum(record['dur'] for record in retries + failed_attempts)
+        log('> Time lost to retries: %.1fs (%d retries)' % (lost, len(failed_attempts)))
+        delays = [record for record in spans if record['cat'] == 'wait' and not inside(record, 'retry')]
+        log('> Time spent waiting on delays: %.1fs (%d waits)' % (sum(r['dur'] for r in delays), len(delays)))
+
+        # Walk back from the project that finished last, each time through the
+        # referenced project that finished last before it started
+        path = []
+        current = max(projects, key=lambda r: r['start'] + r['dur'], default=None)
+        while current:
+            path.append(current)
+            references = {reference.lower() for reference in current['attrs'].get('references', ())}
+            candidates = [record for record in projects
+                          if record['name'].lower() in references
+                          and record['attrs'].get('net') == current['attrs'].get('net')
+                          and record['start'] + record['dur'] <= current['start'] + 1e-6]
+            current = max(candidates, key=lambda r: r['start'] + r['dur'], default=None)
+        if path:
+            log('> Critical path: %.1fs' % sum(record['dur'] for record in path))
+            for record in reversed(path):
+                log('>   %7.1fs  %s' % (record['dur'], describe(record)))
+
+_TRACE = BuildTrace()
+
+def wait_until(probe, description, timeout, interval=0.05):
+    """Poll `probe` until it returns True or `timeout` seconds have passed.
+
+    Reports how long the wait took and returns whether the probe succeeded.
+    """
+    with _TRACE.span(description, 'wait', timeout=timeout) as attrs:
+        start = time.monotonic()
+        while True:
+            ready = probe()
+            if ready or time.monotonic() - start >= timeout:
+                break
+            time.sleep(interval)
+        elapsed = time.monotonic() - start
+        attrs['ready'] = ready
+    if not ready:
+        log('> Gave up waiting for %s after %.2fs' % (description, elapsed))
+    elif elapsed >= 0.01:
+        log('> Waited %.2fs for %s' % (elapsed, description))
+    return ready
+
+# Long-lived processes that `dotnet build-server shutdown` stops: the Roslyn
+# compiler server, reusable MSBuild worker nodes and the Razor server
+BUILD_SERVER_PROCESS_RE = re.compile('VBCSCompiler|MSBuild\\.dll.*nodeReuse:true|rzc\\.dll')
+
+# Process groups of the builds started by this run (see _run_attempt). Build
+# servers stay in the group of the build that started them, so probes look
+# there instead of at every process on the machine, which would also match
+# unrelated or sibling builds.
+_BUILD_PROCESS_GROUPS = set()
+
+def _process_groups():
+    """Return {pgid: [command, ...]} for all processes, or None when ps is unavailable."""
+    try:
+        output = subprocess.run(['ps', '-A', '-o', 'pgid=,command='],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL,
+                                text=True).stdout
+    except OSError:
+        return None
+    groups = {}
+    for line in output.splitlines():
+        pgid, _, command = line.strip().partition(' ')
+        if pgid.isdigit():
+            groups.setdefault(int(pgid), []).append(command.strip())
+    return groups
+
+def _build_servers_stopped():
+    groups = _process_groups()
+    if groups is None:
+        return True  # No ps, nothing to probe
+    return not any(BUILD_SERVER_PROCESS_RE.search(command)
+                   for pgid in list(_BUILD_PROCESS_GROUPS) for command in groups.get(pgid, ()))
+
+def _build_processes_exited(pgid):
+    """True once nothing but build servers is left in the process group `pgid`.
+
+    Reused MSBuild nodes and VBCSCompiler outlive the build in its group, so
+    waiting for the whole group to exit would always run into the timeout.
+    """
+    groups = _process_groups()
+    if groups is None:
+        return _process_group_exited(pgid)
+    return all(BUILD_SERVER_PROCESS_RE.search(command) for command in groups.get(pgid, ()))
+
+def _process_group_exited(pgid):
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+def shutdown_build_server(cwd=None, env=None):
     """Shutdown dotnet build server to release file locks"""
-    print('> Shutting down dotnet build server...')
-    subprocess.run(['dotnet', 'build-server', 'shutdown'],
-                   stdout=subprocess.DEVNULL,
-                   stderr=subprocess.DEVNULL)
-    time.sleep(0.5)  # Give it a moment to fully shutdown
+    log('> Shutting down dotnet build server...')
+    with _TRACE.span('dotnet build-server shutdown', 'server'):
+        subprocess.run(['dotnet', 'build-server', 'shutdown'],
+                       stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL,
+                       cwd=cwd,
+                       env=env)
+        wait_until(_build_servers_stopped, 'build servers to exit', timeout=5.0)
+
+_OUTPUT_LOCK = threading.Lock()
+
+# Build output is read from the pty in large blocks and handed to stdout as raw
+# bytes; MSBuild can produce hundreds of MB of log, so it is never decoded or
+# kept in memory as a whole.
+OUTPUT_READ_SIZE = 64 * 1024
+
+FILE_LOCK_ERRORS = [
+    b'is being used by another process',
+    b'Renaming temporary file failed',
+    b'No such file or directory',
+    b'XARLP7024',
+    b'XARLP7000'
+]
+# Signatures that are specific enough to abort the build as soon as they show
+# up on an error line ('No such file or directory' is too generic for that)
+FILE_LOCK_ABORT_ERRORS = [
+    b'is being used by another process',
+    b'Renaming temporary file failed',
+    b'XARLP7024',
+    b'XARLP7000'
+]
+ERROR_LINE_RE = re.compile(rb'\berror\b', re.IGNORECASE)
+QUOTED_PATH_RE = re.compile(rb"'(/[^']+)'")
+
+# 'abort': kill the build on the first file-lock error and retry right away
+# 'wait': let the build run to completion before retrying (set by --on-file-lock)
+FILE_LOCK_POLICY = 'abort'
+
+def log(msg):
+    """Print a whole line at once, so messages from concurrent builds don't interleave."""
+    with _OUTPUT_LOCK:
+        sys.stdout.write(msg + '\n')
+        sys.stdout.flush()
+
+def _stdout_write(data):
+    """Write bytes straight to the stdout fd (one syscall, no flush needed)."""
+    try:
+        fd = sys.stdout.fileno()
+    except (AttributeError, OSError, ValueError):
+        sys.stdout.write(data.decode('utf-8', errors='replace'))
+        sys.stdout.flush()
+        return
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
 
-def run(cmd, retry_on_file_lock=True, max_retries=3):
-    """Run a command with optional retry logic for file locking errors"""
-    print('> ' + ' '.join(cmd))
+def _write_output(data, label, partial):
+    """Write build output, prefixing each complete line with `label` when set.
 
-    for attempt in range(max_retries):
-        # Use a pseudo-terminal to preserve colors
-        master_fd, slave_fd = pty.openpty()
+    `partial` is a one-element list holding the unterminated tail of the
+    previous chunk, so concurrent builds never interleave mid-line.
+    """
+    if not label:
+        with _OUTPUT_LOCK:
+            _stdout_write(data)
+        return
+    lines = (partial[0] + data).split(b'\n')
+    partial[0] = lines.pop()
+    if not lines:
+        return
+    prefix = b'[' + label.encode('utf-8') + b'] '
+    with _OUTPUT_LOCK:
+        _stdout_write(b''.join(prefix + line + b'\n' for line in lines))
 
+class FileLockDetector:
+    """Matches file-lock error signatures line by line as build output streams in.
+
+    Only error lines can trigger an abort: MSBuild reports recoverable copy
+    conflicts (MSB3026) as warnings with the same wording and retries them
+    itself.
+    """
+
+    MAX_PARTIAL_LINE = 64 * 1024
+
+    def __init__(self, abort=False):
+        self.abort = abort
+        self.detected = False
+        self.abort_requested = False
+        self.locked_paths = set()
+        self.partial = b''
+
+    def feed(self, data):
+        """Scan a chunk of output; returns True once the build should be aborted."""
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()[-self.MAX_PARTIAL_LINE:]
+        for line in lines:
+            self._check(line)
+        return self.abort_requested
+
+    def finish(self):
+        if self.partial:
+            self._check(self.partial)
+            self.partial = b''
+
+    def _check(self, line):
+        if not any(err in line for err in FILE_LOCK_ERRORS):
+            return
+        self.detected = True
+        for path in QUOTED_PATH_RE.findall(line):
+            self.locked_paths.add(path.decode('utf-8', errors='replace'))
+        if self.abort and ERROR_LINE_RE.search(line) and any(err in line for err in FILE_LOCK_ABORT_ERRORS):
+            self.abort_requested = True
+
+def _kill_process_group(process, sig=signal.SIGTERM):
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def _file_released(path):
+    """Return True when no process holds a .NET FileShare lock (flock) on `path`."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return True
+    except OSError:
+        # Not openable by us, so not something we can probe
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+def wait_for_file_handles(paths, timeout=10.0):
+    """Poll until every path in `paths` is unlocked; returns False on timeout."""
+    pending = set(paths)
+
+    def released():
+        pending.difference_update([path for path in pending if _file_released(path)])
+        return not pending
+
+    return wait_until(released, 'locked files to be released', timeout)
+
+def _pump_output(process, master_fd, label, detector):
+    """Copy pty output to stdout until the process exits, feeding `detector`.
+
+    Blocks in select() on the pty and on a pipe that a waiter thread writes to
+    once the process exits, so there is no polling interval. The exit wake-up
+    matters because build server processes can keep the pty open after
+    `dotnet build` itself has finished.
+    """
+    wake_r, wake_w = os.pipe()
+
+    def wait_for_exit():
+        # The waiter owns the write end; the pump may already be gone when
+        # the process exits, in which case the write hits a closed pipe
+        process.wait()
         try:
-            process = subprocess.Popen(
-                cmd,
-                stdout=slave_fd,
-                stderr=slave_fd,
-                close_fds=True
-            )
-
-            os.close(slave_fd)  # Close slave in parent process
-
-            # Capture output while displaying it in real-time
-            output_lines = []
-            while True:
+            os.write(wake_w, b'x')
+        except OSError:
+            pass
+        finally:
+            os.close(wake_w)
+
+    threading.Thread(target=wait_for_exit, daemon=True).start()
+    partial = [b'']
+
+    def handle(data):
+        _write_output(data, label, partial)
+        if detector and not detector.abort_requested and detector.feed(data):
+            log('> File locking error detected, stopping the build early')
+            _kill_process_group(process)
+
+    try:
+        while True:
+            readable, _, _ = select.select([master_fd, wake_r], [], [])
+            if master_fd in readable:
                 try:
-                    # Check if there's data to read
-                    readable, _, _ = select.select([master_fd], [], [], 0.1)
-                    if readable:
-                        try:
-                            data = os.read(master_fd, 1024)
-                            if not data:
-                                break
-                            text = data.decode('utf-8', errors='replace')
-                            sys.stdout.write(text)
-                            sys.stdout.flush()
-                            output_lines.append(text)
-                        except OSError:
-                            break
+                    data = os.read(master_fd, OUTPUT_READ_SIZE)
+                except OSError:
+                    break
+                if not data:
+                    break
+                handle(data)
+                continue
+            # Process has exited: drain whatever is still buffered, then stop
+            while select.select([master_fd], [], [], 0)[0]:
+                try:
+                    data = os.read(master_fd, OUTPUT_READ_SIZE)
+                except OSError:
+                    break
+                if not data:
+                    break
+                handle(data)
+            break
+    finally:
+        if partial[0]:
+            _write_output(b'\n', label, partial)
+        if detector:
+            detector.finish()
+        os.close(wake_r)
+
+def run(cmd, retry_on_file_lock=True, max_retries=3, label=None, cwd=None, env=None, settle_timeout=0):
+    """Run a command with optional retry logic for file locking errors
+
+    With `settle_timeout`, a successful run also waits (up to that many
+    seconds) for processes the command left behind in its process group,
+    other than build servers.
+    """
+    log('> ' + ' '.join(cmd))
+
+    with _TRACE.span(' '.join(cmd[:2]), 'command', cmd=cmd, label=label) as run_attrs:
+        for attempt in range(max_retries):
+            run_attrs['retries'] = attempt
+            with _TRACE.span(' '.join(cmd[:2]), 'attempt', attempt=attempt + 1) as attempt_attrs:
+                # Lock errors are matched while the output streams by, so the output
+                # never has to be kept around for a check after the build
+                detector = None
+                if retry_on_file_lock:
+                    detector = FileLockDetector(abort=FILE_LOCK_POLICY == 'abort' and attempt < max_retries - 1)
+                process, return_code = _run_attempt(cmd, label, cwd, env, detector)
+                # On failure, check if it's a file locking error
+                is_file_lock_error = return_code != 0 and detector is not None and detector.detected
+                retry = retry_on_file_lock and is_file_lock_error and attempt < max_retries - 1
+                attempt_attrs['exit_code'] = return_code
+                attempt_attrs['retried'] = retry
+
+            if return_code == 0:
+                # Success
+                run_attrs['exit_code'] = 0
+                if settle_timeout:
+                    wait_until(lambda: _build_processes_exited(process.pid),
+                               'build processes to exit', settle_timeout)
+                return
+
+            if retry:
+                log(f'\n > File locking error detected (attempt {attempt + 1}/{max_retries}). Retrying...\n')
+                with _TRACE.span('file lock recovery', 'retry', attempt=attempt + 1):
+                    wait_until(lambda: _build_processes_exited(process.pid), 'failed build to exit', timeout=5.0)
+                    shutdown_build_server(cwd, env)
+                    if detector.locked_paths:
+                        wait_for_file_handles(detector.locked_paths)
+                continue
+
+            # Either not a file lock error, or we've exhausted retries
+            run_attrs['exit_code'] = return_code
+            sys.exit(return_code)
+
+def _run_attempt(cmd, label, cwd, env, detector):
+    """Run `cmd` once, streaming its output, and return (process, exit code)."""
+    # Use a pseudo-terminal to preserve colors
+    master_fd, slave_fd = pty.openpty()
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdout=slave_fd,
+            stderr=slave_fd,
+            close_fds=True,
+            cwd=cwd,
+            env=env,
+            # Own process group, so an early abort also stops MSBuild's child processes
+            start_new_session=True
+        )
+        _BUILD_PROCESS_GROUPS.add(process.pid)
+
+        os.close(slave_fd)  # Close slave in parent process
 
-                    # Check if process has finished
-                    if process.poll() is not None:
-                        # Read any remaining data
-                        try:
-                            while True:
-                                data = os.read(master_fd, 1024)
-                                if not data:
-                                    break
-                                text = data.decode('utf-8', errors='replace')
-                                sys.stdout.write(text)
-                                sys.stdout.flush()
-                                output_lines.append(text)
-                        except OSError:
-                            pass
-                        break
-                except KeyboardInterrupt:
-                    process.terminate()
-                    raise
-
-            return_code = process.wait()
-        finally:
-            os.close(master_fd)
+        try:
+            _pump_output(process, master_fd, label, detector)
+        except KeyboardInterrupt:
+            _kill_process_group(process)
+            raise
+
+        return process, process.wait()
+    finally:
+        os.close(master_fd)
+
+def build_with_delay(csproj, config, delay=1.0, sanitize=True, extra_args=(), label=None, cache=None, sandbox=None,
+                     net_version=None, build_references=True):
+    """Run a command and wait (up to `delay`) for it to settle to prevent race conditions
+
+    With `build_references` False the referenced projects must already be
+    built: MSBuild only resolves their outputs, and sanitizing and mirroring
+    stay within this project.
+    """
+    configs = ['Debug', 'Release'] if config == 'DebugAndRelease' else [config]
+    if sandbox:
+        extra_args = (*extra_args, *sandbox.build_args())
+    extra_args = (*extra_args, *mirror_build_args())
+    name = os.path.basename(csproj).replace('.csproj', '')
+    references = sorted(os.path.basename(key)[:-len('.csproj')] for key in project_reference_closure(csproj))
+    for build_config in configs:
+        with _TRACE.span(name, 'project', project=csproj, config=build_config, net=net_version,
+                         tfm=read_target_frameworks(csproj, net_version), references=references) as attrs:
+            digest = cache.digest(csproj, build_config, ('mirror=' + MIRROR_MODE, *extra_args)) if cache else None
+            if digest and cache.is_fresh(csproj, build_config, digest):
+                log('> Reusing %s (%s): inputs unchanged since last build' % (os.path.basename(csproj), build_config))
+                attrs['cached'] = True
+                continue
+            if sanitize:
+                sanitize_artifacts(csproj, sandbox, build_references)
+            if MIRROR_MODE != 'view':
+                drop_mirror_views(csproj, sandbox, build_references)
+            # Not part of the digest: it does not change what the build produces
+            reference_args = () if build_references else ('-p:BuildProjectReferences=false',)
+            run_with_delay(['dotnet', 'build', csproj, '--configuration', build_config, *extra_args, *reference_args],
+                           delay, label, sandbox)
+            if MIRROR_MODE != 'copy':
+                mirror_artifacts(csproj, build_config, sandbox, build_references)
+            if digest:
+                cache.record(csproj, build_config, digest)
+def run_with_delay(cmd, delay, label=None, sandbox=None):
+    # `delay` bounds the wait for the build's leftover processes rather than
+    # being slept unconditionally
+    if sandbox:
+        run(cmd, label=label, cwd=sandbox.root, env=sandbox.env, settle_timeout=delay)
+    else:
+        run(cmd, label=label, settle_timeout=delay)
+def _project_key(csproj):
+    # ProjectReference paths do not always match the on-disk casing
+    # (e.g. AdjustGoogleLvl vs AdjustGoogleLVL), so compare case-insensitively.
+    return os.path.normpath(os.path.abspath(csproj)).lower()
 
-        if return_code == 0:
-            # Success
-            return
+def read_project_references(csproj):
+    """Return the csproj paths referenced by ProjectReference items.
 
-        # On failure, check if it's a file locking error
-        output = ''.join(output_lines)
-        is_file_lock_error = any(err in output for err in [
-            'is being used by another process',
-            'Renaming temporary file failed',
-            'No such file or directory',
-            'XARLP7024',
-            'XARLP7000'
-        ])
-
-        if retry_on_file_lock and is_file_lock_error and attempt < max_retries - 1:
-            print(f'\n > File locking error detected (attempt {attempt + 1}/{max_retries}). Retrying...\n')
-            shutdown_build_server()
-            time.sleep(2)  # Wait for file handles to be released
+    Conditions are ignored on purpose: a reference that is only active for one
+    TFM still has to be built before the project that declares it.
+    """
+    try:
+        tree = ET.parse(csproj)
+    except (OSError, ET.ParseError):
+        return []
+    base_dir = os.path.dirname(csproj)
+    references = []
+    for element in tree.iter():
+        if element.tag.rsplit('}', 1)[-1] != 'ProjectReference':
             continue
+        include = element.get('Include')
+        if include:
+            references.append(os.path.normpath(os.path.join(base_dir, include.replace('\\', os.sep))))
+    return references
 
-        # Either not a file lock error, or we've exhausted retries
-        sys.exit(return_code)
+def read_target_frameworks(csproj, net_version=None):
+    """Return the target frameworks a csproj declares, limited to `net_version` if given.
 
-def build_with_delay(csproj, config, delay=1.0):
-    """Run a command and add a delay afterwards to prevent race conditions"""
-    _clean_ios_obj_artifacts(csproj, config)
-    if config == 'DebugAndRelease':
-        run_with_delay(['dotnet', 'build', csproj, '--configuration', 'Debug'], delay)
-        _clean_ios_obj_artifacts(csproj, config)
-        run_with_delay(['dotnet', 'build', csproj, '--configuration', 'Release'], delay)
-    else:
-        run_with_delay(['dotnet', 'build', csproj, '--configuration', config], delay)
-def run_with_delay(cmd, delay):
-    # Clean Android binding artifacts before building bindings to prevent corrupted XML errors
-    _clean_android_binding_artifacts()
-    # Clean actool artifacts right before running dotnet build
-    _clean_ios_actool_artifacts()
-    run(cmd)
-    time.sleep(delay)
-
-def build_bindings(targets):
+    Used for reporting only: property references and conditions are not
+    evaluated.
+    """
+    try:
+        tree = ET.parse(csproj)
+    except (OSError, ET.ParseError):
+        return []
+    prefix = net_version + '.' if net_version else 'net'
+    frameworks = []
+    for element in tree.iter():
+        if element.tag.rsplit('}', 1)[-1] not in ('TargetFramework', 'TargetFrameworks') or not element.text:
+            continue
+        for framework in element.text.split(';'):
+            framework = framework.strip()
+            if framework.startswith(prefix) and framework not in frameworks:
+                frameworks.append(framework)
+    return frameworks
+
+def _resolve_case(path):
+    """Return `path` with each component matched case-insensitively on disk, or None if it is missing."""
+    if os.path.exists(path):
+        return path
+    resolved = os.sep
+    for part in os.path.abspath(path).split(os.sep)[1:]:
+        candidate = os.path.join(resolved, part)
+        if not os.path.exists(candidate):
+            try:
+                matches = [entry for entry in os.listdir(resolved) if entry.lower() == part.lower()]
+            except OSError:
+                return None
+            if not matches:
+                return None
+            candidate = os.path.join(resolved, matches[0])
+        resolved = candidate
+    return resolved
+
+def project_reference_paths(csproj):
+    """Return {key: csproj path} for every project reachable through ProjectReference edges.
+
+    The path is None for a reference that does not exist on disk.
+    """
+    paths = {}
+    stack = [csproj]
+    while stack:
+        for reference in read_project_references(stack.pop()):
+            key = _project_key(reference)
+            if key not in paths:
+                paths[key] = _resolve_case(reference)
+                if paths[key]:
+                    stack.append(paths[key])
+    return paths
+
+def project_reference_closure(csproj):
+    """Return the keys of every project reachable through ProjectReference edges."""
+    return set(project_reference_paths(csproj))
+
+class DotnetSandbox:
+    """Pins the .NET SDK for one net version without touching the repo-root global.json.
+
+    The dotnet muxer picks its SDK from the global.json nearest to the working
+    directory, so builds run from .artifacts/.sdk/<net_version>/, which holds a
+    generated global.json. The MSBuild SDK resolver looks for global.json next
+    to the project instead, so it is pinned with
+    DOTNET_MSBUILD_SDK_RESOLVER_SDKS_DIR/_VER. Builds also pass
+    -p:ArtifactsSandbox=<net_version>. Directory.Build.props then moves
+    restore/intermediate output and the artifacts_copy mirror into
+    per-version trees, so net8 and net10 builds of the same project can run
+    side by side. bin/<Config>/<TFM> outputs are already distinct per TFM.
+
+    Sandboxed builds of the two versions run at the same time, so they also
+    pass -nodeReuse:false and -p:UseSharedCompilation=false: a file-lock retry
+    in one of them shuts the build servers down, which must not take out
+    MSBuild nodes or a VBCSCompiler the other one is still using.
+    """
+
+    def __init__(self, net_version):
+        self.net_version = net_version
+        self.root = os.path.join(ROOT, '.artifacts', '.sdk', net_version)
+        self.env = None
+
+    def prepare(self):
+        version = NET_SDK_VERSIONS['net8' if self.net_version == 'net8' else 'net10']
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, 'global.json'), 'w') as f:
+            json.dump({"sdk": {"version": version, "rollForward": "latestFeature"}}, f, indent=2)
+        try:
+            resolved = subprocess.check_output(['dotnet', '--version'], cwd=self.root, text=True).strip()
+            sdks = subprocess.check_output(['dotnet', '--list-sdks'], cwd=self.root, text=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            log('> Could not resolve .NET SDK %s for %s: %s' % (version, self.net_version, e))
+            sys.exit(1)
+        self.env = os.environ.copy()
+        for line in sdks.splitlines():
+            # e.g. "10.0.101 [/usr/local/share/dotnet/sdk]"
+            sdk_version, _, sdk_root = line.partition(' ')
+            if sdk_version == resolved:
+                self.env['DOTNET_MSBUILD_SDK_RESOLVER_SDKS_DIR'] = os.path.join(sdk_root.strip('[]'), resolved, 'Sdks')
+                self.env['DOTNET_MSBUILD_SDK_RESOLVER_SDKS_VER'] = resolved
+                break
+        log('> %s sandbox uses .NET SDK %s' % (self.net_version, resolved))
+
+    def build_args(self):
+        return ['-p:ArtifactsSandbox=%s' % self.net_version, '-nodeReuse:false', '-p:UseSharedCompilation=false']
+
+    def label(self, name):
+        return '%s/%s' % (self.net_version, name)
+
+# (project key, config, net version) of the projects a parallel queue built in
+# this run, so later passes (bindings, then sdk, then apps) do not queue them again
+_BUILT_PROJECTS = set()
+_BUILT_PROJECTS_LOCK = threading.Lock()
+
+class BuildQueue:
+    """Collects the csproj files selected for one build pass and builds them.
+
+    With jobs == 1 the projects are built one after another in the order they
+    were added. With more jobs, the projects they reference are queued as
+    well, and a project starts as soon as all of its references have been
+    built. It is then built with BuildProjectReferences=false, so siblings
+    that share a reference (the apps on AdjustSdk) overlap without MSBuild
+    building that reference twice concurrently. A project with a reference
+    that cannot be queued builds its references itself and does not overlap
+    with any build that shares one of them.
+    """
+
+    def __init__(self, config, jobs=1, cache=None, sandbox=None, net_version=None):
+        self.config = config
+        self.jobs = max(1, jobs)
+        self.cache = cache
+        self.sandbox = sandbox
+        self.net_version = net_version
+        self.projects = []
+
+    def add(self, csproj, message):
+        self.projects.append((csproj, message))
+
+    def run(self):
+        if self.jobs == 1 or len(self.projects) < 2:
+            for csproj, message in self.projects:
+                log('> ' + message)
+                if self.sandbox:
+                    name = os.path.basename(csproj).replace('.csproj', '')
+                    build_with_delay(csproj, self.config, label=self.sandbox.label(name),
+                                     cache=self.cache, sandbox=self.sandbox, net_version=self.net_version)
+                else:
+                    build_with_delay(csproj, self.config, cache=self.cache, net_version=self.net_version)
+        else:
+            self._run_parallel()
+        if self.cache:
+            self.cache.report()
+
+    def _run_parallel(self):
+        with _BUILT_PROJECTS_LOCK:
+            built = {key for key, config, net_version in _BUILT_PROJECTS
+                     if (config, net_version) == (self.config, self.net_version)}
+        nodes = {}
+        for csproj, message in self.projects:
+            nodes.setdefault(_project_key(csproj), (csproj, message))
+        references = {}
+        for key, (csproj, _) in list(nodes.items()):
+            references[key] = project_reference_paths(csproj)
+            for reference, path in references[key].items():
+                if path and reference not in nodes and reference not in built:
+                    name = os.path.basename(path).replace('.csproj', '')
+                    nodes[reference] = (path, 'Building referenced project %s' % name)
+        for key, (csproj, _) in nodes.items():
+            references.setdefault(key, project_reference_paths(csproj))
+        closures = {key: set(paths) for key, paths in references.items()}
+
+        pending = list(nodes)
+        running = {}
+        footprints = {}
+        built_references = {}
+        done = built - set(nodes)
+        results = {}
+        failure = None
+        condition = threading.Condition()
+
+        def worker(key, build_references):
+            csproj, _ = nodes[key]
+            name = os.path.basename(csproj).replace('.csproj', '')
+            if self.sandbox:
+                name = self.sandbox.label(name)
+            try:
+                # Node reuse would let one build's retry (build-server shutdown)
+                # kill worker nodes that a sibling build is still using
+                # (sandboxed builds already pass -nodeReuse:false).
+                build_with_delay(csproj, self.config, extra_args=() if self.sandbox else ('-nodeReuse:false',), label=name,
+                                 cache=self.cache, sandbox=self.sandbox, net_version=self.net_version,
+                                 build_references=build_references)
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) and e.code else 1
+            except Exception as e:
+                log('> %s failed: %s' % (name, e))
+                code = 1
+            with condition:
+                results[key] = code
+                condition.notify()
+
+        with condition:
+            while pending or running:
+                if failure is None:
+                    busy = set()
+                    for footprint in footprints.values():
+                        busy |= footprint
+                    for key in list(pending):
+                        if len(running) >= self.jobs:
+                            break
+                        if not closures[key] & set(nodes) <= done:
+                            continue
+                        # Everything referenced is built unless a reference could
+                        # not be queued; then MSBuild builds the references itself
+                        build_references = not closures[key] or not closures[key] <= done
+                        footprint = {key} | (closures[key] if build_references else set())
+                        if footprint & busy:
+                            continue
+                        pending.remove(key)
+                        log('> ' + nodes[key][1])
+                        thread = threading.Thread(target=worker, args=(key, build_references), daemon=True,
+                                                  name=os.path.basename(nodes[key][0]))
+                        running[key] = thread
+                        footprints[key] = footprint
+                        built_references[key] = build_references
+                        busy |= footprint
+                        thread.start()
+                if not running:
+                    if pending and failure is None:
+                        log('> Cyclic ProjectReference graph, cannot schedule: %s' %
+                            ', '.join(nodes[key][0] for key in pending))
+                        failure = 1
+                    break
+                condition.wait()
+                for key in [k for k in running if k in results]:
+                    running.pop(key).join()
+                    footprints.pop(key)
+                    if results[key] == 0:
+                        done.add(key)
+                        if built_references.pop(key):
+                            done |= closures[key]
+                        with _BUILT_PROJECTS_LOCK:
+                            _BUILT_PROJECTS.update((built_key, self.config, self.net_version) for built_key in done)
+                    elif failure is None:
+                        failure = results[key]
+                        log('> %s failed, waiting for running builds to finish' % nodes[key][0])
+
+        if failure is not None:
+            sys.exit(failure)
+
+class BuildCache:
+    """Content-hash cache that lets a pass skip `dotnet build` for unchanged projects.
+
+    A project's digest covers every file under its directory (bin/obj and
+    hidden directories excluded, so libs/*.aar and *.xcframework are included),
+    the digests of all referenced projects, Directory.Build.props, the build
+    configuration and the .NET SDK pinned in global.json. Digests of successful
+    builds are stored in .artifacts/build_cache_<net_version>.json with a
+    size/mtime index, so unchanged files are not re-read on the next run.
+    """
+
+    def __init__(self, net_version, path=None):
+        self.net_version = net_version
+        self.sdk_version = NET_SDK_VERSIONS['net8' if net_version == 'net8' else 'net10']
+        self.path = path or os.path.join(ROOT, '.artifacts', 'build_cache_%s.json' % net_version)
+        self.lock = threading.Lock()
+        self.project_digests = {}
+        self.reused = []
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.files = data.get('files', {})
+        self.builds = data.get('builds', {})
+
+    def _file_digest(self, path, st):
+        entry = self.files.get(path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        self.files[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def _tree_digest(self, root):
+        sha = hashlib.sha256()
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d not in ('bin', 'obj') and not d.startswith('.'))
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                sha.update(os.path.relpath(path, root).encode('utf-8'))
+                sha.update(self._file_digest(path, st).encode('ascii'))
+        return sha.hexdigest()
+
+    def _project_digest(self, csproj):
+        key = _project_key(csproj)
+        if key not in self.project_digests:
+            sha = hashlib.sha256(self._tree_digest(os.path.dirname(csproj)).encode('ascii'))
+            for reference in sorted(read_project_references(csproj), key=_project_key):
+                sha.update(self._project_digest(reference).encode('ascii'))
+            self.project_digests[key] = sha.hexdigest()
+        return self.project_digests[key]
+
+    def digest(self, csproj, config, build_args=()):
+        """Return the cache digest for a build, or None if it cannot be cached.
+
+        MSBuild properties in `build_args` are part of the digest, since they
+        can change the outputs (or, like the mirror mode, where they land).
+        """
+        try:
+            with open(csproj, 'r', encoding='utf-8') as f:
+                # Packages from the local NuGet feed can be republished under the
+                # same version, so their content is not covered by the digest.
+                if 'PackageReference Include="Adjust.Maui' in f.read():
+                    return None
+        except OSError:
+            return None
+        with self.lock:
+            sha = hashlib.sha256(self._project_digest(csproj).encode('ascii'))
+            props = os.path.join(ROOT, 'Directory.Build.props')
+            if os.path.isfile(props):
+                sha.update(self._file_digest(props, os.stat(props)).encode('ascii'))
+        sha.update(('%s|%s|%s' % (config, self.net_version, self.sdk_version)).encode('utf-8'))
+        for arg in build_args:
+            if not arg.startswith('-') or arg.startswith('-p:'):
+                sha.update(('|' + arg).encode('utf-8'))
+        return sha.hexdigest()
+
+    def _build_key(self, csproj, config):
+        return '%s|%s|%s' % (_project_key(csproj), config, self.net_version)
+
+    def _outputs_exist(self, csproj, config):
+        # bin/<Config> is shared by the .NET versions, so look for this version's TFMs
+        bin_dir = os.path.join(ROOT, '.artifacts', os.path.basename(csproj).replace('.csproj', ''), 'bin', config)
+        frameworks = read_target_frameworks(csproj, self.net_version)
+        if frameworks:
+            return all(os.path.isdir(os.path.join(bin_dir, framework)) for framework in frameworks)
+        try:
+            return any(entry.startswith(self.net_version + '.') for entry in os.listdir(bin_dir))
+        except OSError:
+            return False
+
+    def is_fresh(self, csproj, config, digest):
+        with self.lock:
+            fresh = self.builds.get(self._build_key(csproj, config)) == digest and self._outputs_exist(csproj, config)
+            if fresh:
+                self.reused.append('%s (%s)' % (os.path.basename(csproj).replace('.csproj', ''), config))
+        return fresh
+
+    def record(self, csproj, config, digest):
+        with self.lock:
+            self.builds[self._build_key(csproj, config)] = digest
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'files': self.files, 'builds': self.builds}, f)
+        os.replace(tmp_path, self.path)
+
+    def report(self):
+        if self.reused:
+            log('> Reused %d build(s) from the build cache: %s' % (len(self.reused), ', '.join(self.reused)))
+            self.reused = []
+
+def select_config(targets):
     if 'debug' in targets:
-        config = 'Debug'
+        return 'Debug'
     elif 'release' in targets:
-        config = 'Release'
+        return 'Release'
     else:
-        config = 'DebugAndRelease'
+        return 'DebugAndRelease'
 
+def build_net_versions(build_specific, targets, config, jobs=1, use_cache=True, sandbox=False):
+    """Run `build_specific` once per selected .NET version.
+
+    Without `sandbox` the versions are built one after another, switching the
+    repo-root global.json in between. With `sandbox` each version gets its own
+    DotnetSandbox and all selected versions build at the same time.
+    """
     if 'net10' in targets:
-        build_bindings_specific(targets, config, 'net10')
+        net_versions = ['net10']
     elif 'net8' in targets:
-        build_bindings_specific(targets, config, 'net8')
+        net_versions = ['net8']
     else:
-        build_bindings_specific(targets, config, 'net8')
-        build_bindings_specific(targets, config, 'net10')
-def build_bindings_specific(targets, config, net_version):
-    set_net_version(net_version)
-    shutdown_build_server()  # Start with clean state
+        net_versions = NET_VERSIONS
+    if not sandbox:
+        for net_version in net_versions:
+            build_specific(targets, config, net_version, jobs, use_cache)
+        return
+
+    sandboxes = [DotnetSandbox(net_version) for net_version in net_versions]
+    for net_sandbox in sandboxes:
+        net_sandbox.prepare()
+    shutdown_build_server(sandboxes[0].root, sandboxes[0].env)  # Start with clean state
+    results = {}
+
+    def worker(net_sandbox):
+        try:
+            build_specific(targets, config, net_sandbox.net_version, jobs, use_cache, net_sandbox)
+            results[net_sandbox.net_version] = 0
+        except SystemExit as e:
+            results[net_sandbox.net_version] = e.code if isinstance(e.code, int) and e.code else 1
+
+    threads = [threading.Thread(target=worker, args=(net_sandbox,), daemon=True, name=net_sandbox.net_version)
+               for net_sandbox in sandboxes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for net_version in net_versions:
+        if results.get(net_version, 1) != 0:
+            log('> %s build failed' % net_version)
+            sys.exit(results.get(net_version, 1))
+
+def build_bindings(targets, jobs=1, use_cache=True, sandbox=False):
+    build_net_versions(build_bindings_specific, targets, select_config(targets), jobs, use_cache, sandbox)
+def build_bindings_specific(targets, config, net_version, jobs=1, use_cache=True, sandbox=None):
+    if sandbox is None:
+        set_net_version(net_version)
+        shutdown_build_server()  # Start with clean state
+    queue = BuildQueue(config, jobs, BuildCache(net_version) if use_cache else None, sandbox, net_version)
     no_bindings_target = has_none(BINDINGS, targets)
     if 'core' in targets or no_bindings_target:
-        print('> Build SDK Core bindings')
-        build_core_bindings(targets, config)
+        log('> Build SDK Core bindings')
+        build_core_bindings(targets, queue)
     if 'test' in targets or no_bindings_target:
-        print('> Build Test bindings')
-        build_test_bindings(targets, config)
+        log('> Build Test bindings')
+        build_test_bindings(targets, queue)
     if 'oaid' in targets or 'plugins' in targets or no_bindings_target:
-        print('> Build OAID bindings')
-        build_oaid_bindings(targets, config)
+        log('> Build OAID bindings')
+        build_oaid_bindings(targets, queue)
     if 'meta_referrer' in targets or 'plugins' in targets or no_bindings_target:
-        print('> Build Meta Referrer bindings')
-        build_meta_referrer_bindings(targets, config)
+        log('> Build Meta Referrer bindings')
+        build_meta_referrer_bindings(targets, queue)
     if 'google_lvl' in targets or 'plugins' in targets or no_bindings_target:
-        print('> Build Google LVL bindings')
-        build_google_lvl_bindings(targets, config)
-def build_core_bindings(targets, config):
+        log('> Build Google LVL bindings')
+        build_google_lvl_bindings(targets, queue)
+    queue.run()
+def build_core_bindings(targets, queue):
     no_platform_target = has_none(PLATFORMS, targets)
     if 'android' in targets or no_platform_target:
-        print('> Building Android SDK Core binding')
-        build_with_delay(ANDROID_CORE_BINDING_CSPROJ, config)
+        queue.add(ANDROID_CORE_BINDING_CSPROJ, 'Building Android SDK Core binding')
     if 'ios' in targets or no_platform_target:
-        print('> Building iOS SDK Core binding')
-        build_with_delay(IOS_CORE_BINDING_CSPROJ, config)
-def build_test_bindings(targets, config):
+        queue.add(IOS_CORE_BINDING_CSPROJ, 'Building iOS SDK Core binding')
+def build_test_bindings(targets, queue):
     no_platform_target = has_none(PLATFORMS, targets)
     if 'android' in targets or no_platform_target:
-        print('> Building Android Test binding')
-        build_with_delay(ANDROID_TEST_BINDING_CSPROJ, config)
+        queue.add(ANDROID_TEST_BINDING_CSPROJ, 'Building Android Test binding')
     if 'ios' in targets or no_platform_target:
-        print('> Building iOS Test binding')
-        build_with_delay(IOS_TEST_BINDING_CSPROJ, config)
-def build_oaid_bindings(targets, config):
-    print('> Building Android OAID binding')
-    build_with_delay(ANDROID_OAID_BINDING_CSPROJ, config)
-def build_meta_referrer_bindings(targets, config):
-    print('> Building Android Meta Referrer binding')
-    build_with_delay(ANDROID_META_REFERRER_BINDING_CSPROJ, config)
-def build_google_lvl_bindings(targets, config):
-    print('> Building Android Google LVL binding')
-    build_with_delay(ANDROID_GOOGLE_LVL_BINDING_CSPROJ, config)
-
-def build_sdk(targets):
-    if 'debug' in targets:
-        config = 'Debug'
-    elif 'release' in targets:
-        config = 'Release'
-    else:
-        config = 'DebugAndRelease'
-
-    if 'net10' in targets:
-        build_sdk_specific(targets, config, 'net10')
-    elif 'net8' in targets:
-        build_sdk_specific(targets, config, 'net8')
-    else:
-        build_sdk_specific(targets, config, 'net8')
-        build_sdk_specific(targets, config, 'net10')
-def build_sdk_specific(targets, config, net_version):
-    set_net_version(net_version)
-    shutdown_build_server()  # Start with clean state
+        queue.add(IOS_TEST_BINDING_CSPROJ, 'Building iOS Test binding')
+def build_oaid_bindings(targets, queue):
+    queue.add(ANDROID_OAID_BINDING_CSPROJ, 'Building Android OAID binding')
+def build_meta_referrer_bindings(targets, queue):
+    queue.add(ANDROID_META_REFERRER_BINDING_CSPROJ, 'Building Android Meta Referrer binding')
+def build_google_lvl_bindings(targets, queue):
+    queue.add(ANDROID_GOOGLE_LVL_BINDING_CSPROJ, 'Building Android Google LVL binding')
+
+def build_sdk(targets, jobs=1, use_cache=True, sandbox=False):
+    build_net_versions(build_sdk_specific, targets, select_config(targets), jobs, use_cache, sandbox)
+def build_sdk_specific(targets, config, net_version, jobs=1, use_cache=True, sandbox=None):
+    if sandbox is None:
+        set_net_version(net_version)
+        shutdown_build_server()  # Start with clean state
+    queue = BuildQueue(config, jobs, BuildCache(net_version) if use_cache else None, sandbox, net_version)
     no_sdk_target = has_none(SDKS, targets)
     if 'core' in targets or no_sdk_target:
-        print('> Building Core SDK')
-        build_with_delay(CORE_SDK_CSPROJ, config)
+        queue.add(CORE_SDK_CSPROJ, 'Building Core SDK')
     if 'oaid' in targets or 'plugins' in targets or no_sdk_target:
-        print('> Building OAID SDK plugin')
-        build_with_delay(OAID_SDK_CSPROJ, config)
+        queue.add(OAID_SDK_CSPROJ, 'Building OAID SDK plugin')
     if 'meta_referrer' in targets or 'plugins' in targets or no_sdk_target:
-        print('> Building Meta Referrer SDK plugin')
-        build_with_delay(META_REFERRER_SDK_CSPROJ, config)
+        queue.add(META_REFERRER_SDK_CSPROJ, 'Building Meta Referrer SDK plugin')
     if 'google_lvl' in targets or 'plugins' in targets or no_sdk_target:
-        print('> Building Google LVL SDK plugin')
-        build_with_delay(GOOGLE_LVL_SDK_CSPROJ, config)
+        queue.add(GOOGLE_LVL_SDK_CSPROJ, 'Building Google LVL SDK plugin')
+    queue.run()
 
-def build_apps(targets):
+def build_apps(targets, jobs=1, use_cache=True, sandbox=False):
     # build apps only in Debug to avoid Release long build times
     config = 'Debug'
 
-    if 'net10' in targets:
-        build_apps_specific(targets, config, 'net10')
-    elif 'net8' in targets:
-        build_apps_specific(targets, config, 'net8')
-    else:
-        build_apps_specific(targets, config, 'net8')
-        build_apps_specific(targets, config, 'net10')
-def build_apps_specific(targets, config, net_version):
-    set_net_version(net_version)
-    shutdown_build_server()  # Start with clean state
+    build_net_versions(build_apps_specific, targets, config, jobs, use_cache, sandbox)
+def build_apps_specific(targets, config, net_version, jobs=1, use_cache=True, sandbox=None):
+    if sandbox is None:
+        set_net_version(net_version)
+        shutdown_build_server()  # Start with clean state
+    queue = BuildQueue(config, jobs, BuildCache(net_version) if use_cache else None, sandbox, net_version)
     no_app_target = has_none(APPS, targets)
     if 'example' in targets or no_app_target:
-        build_example(targets, config, net_version)
+        build_example(targets, queue, net_version)
     if 'example-nuget' in targets: # don't build example-nuget by default before packages are published
-        build_example_nuget(targets, config, net_version)
+        build_example_nuget(targets, queue, net_version)
     if 'test' in targets or no_app_target:
-        build_test(targets, config, net_version)
-def build_test(targets, config, net_version):
+        build_test(targets, queue, net_version)
+    queue.run()
+def build_test(targets, queue, net_version):
     if 'net10' in net_version:
-        print('> Building Test App Net10')
-        build_with_delay(TESTAPP_CSPROJ_NET10, config)
+        queue.add(TESTAPP_CSPROJ_NET10, 'Building Test App Net10')
     else:
-        print('> Building Test App Net8')
-        build_with_delay(TESTAPP_CSPROJ, config)
-def build_example(targets, config, net_version):
+        queue.add(TESTAPP_CSPROJ, 'Building Test App Net8')
+def build_example(targets, queue, net_version):
     if 'net10' in net_version:
-        print('> Building Example App Net10')
-        build_with_delay(EXAMPLE_APP_CSPROJ_NET10, config)
+        queue.add(EXAMPLE_APP_CSPROJ_NET10, 'Building Example App Net10')
     else:
-        print('> Building Example App Net8')
-        build_with_delay(EXAMPLE_APP_CSPROJ, config)
-def build_example_nuget(targets, config, net_version):
+        queue.add(EXAMPLE_APP_CSPROJ, 'Building Example App Net8')
+def build_example_nuget(targets, queue, net_version):
     if 'net10' in net_version:
-        print('> Building Example Nuget Net10')
-        build_with_delay(EXAMPLE_APP_CSPROJ_NUGET_NET10, config)
+        queue.add(EXAMPLE_APP_CSPROJ_NUGET_NET10, 'Building Example Nuget Net10')
     else:
-        print('> Building Example Nuget Net8')
-        build_with_delay(EXAMPLE_APP_CSPROJ_NUGET, config)
+        queue.add(EXAMPLE_APP_CSPROJ_NUGET, 'Building Example Nuget Net8')
 
 target_help = '''Which targets to build or clean (can specify multiple):
 
@@ -389,7 +1253,32 @@ def main(argv=None):
         metavar='TARGET',
         help=target_help
     )
-    common.add_argument('--dry', action='store_true', default=False, help='Perform a dry run (list bin/obj dirs only)')
+    common.add_argument('--dry', action='store_true', default=False, help='Perform a dry run (list bin/obj dirs with their file counts and sizes only)')
+    common.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+        help='Build up to N independent projects concurrently, in ProjectReference order (default: 1)')
+    common.add_argument('--no-cache', action='store_true', default=False,
+        help='Always run dotnet build, even when the build cache says a project is unchanged')
+    common.add_argument('--on-file-lock', choices=['abort', 'wait'], default='abort',
+        help='On a file-lock build error, abort the build right away and retry (abort, default) '
+             'or let it run to completion before retrying (wait)')
+    common.add_argument('--sandbox', action='store_true', default=False,
+        help='Pin each .NET version\'s SDK in its own sandbox instead of rewriting global.json; '
+             'net8 and net10 then build concurrently')
+    common.add_argument('--mirror', choices=MIRROR_MODES, default='copy',
+        help='How artifacts_copy mirrors .artifacts: copy (default), hardlink or symlink per file, '
+             'reflink (copy-on-write clones) or view (a symlink per project bin/obj tree). '
+             'Links fall back to copies across filesystems')
+    common.add_argument('--trash', action='store_true', default=False,
+        help='Move cleaned directories to the system trash with the trash CLI (in the background) '
+             'instead of deleting them')
+    common.add_argument('--trace', metavar='FILE',
+        help='Write timed spans of every command, wait, sanitizer and clean step as JSON lines to FILE, '
+             'replacing it (default: append them to .artifacts/build_trace.jsonl, tagged with the pid '
+             'of the run, so concurrent runs do not clobber each other)')
+    common.add_argument('--chrome-trace', metavar='FILE',
+        help='Also write the spans in Chrome trace-event format (open in chrome://tracing or Perfetto)')
+    common.add_argument('--report', action='store_true', default=False,
+        help='Print the slowest projects, time lost to retries and delays, and the critical path')
 
     parser = argparse.ArgumentParser(
         description='Python3 build tool for Adjust Maui repo',
@@ -415,6 +1304,22 @@ def main(argv=None):
         parser.print_help()
         return 1
 
+    global FILE_LOCK_POLICY, MIRROR_MODE
+    FILE_LOCK_POLICY = args.on_file_lock
+    MIRROR_MODE = args.mirror
+    _BACKGROUND_DELETER.use_trash = args.trash
+
+    _TRACE.open(args.trace or BUILD_TRACE_FILE, append=not args.trace)
+    try:
+        return run_command(parser, args)
+    finally:
+        _TRACE.close()
+        if args.chrome_trace:
+            _TRACE.write_chrome_trace(args.chrome_trace)
+        if args.report:
+            _TRACE.report()
+
+def run_command(parser, args):
     arg_found = False
 
     print('targets: %s' % args.targets)
@@ -423,19 +1328,20 @@ def main(argv=None):
         clean(args.command, args.targets, args.dry)
         arg_found = True
     if args.command == 'all' or args.command.endswith('bindings'):
-        build_bindings(args.targets)
+        build_bindings(args.targets, args.jobs, not args.no_cache, args.sandbox)
         arg_found = True
     if args.command == 'all' or args.command.endswith('sdk'):
-        build_sdk(args.targets)
+        build_sdk(args.targets, args.jobs, not args.no_cache, args.sandbox)
         arg_found = True
     if args.command == 'all' or args.command.endswith('apps'):
-        build_apps(args.targets)
+        build_apps(args.targets, args.jobs, not args.no_cache, args.sandbox)
         arg_found = True
 
     if not arg_found:
         parser.print_help()
         return 1
 
+    _BACKGROUND_DELETER.wait()
     return 0
 
 ARTIFACTS_OUTPUT_DIR = os.path.join(ROOT, '.artifacts')
@@ -558,189 +1464,521 @@ def clean_google_lvl_bindings(targets, dry):
     clean_target(dry, ARTIFACTS_GOOGLE_LVL_BINDING_ANDROID_OUTPUT_DIR)
     clean_artifacts_copy(dry, ARTIFACTS_COPY_GOOGLE_LVL_BINDING_ANDROID_OUTPUT_DIRS)
 
-def find_bin_obj_dirs_cmd(subdir=None):
-    search_root = os.path.join(ROOT, subdir) if subdir else ROOT
-    return ['find', search_root, '-type', 'd', '(', '-name', 'bin', '-o', '-name', 'obj', ')', '-prune']
+ANDROID_BINDING_NAMES = [
+    CORE_BINDING_ANDROID_NAME,
+    TEST_BINDING_ANDROID_NAME,
+    OAID_BINDING_ANDROID_NAME,
+    META_REFERRER_BINDING_ANDROID_NAME,
+    GOOGLE_LVL_BINDING_ANDROID_NAME
+]
+
+class ArtifactSanitizer:
+    """Removes build state under .artifacts that is known to break later builds.
+
+    - actool directories and asset-manifest.plist files, which iOS actool can
+      leave corrupted (or fail to create) and which then fail the next build
+    - empty or non-XML *.xml files in Android binding obj directories. These
+      cause 'Root element is missing' errors when building SDKs that depend
+      on the bindings, especially when switching between net8 and net10
+      builds or after an interrupted build
+
+    A pass walks each requested project tree once with os.scandir. XML files
+    that already passed the check are remembered by size and mtime and are
+    not opened again on later passes.
+    """
 
-def find_files_cmd(subdir_list: list[str]):
-    search_roots = [os.path.join(ROOT, subdir) for subdir in subdir_list]
-    return ['find'] + search_roots + ['-type', 'f']
+    def __init__(self, root=None):
+        self.root = root or os.path.join(ROOT, '.artifacts')
+        self.valid_xml = {}
+        self.lock = threading.Lock()
 
-def _clean_ios_actool_artifacts():
-    """Clean corrupted iOS actool artifacts that can cause build failures."""
-    artifacts_dir = os.path.join(ROOT, '.artifacts')
-    if not os.path.exists(artifacts_dir):
-        return
-    # Remove all actool directories and corrupted plist files
-    # Use shutil.rmtree for more reliable cleanup
-    import shutil
-    actool_paths_to_remove = []
-    plist_paths_to_remove = []
-    
-    # Walk the artifacts directory and collect all actool directories and plist files
-    for root, dirs, files in os.walk(artifacts_dir):
-        # Collect actool directories to remove
-        for d in dirs:
-            if d == 'actool':
-                actool_paths_to_remove.append(os.path.join(root, d))
-        # Collect corrupted plist files to remove
-        for f in files:
-            if f == 'asset-manifest.plist':
-                plist_paths_to_remove.append(os.path.join(root, f))
-    
-    # Remove actool directories (this will also remove any plist files inside them)
-    for actool_path in actool_paths_to_remove:
-        try:
-            if os.path.exists(actool_path):
-                shutil.rmtree(actool_path, ignore_errors=True)
-        except Exception:
-            pass
-    
-    # Remove any remaining corrupted plist files (outside actool directories)
-    for plist_path in plist_paths_to_remove:
-        try:
-            if os.path.exists(plist_path):
-                os.remove(plist_path)
-        except Exception:
-            pass
-    
-    # Also clean any parent directories that might be empty after cleanup
-    # This helps prevent stale directory structures
-    for actool_path in actool_paths_to_remove:
-        try:
+    def sanitize(self, names=None, sandbox=None):
+        """Sanitize the trees of the given project names (all projects if None).
+
+        Names are matched case-insensitively. With a sandbox, only that
+        sandbox's obj tree of each project is touched.
+        """
+        if not os.path.isdir(self.root):
+            return
+        with self.lock:
+            for entry in os.scandir(self.root):
+                if entry.name.startswith('.') or not entry.is_dir(follow_symlinks=False):
+                    continue
+                if names is not None and entry.name.lower() not in names:
+                    continue
+                check_xml = entry.name.lower() in ANDROID_BINDING_KEYS
+                if sandbox:
+                    self._scan(os.path.join(entry.path, 'obj', sandbox.net_version), check_xml, True)
+                else:
+                    self._scan(entry.path, check_xml, False)
+
+    def _scan(self, top, check_xml, in_obj):
+        removed_actool = []
+        stack = [(top, in_obj)]
+        while stack:
+            path, under_obj = stack.pop()
+            try:
+                entries = os.scandir(path)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name == 'actool':
+                                shutil.rmtree(entry.path, ignore_errors=True)
+                                removed_actool.append(entry.path)
+                            else:
+                                stack.append((entry.path, under_obj or entry.name == 'obj'))
+                        elif entry.name == 'asset-manifest.plist':
+                            os.remove(entry.path)
+                        elif check_xml and under_obj and entry.name.endswith('.xml'):
+                            self._check_xml(entry)
+                    except OSError:
+                        # If we can't check/remove, continue - better to leave it than crash
+                        pass
+
+        # Also clean any parent directories that are empty after cleanup, to
+        # prevent stale directory structures (up to 3 levels, never above top)
+        for actool_path in removed_actool:
             parent = os.path.dirname(actool_path)
-            # Try to remove empty parent directories up to 3 levels deep
             for _ in range(3):
-                if os.path.exists(parent) and not os.listdir(parent):
+                if len(parent) <= len(top):
+                    break
+                try:
                     os.rmdir(parent)
-                    parent = os.path.dirname(parent)
-                else:
+                except OSError:
                     break
-        except Exception:
-            pass
+                parent = os.path.dirname(parent)
 
-def _clean_ios_obj_artifacts(csproj, config):
-    """Clean iOS-specific obj directories that might contain corrupted actool artifacts."""
-    import shutil
-    import os.path
-    
-    # Extract project name from csproj path
-    csproj_name = os.path.basename(csproj).replace('.csproj', '')
-    artifacts_obj_dir = os.path.join(ROOT, '.artifacts', csproj_name, 'obj', config)
-    
-    if not os.path.exists(artifacts_obj_dir):
+    def _check_xml(self, entry):
+        st = entry.stat(follow_symlinks=False)
+        signature = (st.st_size, st.st_mtime_ns)
+        if self.valid_xml.get(entry.path) == signature:
+            return
+        self.valid_xml.pop(entry.path, None)
+        # Empty files are definitely corrupted
+        if st.st_size == 0:
+            os.remove(entry.path)
+            return
+        # Valid XML starts with '<' (element or '<?xml' declaration) after an
+        # optional BOM and whitespace
+        with open(entry.path, 'rb') as check_file:
+            first_text = check_file.read(50).decode('utf-8', errors='ignore').lstrip('\ufeff').strip()
+        if first_text.startswith('<'):
+            self.valid_xml[entry.path] = signature
+        else:
+            os.remove(entry.path)
+
+ANDROID_BINDING_KEYS = {name.lower() for name in ANDROID_BINDING_NAMES}
+
+_ARTIFACT_SANITIZER = ArtifactSanitizer()
+
+def sanitize_artifacts(csproj=None, sandbox=None, references=True):
+    """Sanitize .artifacts for a build of `csproj` and everything it references.
+
+    Without a csproj, every project tree is sanitized. With `references`
+    False only the project's own tree is, for builds that skip them.
+    """
+    names = None
+    if csproj:
+        keys = (project_reference_closure(csproj) if references else set()) | {_project_key(csproj)}
+        names = {os.path.basename(key)[:-len('.csproj')] for key in keys}
+    with _TRACE.span('sanitize', 'sanitize', project=csproj, net=sandbox.net_version if sandbox else None):
+        _ARTIFACT_SANITIZER.sanitize(names, sandbox)
+
+# How artifacts_copy mirrors .artifacts (--mirror). copy, hardlink and symlink
+# are handed to the CopyArtifactsToVisibleFolder target, which falls back to a
+# copy where a link can't be made (e.g. across filesystems). reflink and view
+# switch the target off and are mirrored by mirror_artifacts after each build.
+MIRROR_MODES = ['copy', 'hardlink', 'symlink', 'reflink', 'view']
+MIRROR_MODE = 'copy'
+
+# Linux FICLONE ioctl: share the source's data blocks (btrfs, xfs, ...)
+FICLONE = 0x40049409
+# macOS clonefile(2) for APFS
+_CLONEFILE = getattr(ctypes.CDLL(None, use_errno=True), 'clonefile', None) if sys.platform == 'darwin' else None
+
+def mirror_build_args():
+    if MIRROR_MODE == 'copy':
+        return ()
+    return ('-p:ArtifactsMirrorMode=%s' % ('none' if MIRROR_MODE in ('reflink', 'view') else MIRROR_MODE),)
+
+def _mirror_project_names(csproj, references=True):
+    """Return the .artifacts directory names of `csproj` and (with `references`) everything it references."""
+    keys = project_reference_closure(csproj) if references else set()
+    # Closure keys are lower-cased, so take the real casing from .artifacts
+    try:
+        existing = {entry.lower(): entry for entry in os.listdir(ARTIFACTS_OUTPUT_DIR)}
+    except OSError:
+        existing = {}
+    names = [os.path.basename(csproj).replace('.csproj', '')]
+    for key in sorted(keys):
+        name = existing.get(os.path.basename(key)[:-len('.csproj')])
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def _mirror_dirs(name, sandbox):
+    """Return the (bin, obj) mirror directories of project `name`, as laid out by Directory.Build.props."""
+    parts = [name, sandbox.net_version] if sandbox else [name]
+    return os.path.join(ARTIFACTS_COPY_BIN_DIR, *parts), os.path.join(ARTIFACTS_COPY_OBJ_DIR, *parts)
+
+def _drop_view(path):
+    """Remove a directory view left at `path` (or its parent) by an earlier --mirror view build."""
+    for candidate in (os.path.dirname(path), path):
+        if os.path.islink(candidate):
+            os.remove(candidate)
+
+def _link_view(link, target):
+    """Point `link` at `target`, replacing any mirror an earlier mode left there."""
+    relative = os.path.relpath(target, os.path.dirname(link))
+    if os.path.islink(link) and os.readlink(link) == relative:
         return
-    
-    # Find all iOS-related subdirectories (net8.0-ios, net10.0-ios, etc.)
-    for item in os.listdir(artifacts_obj_dir):
-        item_path = os.path.join(artifacts_obj_dir, item)
-        if os.path.isdir(item_path) and 'ios' in item.lower():
-            # Clean actool directories within iOS obj directories
-            for root, dirs, files in os.walk(item_path):
-                for d in dirs:
-                    if d == 'actool':
-                        actool_path = os.path.join(root, d)
-                        try:
-                            if os.path.exists(actool_path):
-                                shutil.rmtree(actool_path, ignore_errors=True)
-                        except Exception:
-                            pass
-                for f in files:
-                    if f == 'asset-manifest.plist':
-                        plist_path = os.path.join(root, f)
-                        try:
-                            if os.path.exists(plist_path):
-                                os.remove(plist_path)
-                        except Exception:
-                            pass
-
-def _clean_android_binding_artifacts():
-    """Clean Android binding artifacts that might contain corrupted XML files.
-
-    This prevents 'Root element is missing' errors when building SDKs that depend
-    on Android bindings, especially when switching between net8 and net10 builds.
+    _drop_view(link)
+    if os.path.isdir(link):
+        shutil.rmtree(link)
+    os.makedirs(os.path.dirname(link), exist_ok=True)
+    os.symlink(relative, link)
+
+def _clone_file(src, dst):
+    """Reflink `src` to `dst` (which must not exist); False when the filesystem can't."""
+    if _CLONEFILE:
+        return _CLONEFILE(os.fsencode(src), os.fsencode(dst), 0) == 0
+    try:
+        with open(src, 'rb') as src_file, open(dst, 'xb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(dst)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+def _reflink_tree(src_root, dst_root):
+    """Mirror the files under `src_root` into `dst_root` with reflinks.
+
+    Files whose size and mtime already match are skipped, like the Copy task's
+    SkipUnchangedFiles. Returns (bytes cloned, bytes copied) for the rest.
+    """
+    cloned = 0
+    copied = 0
+    for dirpath, _, filenames in os.walk(src_root):
+        dst_dir = os.path.normpath(os.path.join(dst_root, os.path.relpath(dirpath, src_root)))
+        os.makedirs(dst_dir, exist_ok=True)
+        for filename in filenames:
+            src = os.path.join(dirpath, filename)
+            dst = os.path.join(dst_dir, filename)
+            try:
+                src_st = os.stat(src)
+            except OSError:
+                continue
+            try:
+                dst_st = os.lstat(dst)
+            except OSError:
+                dst_st = None
+            if dst_st:
+                if (dst_st.st_size, dst_st.st_mtime_ns) == (src_st.st_size, src_st.st_mtime_ns):
+                    continue
+                os.remove(dst)
+            if _clone_file(src, dst):
+                cloned += src_st.st_size
+            else:
+                shutil.copy2(src, dst)
+                copied += src_st.st_size
+    return cloned, copied
+
+def measure_mirror(path):
+    """Return (bytes shared with .artifacts, bytes held as separate copies) under mirror `path`.
+
+    Symlinks and hardlinked files count as shared. Reflinks look like plain
+    files to stat, so they count as copies here.
+    """
+    if os.path.islink(path):
+        return measure_tree(os.path.realpath(path))[1], 0
+    shared = 0
+    copied = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_symlink():
+                        shared += entry.stat().st_size
+                    elif entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        st = entry.stat(follow_symlinks=False)
+                        if st.st_nlink > 1:
+                            shared += st.st_size
+                        else:
+                            copied += st.st_size
+                except OSError:
+                    pass
+    return shared, copied
+
+def drop_mirror_views(csproj, sandbox=None, references=True):
+    """Remove the directory views of `csproj` (and its references) before a build in another mode,
+    which would otherwise write its mirror through them into .artifacts.
     """
-    import shutil
+    for name in _mirror_project_names(csproj, references):
+        for mirror in _mirror_dirs(name, sandbox):
+            _drop_view(mirror)
 
-    # List of Android binding projects that might have corrupted XML artifacts
-    android_binding_names = [
-        CORE_BINDING_ANDROID_NAME,
-        TEST_BINDING_ANDROID_NAME,
-        OAID_BINDING_ANDROID_NAME,
-        META_REFERRER_BINDING_ANDROID_NAME,
-        GOOGLE_LVL_BINDING_ANDROID_NAME
-    ]
+def mirror_artifacts(csproj, config, sandbox=None, references=True):
+    """Populate artifacts_copy for `csproj` (and its references) in the reflink and view modes,
+    and report how many bytes the mirror shares with .artifacts.
 
-    for binding_name in android_binding_names:
-        artifacts_obj_dir = os.path.join(ROOT, '.artifacts', binding_name, 'obj')
+    Returns (bytes shared, bytes copied).
+    """
+    with _TRACE.span('mirror', 'mirror', project=csproj, mode=MIRROR_MODE,
+                     net=sandbox.net_version if sandbox else None) as attrs:
+        shared = 0
+        copied = 0
+        for name in _mirror_project_names(csproj, references):
+            bin_src = os.path.join(ARTIFACTS_OUTPUT_DIR, name, 'bin')
+            obj_src = os.path.join(ARTIFACTS_OUTPUT_DIR, name, 'obj', *([sandbox.net_version] if sandbox else []))
+            bin_mirror, obj_mirror = _mirror_dirs(name, sandbox)
+            if MIRROR_MODE == 'view':
+                # The view shows the whole bin/ and obj/ trees, {Config}/{TFM}/ levels included
+                _link_view(bin_mirror, bin_src)
+                _link_view(obj_mirror, obj_src)
+            elif MIRROR_MODE == 'reflink':
+                # Flattened like CopyArtifactsToVisibleFolder: every TFM of the config lands in one mirror
+                prefix = sandbox.net_version + '.' if sandbox else ''
+                try:
+                    tfms = sorted(tfm for tfm in os.listdir(os.path.join(bin_src, config)) if tfm.startswith(prefix))
+                except OSError:
+                    tfms = []
+                for tfm in tfms:
+                    for src, dst in ((os.path.join(bin_src, config, tfm), bin_mirror),
+                                     (os.path.join(obj_src, config, tfm), obj_mirror)):
+                        cloned, written = _reflink_tree(src, dst)
+                        shared += cloned
+                        copied += written
+                continue
+            for mirror in (bin_mirror, obj_mirror):
+                mirror_shared, mirror_copied = measure_mirror(mirror)
+                shared += mirror_shared
+                copied += mirror_copied
+        attrs['shared'] = shared
+        attrs['copied'] = copied
+    if MIRROR_MODE == 'reflink':
+        log('> artifacts_copy (reflink) for %s: %s cloned, %s copied' % (
+            os.path.basename(csproj), format_size(shared), format_size(copied)))
+    else:
+        log('> artifacts_copy (%s) for %s: %s shared with .artifacts, %s copied' % (
+            MIRROR_MODE, os.path.basename(csproj), format_size(shared), format_size(copied)))
+    return shared, copied
+
+CLEAN_TRASH_DIR = os.path.join(ARTIFACTS_OUTPUT_DIR, '.trash')
 
-        if not os.path.exists(artifacts_obj_dir):
+def find_clean_paths(subdir=None):
+    """Find what `clean_target` removes under `subdir` in a single walk.
+
+    That is every bin/ and obj/ directory (not descending into them), plus
+    any iOS actool directories and asset-manifest.plist files outside them.
+    """
+    search_root = os.path.join(ROOT, subdir) if subdir else ROOT
+    paths = []
+    stack = [search_root]
+    while stack:
+        path = stack.pop()
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.path == CLEAN_TRASH_DIR:
+                            continue
+                        if entry.name in ('bin', 'obj', 'actool'):
+                            paths.append(entry.path)
+                        else:
+                            stack.append(entry.path)
+                    elif entry.name == 'asset-manifest.plist':
+                        paths.append(entry.path)
+                except OSError:
+                    pass
+    return sorted(paths)
+
+def measure_tree(path):
+    """Return (file count, bytes) of everything under `path`, without following symlinks."""
+    files = 0
+    size = 0
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            if not os.path.isdir(current) or os.path.islink(current):
+                files += 1
+                size += os.lstat(current).st_size
+                continue
+            entries = os.scandir(current)
+        except OSError:
             continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        files += 1
+                        size += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass
+    return files, size
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return '%.1f %s' % (size, unit) if unit != 'B' else '%d B' % size
+        size /= 1024
+
+class BackgroundDeleter:
+    """Deletes directory trees on a thread pool without blocking the caller.
+
+    Each path is first renamed into .artifacts/.trash, so it is gone from
+    its original location as soon as `delete` returns and a following
+    build can start right away. The renamed trees are then removed in
+    parallel in the background. Paths that cannot be renamed (e.g. they
+    are on another file system) are removed on the pool before `delete`
+    returns.
+
+    With `use_trash` (--trash) and the `trash` CLI on PATH, the renamed
+    trees are handed to `trash` on the pool instead of being removed, so
+    they stay recoverable without `delete` waiting for it.
+    """
 
-        # Clean corrupted XML files in obj directories
-        # These can be empty or incomplete when builds are interrupted or when
-        # switching between .NET versions
-        for root, dirs, files in os.walk(artifacts_obj_dir):
-            for f in files:
-                # Check for potentially corrupted XML files
-                if f.endswith('.xml'):
-                    xml_path = os.path.join(root, f)
-                    try:
-                        if os.path.exists(xml_path):
-                            file_size = os.path.getsize(xml_path)
-                            # Empty files are definitely corrupted
-                            if file_size == 0:
-                                os.remove(xml_path)
-                                continue
-
-                            # Read first bytes to check if it's valid XML
-                            # Valid XML should start with '<' or have XML declaration '<?xml'
-                            with open(xml_path, 'rb') as check_file:
-                                first_bytes = check_file.read(50)  # Read more to handle BOM/whitespace
-                                first_text = first_bytes.decode('utf-8', errors='ignore').strip()
-
-                                # Check if it starts with valid XML content
-                                # Allow for BOM, whitespace, and XML declaration
-                                if not (first_text.startswith('<') or first_text.startswith('<?xml')):
-                                    # Not valid XML - likely corrupted
-                                    os.remove(xml_path)
-                    except Exception:
-                        # If we can't check/remove, continue - better to leave it than crash
-                        pass
+    def __init__(self, trash_dir=CLEAN_TRASH_DIR, workers=None, use_trash=False):
+        self.trash_dir = trash_dir
+        self.use_trash = use_trash
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.executor = None
+        self.pending = []
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def _start(self):
+        with self.lock:
+            if self.executor is not None:
+                return
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='clean')
+            # Reclaim trees left behind by an interrupted earlier run
+            if os.path.isdir(self.trash_dir):
+                for entry in os.scandir(self.trash_dir):
+                    self.pending.append(self.executor.submit(_remove_path, entry.path))
+
+    def _submit(self, path, staged=False):
+        trash = shutil.which('trash') if self.use_trash else None
+        with self.lock:
+            if trash and staged:
+                future = self.executor.submit(_trash_staged, trash, path)
+            else:
+                future = self.executor.submit(_remove_path, os.path.dirname(path) if staged else path)
+            self.pending.append(future)
+            return future
+
+    def _stage(self, path):
+        with self.lock:
+            self.counter += 1
+            # A directory per path keeps the original name for the system trash
+            slot = os.path.join(self.trash_dir, '%d-%d' % (os.getpid(), self.counter))
+        staged = os.path.join(slot, os.path.basename(path))
+        try:
+            os.makedirs(slot, exist_ok=True)
+            os.rename(path, staged)
+            return staged
+        except OSError:
+            _remove_path(slot)
+            return None
+
+    def delete(self, paths):
+        self._start()
+        in_place = []
+        for path in paths:
+            if not os.path.lexists(path):
+                continue
+            staged = self._stage(path)
+            if staged:
+                self._submit(staged, staged=True)
+            else:
+                in_place.append(self._submit(path))
+        for future in in_place:
+            future.result()
+
+    def wait(self):
+        """Block until all background deletions have finished."""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if pending and not all(future.done() for future in pending):
+            log('> Waiting for %d background deletion(s) to finish' % len(pending))
+            with _TRACE.span('background deletion', 'clean', pending=len(pending)):
+                for future in pending:
+                    future.result()
+        try:
+            os.rmdir(self.trash_dir)
+        except OSError:
+            pass
+
+def _remove_path(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _trash_staged(trash, path):
+    with _TRACE.span('trash %s' % os.path.basename(path), 'clean', path=path):
+        subprocess.run([trash, path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # Whatever trash could not move goes with its staging directory
+    _remove_path(os.path.dirname(path))
+
+_BACKGROUND_DELETER = BackgroundDeleter()
+
+def report_clean(paths):
+    total_files = 0
+    total_size = 0
+    for path in paths:
+        files, size = measure_tree(path)
+        total_files += files
+        total_size += size
+        print('>   %s (%d files, %s)' % (path, files, format_size(size)))
+    print('> dry-run: would remove %d files, %s' % (total_files, format_size(total_size)))
 
 def clean_target(dry, subdir=None):
+    with _TRACE.span('clean %s' % os.path.basename(subdir or ROOT), 'clean', path=subdir, dry=dry):
+        _clean_target(dry, subdir)
+
+def _clean_target(dry, subdir):
+    paths = find_clean_paths(subdir)
     if dry:
-        print('> dry-run: listing bin/ and obj/ directories under %s' % subdir)
-        subprocess.run(find_bin_obj_dirs_cmd(subdir) + ['-print'])
+        print('> dry-run: bin/ and obj/ directories under %s' % subdir)
+        report_clean(paths)
         return
-    if which('trash'):
-        print('> trash bin/ and obj/ directories under %s' % subdir)
-        subprocess.run(find_bin_obj_dirs_cmd(subdir) + ['-exec', 'trash', '{}', '+'])
-    else:
-        print('> rm -rf bin/ and obj/ directories under %s' % subdir)
-        subprocess.run(find_bin_obj_dirs_cmd(subdir) + ['-exec', 'rm', '-rf', '{}', '+'])
-    # Also clean any corrupted iOS actool artifacts that might cause build failures
-    # This handles cases where actool creates corrupted plist files or fails to create them
-    if subdir and os.path.exists(subdir):
-        # Remove any corrupted asset-manifest.plist files and actool directories
-        plist_cleanup = ['find', subdir, '-type', 'f', '-name', 'asset-manifest.plist', '-delete']
-        subprocess.run(plist_cleanup, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
-        # Remove actool directories that might have corrupted state
-        actool_cleanup = ['find', subdir, '-type', 'd', '-name', 'actool', '-exec', 'rm', '-rf', '{}', '+']
-        subprocess.run(actool_cleanup, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    print('> removing bin/ and obj/ directories under %s' % subdir)
+    _BACKGROUND_DELETER.delete(paths)
+
 def clean_artifacts_copy(dry, subdir_list: list[str]):
+    with _TRACE.span('clean artifacts_copy', 'clean', paths=subdir_list, dry=dry):
+        _clean_artifacts_copy(dry, subdir_list)
+
+def _clean_artifacts_copy(dry, subdir_list):
+    paths = [os.path.join(ROOT, subdir) for subdir in subdir_list]
     if dry:
-        print('> dry-run: listing files under %s' % subdir_list)
-        subprocess.run(find_files_cmd(subdir_list) + ['-print'])
+        print('> dry-run: directories %s' % subdir_list)
+        report_clean([path for path in paths if os.path.lexists(path)])
         return
-    if which('trash'):
-        print('> trash directories: %s' % subdir_list)
-        for subdir in subdir_list:
-            subprocess.run(['trash', subdir])
-    else:
-        print('> rm -rf directories: %s' % subdir_list)
-        for subdir in subdir_list:
-            subprocess.run(['rm', '-rf', subdir])
+    print('> removing directories: %s' % subdir_list)
+    _BACKGROUND_DELETER.delete(paths)
 
 if __name__ == '__main__':
     sys.exit(main(sys.argv[1:]))
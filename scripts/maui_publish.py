@@ -2,10 +2,22 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import glob
+import hashlib
+import json
 import os
+import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
@@ -20,10 +32,14 @@ DOT_NUGET = os.path.join(os.path.expanduser('~'), '.nuget')
 NUGET_LOCAL_SOURCE = os.path.join(DOT_NUGET, 'local')
 ARTIFACTS_OUTPUT_DIR = os.path.join(ROOT, '.artifacts')
 
-ADJUST_CORE_NUGET_INSTALLED = os.path.join(DOT_NUGET, 'packages', 'adjust.maui.sdk')
-ADJUST_OAID_NUGET_INSTALLED = os.path.join(DOT_NUGET, 'packages', 'adjust.maui.sdk.oaid')
-ADJUST_META_REFERRER_NUGET_INSTALLED = os.path.join(DOT_NUGET, 'packages', 'adjust.maui.sdk.meta.referrer')
-ADJUST_GOOGLE_LVL_NUGET_INSTALLED = os.path.join(DOT_NUGET, 'packages', 'adjust.maui.sdk.google.lvl')
+# nuget pack writes here first; packages only leave it once every pack succeeded
+PACK_STAGING_DIR = os.path.join(ARTIFACTS_OUTPUT_DIR, 'nupkg_staging')
+
+# The publish pipeline keeps its packages and the fingerprints of its finished stages here
+PUBLISH_OUTPUT_DIR = os.path.join(ARTIFACTS_OUTPUT_DIR, 'nupkg_publish')
+PUBLISH_STATE_FILE = os.path.join(ARTIFACTS_OUTPUT_DIR, 'publish_state.json')
+
+NUGET_PACKAGES_DIR = os.path.join(DOT_NUGET, 'packages')
 
 def run(cmd):
     print('> ' + ' '.join(cmd))
@@ -62,56 +78,742 @@ def read_env(key):
     return os.environ.get(key, '')
 '''
 
-def read_version(nuspec_file):
-    with open(nuspec_file, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith("<version>") and line.endswith("</version>"):
-                # parse the middle content
-                return line[len("<version>") : -len("</version>")].strip()
-    return ''
-
-def pack(config, target):
-    if target == 'core' or target == 'all':
-        print('> Packing Core SDK')
-        run(['nuget', 'pack', ADJUST_CORE_NUSPEC, '-properties', 'Configuration=%s' % config])
-    if target == 'oaid' or target == 'all':
-        print('> Packing OAID SDK plugin')
-        run(['nuget', 'pack', ADJUST_OAID_NUSPEC, '-properties', 'Configuration=%s' % config])
-    if target == 'meta_referrer' or target == 'all':
-        print('> Packing Meta Referrer SDK plugin')
-        run(['nuget', 'pack', ADJUST_META_REFERRER_NUSPEC, '-properties', 'Configuration=%s' % config])
-    if target == 'google_lvl' or target == 'all':
-        print('> Packing Google LVL SDK plugin')
-        run(['nuget', 'pack', ADJUST_GOOGLE_LVL_NUSPEC, '-properties', 'Configuration=%s' % config])
-
-def copy(target):
-    if target == 'core' or target == 'all':
-        print('> Copying Core SDK')
-        run(['cp', 'Adjust.Maui.Sdk.%s.nupkg' % read_version(ADJUST_CORE_NUSPEC), NUGET_LOCAL_SOURCE])
-    if target == 'oaid' or target == 'all':
-        print('> Copying OAID SDK plugin')
-        run(['cp', 'Adjust.Maui.Sdk.Oaid.%s.nupkg' % read_version(ADJUST_OAID_NUSPEC), NUGET_LOCAL_SOURCE])
-    if target == 'meta_referrer' or target == 'all':
-        print('> Copying Meta Referrer SDK plugin')
-        run(['cp', 'Adjust.Maui.Sdk.Meta.Referrer.%s.nupkg' % read_version(ADJUST_META_REFERRER_NUSPEC), NUGET_LOCAL_SOURCE])
-    if target == 'google_lvl' or target == 'all':
-        print('> Copying Google LVL SDK plugin')
-        run(['cp', 'Adjust.Maui.Sdk.Google.LVL.%s.nupkg' % read_version(ADJUST_GOOGLE_LVL_NUSPEC), NUGET_LOCAL_SOURCE])
+class Nuspec:
+    """What the scripts need from a .nuspec: id, version, dependencies and files.
+
+    `dependency_groups` maps a target framework ('' for ungrouped
+    dependencies) to [(id, version range)]; `files` is [(src, target)] as
+    written in the nuspec, before token replacement.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.id = ''
+        self.version = ''
+        self.dependency_groups = {}
+        self.files = []
+
+    @property
+    def package_file_name(self):
+        return '%s.%s.nupkg' % (self.id, self.version)
+
+    @property
+    def installed_dir(self):
+        # The global packages folder uses lowercase ids
+        return os.path.join(NUGET_PACKAGES_DIR, self.id.lower())
+
+    @property
+    def installed_version_dir(self):
+        return os.path.join(self.installed_dir, normalized_version(self.version))
+
+def normalized_version(version):
+    """Version as NuGet names its global packages folder: '5.5' -> '5.5.0', '5.5.0.0' -> '5.5.0'."""
+    version = version.split('+', 1)[0]
+    release, _, prerelease = version.partition('-')
+    parts = release.split('.')
+    parts += ['0'] * (3 - len(parts))
+    if len(parts) == 4 and int(parts[3]) == 0:
+        parts = parts[:3]
+    normalized = '.'.join(str(int(part)) for part in parts)
+    return (normalized + '-' + prerelease if prerelease else normalized).lower()
+
+_NUSPEC_CACHE = {}
+_NUSPEC_CACHE_LOCK = threading.Lock()
+
+def _parse_nuspec(nuspec_file):
+    nuspec = Nuspec(nuspec_file)
+    path = []
+    group = None
+    for event, element in ET.iterparse(nuspec_file, events=('start', 'end')):
+        name = element.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            path.append(name)
+            if path[-2:] == ['dependencies', 'group']:
+                group = element.get('targetFramework', '')
+                nuspec.dependency_groups.setdefault(group, [])
+            continue
+        if path[-2:] == ['metadata', 'id']:
+            nuspec.id = (element.text or '').strip()
+        elif path[-2:] == ['metadata', 'version']:
+            nuspec.version = (element.text or '').strip()
+        elif name == 'dependency' and 'dependencies' in path:
+            dependencies = nuspec.dependency_groups.setdefault(group if path[-2] == 'group' else '', [])
+            dependencies.append((element.get('id', ''), element.get('version', '')))
+        elif path[-2:] == ['files', 'file']:
+            nuspec.files.append((element.get('src', ''), element.get('target', '')))
+        elif path[-2:] == ['dependencies', 'group']:
+            group = None
+        path.pop()
+        # Parsed elements are not needed anymore; drop them as we go
+        element.clear()
+    return nuspec
+
+def load_nuspec(nuspec_file):
+    """Return the Nuspec for `nuspec_file`, parsed again only once the file changed."""
+    st = os.stat(nuspec_file)
+    key = (st.st_mtime_ns, st.st_size)
+    with _NUSPEC_CACHE_LOCK:
+        cached = _NUSPEC_CACHE.get(nuspec_file)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    nuspec = _parse_nuspec(nuspec_file)
+    with _NUSPEC_CACHE_LOCK:
+        _NUSPEC_CACHE[nuspec_file] = (key, nuspec)
+    return nuspec
+
+PACKAGES = {
+    'core': ('Core SDK', ADJUST_CORE_NUSPEC),
+    'oaid': ('OAID SDK plugin', ADJUST_OAID_NUSPEC),
+    'meta_referrer': ('Meta Referrer SDK plugin', ADJUST_META_REFERRER_NUSPEC),
+    'google_lvl': ('Google LVL SDK plugin', ADJUST_GOOGLE_LVL_NUSPEC),
+}
+
+_OUTPUT_LOCK = threading.Lock()
+
+# Selected with --packer; 'auto' uses the nuget CLI when it is installed
+PACKER = 'auto'
+
+NUSPEC_NAMESPACE = 'http://schemas.microsoft.com/packaging/2012/06/nuspec.xsd'
+CONTENT_TYPES_NAMESPACE = 'http://schemas.openxmlformats.org/package/2006/content-types'
+RELATIONSHIPS_NAMESPACE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+MANIFEST_RELATIONSHIP = 'http://schemas.microsoft.com/packaging/2010/07/manifest'
+CORE_PROPERTIES_RELATIONSHIP = 'http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties'
+CORE_PROPERTIES_CONTENT_TYPE = 'application/vnd.openxmlformats-package.core-properties+xml'
+RELATIONSHIPS_CONTENT_TYPE = 'application/vnd.openxmlformats-package.relationships+xml'
+
+# Files at least this large are stored with zip64 extensions
+ZIP64_LIMIT = 2 ** 31 - 1
+
+def package_file_name(nuspec_file):
+    return load_nuspec(nuspec_file).package_file_name
+
+def selected_packages(target):
+    return [key for key in PACKAGES if target == key or target == 'all']
+
+MAUI_BUILD_SCRIPT = os.path.join(ROOT, 'scripts', 'maui_build.py')
+
+# Directories skipped when looking for the newest source file of a project
+PROJECT_OUTPUT_DIRS = {'bin', 'obj', '.vs'}
+
+class ArtifactIndex:
+    """Stat cache for the inputs listed in the nuspec files.
+
+    Everything below .artifacts is indexed with a single scandir walk the
+    first time one of its paths is looked up; other inputs (AARs, README.md
+    ...) are stat'ed once each. Project source trees are walked at most
+    once to find their newest file, which decides whether an artifact built
+    from them is stale.
+    """
+
+    def __init__(self, artifacts_dir=ARTIFACTS_OUTPUT_DIR):
+        self.artifacts_dir = artifacts_dir
+        self._artifacts = None
+        self._stats = {}
+        self._project_dirs = None
+        self._newest_sources = {}
+        self._source_digests = {}
+
+    def _index_artifacts(self):
+        self._artifacts = {}
+        pending = [self.artifacts_dir]
+        while pending:
+            try:
+                it = os.scandir(pending.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file():
+                        st = entry.stat()
+                        self._artifacts[entry.path] = (st.st_size, st.st_mtime_ns)
+
+    def stat(self, path):
+        """Return (size, mtime_ns) for `path`, or None when it does not exist."""
+        if path.startswith(self.artifacts_dir + os.sep):
+            if self._artifacts is None:
+                self._index_artifacts()
+            return self._artifacts.get(path)
+        if path not in self._stats:
+            try:
+                st = os.stat(path)
+                self._stats[path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                self._stats[path] = None
+        return self._stats[path]
+
+    def project_dir(self, project_name):
+        if self._project_dirs is None:
+            self._project_dirs = {}
+            for csproj in glob.glob(os.path.join(ROOT, '*', '*.csproj')) + glob.glob(os.path.join(ROOT, '*', '*', '*.csproj')):
+                name = os.path.splitext(os.path.basename(csproj))[0]
+                self._project_dirs.setdefault(name, os.path.dirname(csproj))
+        return self._project_dirs.get(project_name)
+
+    def newest_source(self, project_dir):
+        """Return (mtime_ns, path) of the newest file of the project, outside its build output."""
+        if project_dir not in self._newest_sources:
+            newest = (0, None)
+            pending = [project_dir]
+            while pending:
+                try:
+                    it = os.scandir(pending.pop())
+                except OSError:
+                    continue
+                with it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in PROJECT_OUTPUT_DIRS:
+                                pending.append(entry.path)
+                        elif entry.is_file():
+                            mtime = entry.stat().st_mtime_ns
+                            if mtime > newest[0]:
+                                newest = (mtime, entry.path)
+            self._newest_sources[project_dir] = newest
+        return self._newest_sources[project_dir]
+
+    def source_digest(self, project_dir):
+        """Return a content hash of the files of the project, outside its build output."""
+        if project_dir not in self._source_digests:
+            sha = hashlib.sha256()
+            for dirpath, dirnames, filenames in os.walk(project_dir):
+                dirnames[:] = sorted(d for d in dirnames if d not in PROJECT_OUTPUT_DIRS)
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        with open(path, 'rb') as f:
+                            sha.update(os.path.relpath(path, project_dir).encode('utf-8') + b'\0')
+                            for block in iter(lambda: f.read(1 << 20), b''):
+                                sha.update(block)
+                    except OSError:
+                        continue
+            self._source_digests[project_dir] = sha.hexdigest()
+        return self._source_digests[project_dir]
+
+def _target_framework(target):
+    # lib/<tfm>/File.dll -> <tfm>; files at the package root have none
+    parts = target.replace('\\', '/').strip('/').split('/')
+    return parts[1] if len(parts) > 2 and parts[0] == 'lib' else ''
+
+def read_nuspec_files(nuspec_file, properties=None):
+    """Return [(source path, target)] for the <file> entries of a nuspec, wildcards unexpanded."""
+    files = []
+    for src, target in load_nuspec(nuspec_file).files:
+        src = _replace_tokens(src, properties or {}).replace('\\', '/')
+        files.append((os.path.join(os.path.dirname(nuspec_file), src), target))
+    return files
+
+def find_invalid_inputs(keys, index, properties=None):
+    """Check the nuspec inputs of the given packages against `index`.
+
+    Returns {tfm: [(package key, path, reason)]} where reason is 'missing'
+    or 'stale' (an .artifacts output older than a source of its project).
+    """
+    problems = {}
+    for key in keys:
+        for path, target in read_nuspec_files(PACKAGES[key][1], properties):
+            if glob.has_magic(path):
+                continue
+            st = index.stat(path)
+            reason = None
+            if st is None:
+                reason = 'missing'
+            elif path.startswith(index.artifacts_dir + os.sep):
+                project_name = os.path.relpath(path, index.artifacts_dir).split(os.sep, 1)[0]
+                project_dir = index.project_dir(project_name)
+                if project_dir is not None and index.newest_source(project_dir)[0] > st[1]:
+                    reason = 'stale'
+            if reason is not None:
+                problems.setdefault(_target_framework(target), []).append((key, path, reason))
+    return problems
+
+def report_invalid_inputs(problems):
+    lines = []
+    for tfm in sorted(problems):
+        entries = problems[tfm]
+        missing = sum(1 for _, _, reason in entries if reason == 'missing')
+        lines.append('> %s: %d missing, %d stale' % (tfm or 'package root', missing, len(entries) - missing))
+        for key, path, reason in entries:
+            lines.append('    %-7s %s (%s)' % (reason, os.path.relpath(path, ROOT), PACKAGES[key][0]))
+    # Keep the report in one block when publish stages run concurrently
+    with _OUTPUT_LOCK:
+        print('\n'.join(lines), flush=True)
+
+def build_missing_inputs(problems, config):
+    """Run maui_build.py sdk for the packages and .NET versions with missing or stale outputs."""
+    keys = []
+    net_versions = set()
+    for tfm, entries in problems.items():
+        for key, path, _ in entries:
+            if not path.startswith(ARTIFACTS_OUTPUT_DIR + os.sep):
+                continue
+            if key not in keys:
+                keys.append(key)
+            if tfm:
+                net_versions.add(tfm.split('.', 1)[0])
+    if not keys:
+        return False
+    targets = keys[:]
+    # maui_build.py builds one .NET version when asked for it, otherwise all of them
+    if len(net_versions) == 1:
+        targets += list(net_versions)
+    targets.append(config.lower())
+    run([sys.executable, MAUI_BUILD_SCRIPT, 'sdk'] + targets)
+    return True
+
+def validate_inputs(keys, config, build_missing=False):
+    """Make sure every file the nuspecs of `keys` list is there and up to date before packing.
+
+    Missing files abort (after building them, with `build_missing`);
+    stale ones are reported but do not stop packing.
+    """
+    start = time.monotonic()
+    properties = {'configuration': config}
+    problems = find_invalid_inputs(keys, ArtifactIndex(), properties)
+    print('> Validated package inputs in %.0fms' % ((time.monotonic() - start) * 1000))
+    if not problems:
+        return
+    report_invalid_inputs(problems)
+    if build_missing and build_missing_inputs(problems, config):
+        problems = find_invalid_inputs(keys, ArtifactIndex(), properties)
+        if problems:
+            report_invalid_inputs(problems)
+    if any(reason == 'missing' for entries in problems.values() for _, _, reason in entries):
+        print('> Cannot pack, package inputs are missing')
+        sys.exit(1)
+
+def _local_name(element):
+    return element.tag.rsplit('}', 1)[-1]
+
+def _replace_tokens(text, properties):
+    # nuspec replacement tokens ($configuration$ ...) are case-insensitive
+    return re.sub(r'\$(\w+)\$', lambda m: properties.get(m.group(1).lower(), m.group(0)), text)
+
+def _resolve_package_files(files_element, base_dir, properties):
+    """Map each <file src=... target=...> to (source path, package path), like nuget pack does."""
+    entries = []
+    missing = []
+    for file_element in files_element:
+        if _local_name(file_element) != 'file':
+            continue
+        src = _replace_tokens(file_element.get('src', ''), properties).replace('\\', '/')
+        target = _replace_tokens(file_element.get('target', ''), properties).replace('\\', '/').strip('/')
+        if glob.has_magic(src):
+            sources = sorted(path for path in glob.glob(os.path.join(base_dir, src), recursive=True)
+                             if os.path.isfile(path))
+            # Wildcard matches keep their path below the first wildcard segment
+            root = os.path.join(base_dir, src.split('*', 1)[0].rsplit('/', 1)[0])
+            for source in sources:
+                rel = os.path.relpath(source, root).replace(os.sep, '/')
+                entries.append((source, '/'.join(part for part in (target, rel) if part)))
+            continue
+        source = os.path.join(base_dir, src)
+        if not os.path.isfile(source):
+            missing.append(source)
+            continue
+        if not target or not os.path.splitext(target)[1] or file_element.get('target', '').endswith(('/', '\\')):
+            target = '/'.join(part for part in (target, os.path.basename(src)) if part)
+        entries.append((source, target))
+    return entries, missing
+
+def _zip_info(name, mtime=None):
+    # ZIP timestamps start in 1980; nuget pack clamps older ones (e.g. SOURCE_DATE_EPOCH=0) the same way
+    date_time = max(time.localtime(mtime if mtime is not None else time.time())[:6], (1980, 1, 1, 0, 0, 0))
+    info = zipfile.ZipInfo(name, date_time)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+def build_nupkg(nuspec_file, output_dir, properties):
+    """Pack `nuspec_file` into `<output_dir>/<id>.<version>.nupkg` without the nuget CLI.
+
+    <file> sources are resolved relative to the nuspec, as nuget pack does.
+    The package gets the nuspec (without <files>), [Content_Types].xml,
+    _rels/.rels and the core-properties part. Payload files are streamed
+    into the archive in chunks, never read into memory as a whole.
+    """
+    with open(nuspec_file, 'r', encoding='utf-8') as f:
+        root = ET.fromstring(_replace_tokens(f.read(), properties))
+    # Keep the nuspec namespace as the default one instead of ElementTree's ns0: prefixes
+    namespace = root.tag[1:].split('}', 1)[0] if root.tag.startswith('{') else NUSPEC_NAMESPACE
+    for element in root.iter():
+        if isinstance(element.tag, str):
+            element.tag = _local_name(element)
+    root.set('xmlns', namespace)
+    metadata = next(element for element in root if _local_name(element) == 'metadata')
+    fields = {_local_name(element): (element.text or '').strip() for element in metadata}
+    package_id, version = fields['id'], fields['version']
+
+    files_element = next((element for element in root if _local_name(element) == 'files'), None)
+    entries = []
+    if files_element is not None:
+        root.remove(files_element)
+        entries, missing = _resolve_package_files(files_element, os.path.dirname(nuspec_file), properties)
+        if missing:
+            print('> Cannot pack %s, missing file(s):' % package_id)
+            for path in missing:
+                print('    ' + path)
+            sys.exit(1)
+
+    manifest_name = package_id + '.nuspec'
+    core_properties_name = 'package/services/metadata/core-properties/%s.psmdcp' % uuid.uuid4().hex
+    part_names = [quote(target, safe="/!$&'()*+,;=@-._~") for _, target in entries]
+
+    extensions = {'rels': RELATIONSHIPS_CONTENT_TYPE, 'nuspec': 'application/octet',
+                  'psmdcp': CORE_PROPERTIES_CONTENT_TYPE}
+    overrides = []
+    for part_name in part_names:
+        extension = os.path.splitext(part_name)[1][1:]
+        if extension:
+            extensions.setdefault(extension.lower(), 'application/octet')
+        else:
+            overrides.append(part_name)
+    content_types = ET.Element('Types', xmlns=CONTENT_TYPES_NAMESPACE)
+    for extension, content_type in extensions.items():
+        ET.SubElement(content_types, 'Default',
+                      Extension=extension, ContentType=content_type)
+    for part_name in overrides:
+        ET.SubElement(content_types, 'Override',
+                      PartName='/' + part_name, ContentType='application/octet')
+
+    relationships = ET.Element('Relationships', xmlns=RELATIONSHIPS_NAMESPACE)
+    ET.SubElement(relationships, 'Relationship',
+                  Type=MANIFEST_RELATIONSHIP, Target='/' + manifest_name, Id='R' + uuid.uuid4().hex[:16].upper())
+    ET.SubElement(relationships, 'Relationship',
+                  Type=CORE_PROPERTIES_RELATIONSHIP, Target='/' + core_properties_name,
+                  Id='R' + uuid.uuid4().hex[:16].upper())
+
+    core_properties = (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<coreProperties xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xmlns="http://schemas.openxmlformats.org/package/2006/metadata/core-properties">'
+        '<dc:creator>%s</dc:creator><dc:description>%s</dc:description><dc:identifier>%s</dc:identifier>'
+        '<version>%s</version><keywords>%s</keywords><lastModifiedBy>maui_publish.py</lastModifiedBy>'
+        '</coreProperties>'
+    ) % tuple(_xml_escape(fields.get(key, '')) for key in ('authors', 'description', 'id', 'version', 'tags'))
+
+    os.makedirs(output_dir, exist_ok=True)
+    nupkg = os.path.join(output_dir, load_nuspec(nuspec_file).package_file_name)
+    partial = nupkg + '.partial'
+    with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr(_zip_info('_rels/.rels'), _xml_bytes(relationships))
+        package.writestr(_zip_info(manifest_name), _xml_bytes(root))
+        for (source, _), part_name in zip(entries, part_names):
+            st = os.stat(source)
+            with open(source, 'rb') as src, \
+                    package.open(_zip_info(part_name, st.st_mtime), 'w', force_zip64=st.st_size >= ZIP64_LIMIT) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        package.writestr(_zip_info(core_properties_name), core_properties.encode('utf-8'))
+        package.writestr(_zip_info('[Content_Types].xml'), _xml_bytes(content_types))
+    os.replace(partial, nupkg)
+    return nupkg
+
+def _xml_bytes(element):
+    return ET.tostring(element, encoding='utf-8', xml_declaration=True)
+
+def _xml_escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def use_nuget_cli():
+    return PACKER == 'nuget' or (PACKER == 'auto' and shutil.which('nuget') is not None)
+
+def pack_package(config, key, staging_dir, capture):
+    """Pack one package into `staging_dir`; returns (nupkg path, seconds)."""
+    name, nuspec = PACKAGES[key]
+    if not use_nuget_cli():
+        start = time.monotonic()
+        path = build_nupkg(nuspec, staging_dir, {'configuration': config})
+        return path, time.monotonic() - start
+    cmd = ['nuget', 'pack', nuspec, '-properties', 'Configuration=%s' % config, '-OutputDirectory', staging_dir]
+    start = time.monotonic()
+    if capture:
+        # Concurrent packs print their output in one block each once done
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        with _OUTPUT_LOCK:
+            print('> ' + ' '.join(cmd))
+            sys.stdout.write(result.stdout.decode('utf-8', errors='replace'))
+            sys.stdout.flush()
+    else:
+        print('> ' + ' '.join(cmd))
+        result = subprocess.run(cmd)
+    elapsed = time.monotonic() - start
+    if result.returncode != 0:
+        print('> Packing %s failed (exit code: %s)' % (name, result.returncode))
+        sys.exit(result.returncode)
+    return os.path.join(staging_dir, package_file_name(nuspec)), elapsed
+
+def pack(config, target, build_missing=False):
+    """Pack the selected packages concurrently into a fresh staging directory.
+
+    Once every pack succeeded the packages are moved to the current
+    directory, as `copy` expects; if any pack fails, none of them is.
+    Returns the .nupkg paths.
+    """
+    keys = selected_packages(target)
+    validate_inputs(keys, config, build_missing)
+    os.makedirs(PACK_STAGING_DIR, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=PACK_STAGING_DIR)
+    for key in keys:
+        print('> Packing %s' % PACKAGES[key][0])
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, len(keys))) as executor:
+        futures = [executor.submit(pack_package, config, key, staging_dir, len(keys) > 1) for key in keys]
+        results = []
+        failure = None
+        for future in futures:
+            try:
+                results.append(future.result())
+            except SystemExit as e:
+                failure = e.code if failure is None else failure
+    if failure is not None:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        sys.exit(failure)
+    for key, (_, elapsed) in zip(keys, results):
+        print('> Packed %s in %.1fs' % (PACKAGES[key][0], elapsed))
+    print('> Packed %d package(s) in %.1fs' % (len(keys), time.monotonic() - start))
+    staged = [path for path, _ in results]
+    publish_packages(staged, os.getcwd(), move=True)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    return [os.path.basename(path) for path in staged]
+
+def publish_packages(paths, dest_dir, move=False):
+    """Put the given .nupkg files into `dest_dir` in one step.
+
+    The packages are first copied into a temporary directory inside
+    `dest_dir` (the slow part, possibly across file systems) and then
+    renamed into place, so the source never sees a partially written
+    package and all of them appear at once.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    incoming = tempfile.mkdtemp(dir=dest_dir, prefix='.incoming-')
+    try:
+        staged = []
+        for path in paths:
+            staged_path = os.path.join(incoming, os.path.basename(path))
+            if move:
+                shutil.move(path, staged_path)
+            else:
+                shutil.copy2(path, staged_path)
+            staged.append(staged_path)
+        for staged_path in staged:
+            os.replace(staged_path, os.path.join(dest_dir, os.path.basename(staged_path)))
+    finally:
+        shutil.rmtree(incoming, ignore_errors=True)
+    print('> Published %s to %s' % (', '.join(os.path.basename(path) for path in paths), dest_dir))
+
+def copy(target, packages=None):
+    """Publish packages to NUGET_LOCAL_SOURCE, by default the ones `pack` left in the current directory."""
+    if packages is None:
+        packages = []
+        for key in selected_packages(target):
+            print('> Copying %s' % PACKAGES[key][0])
+            packages.append(package_file_name(PACKAGES[key][1]))
+        missing = [path for path in packages if not os.path.isfile(path)]
+        if missing:
+            print('Package(s) not found: %s' % ', '.join(missing))
+            sys.exit(1)
+    publish_packages(packages, NUGET_LOCAL_SOURCE)
 
 def clean(target):
-    if target == 'core' or target == 'all':
-        print('> Cleaning Core SDK')
-        delete_file(ADJUST_CORE_NUGET_INSTALLED)
-    if target == 'oaid' or target == 'all':
-        print('> Cleaning OAID SDK plugin')
-        delete_file(ADJUST_OAID_NUGET_INSTALLED)
-    if target == 'meta_referrer' or target == 'all':
-        print('> Cleaning Meta Referrer SDK plugin')
-        delete_file(ADJUST_META_REFERRER_NUGET_INSTALLED)
-    if target == 'google_lvl' or target == 'all':
-        print('> Cleaning Google LVL SDK plugin')
-        delete_file(ADJUST_GOOGLE_LVL_NUGET_INSTALLED)
+    for key in selected_packages(target):
+        clean_package(key)
+
+def clean_package(key):
+    """Drop the extracted copy of the version being published from the global packages folder.
+
+    Other versions stay extracted, so restores that use them (and the
+    other packages) keep hitting the cache.
+    """
+    name, nuspec_file = PACKAGES[key]
+    nuspec = load_nuspec(nuspec_file)
+    print('> Cleaning %s %s' % (name, nuspec.version))
+    if not os.path.isdir(nuspec.installed_version_dir):
+        print('> %s is not in the global packages folder' % nuspec.installed_version_dir)
+        return
+    delete_file(nuspec.installed_version_dir)
+    try:
+        # Only succeeds when no other version is left
+        os.rmdir(nuspec.installed_dir)
+    except OSError:
+        pass
+
+class PublishState:
+    """Fingerprints of the publish stages that finished, kept across runs.
+
+    A stage whose inputs still have the recorded fingerprint is skipped,
+    so rerunning `publish` after a failure resumes at the failed stage.
+    """
+
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}
+        if enabled:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._stages = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def is_done(self, key, stage, fingerprint):
+        with self._lock:
+            return self.enabled and self._stages.get(key, {}).get(stage) == fingerprint
+
+    def done(self, key, stage, fingerprint):
+        with self._lock:
+            self._stages.setdefault(key, {})[stage] = fingerprint
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            partial = self.path + '.partial'
+            with open(partial, 'w', encoding='utf-8') as f:
+                json.dump(self._stages, f, indent=2, sort_keys=True)
+            os.replace(partial, self.path)
+
+def _fingerprint(values):
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _inputs_fingerprint(key, config):
+    nuspec_file = PACKAGES[key][1]
+    index = ArtifactIndex()
+    st = os.stat(nuspec_file)
+    inputs = [(path, index.stat(path)) for path, _ in read_nuspec_files(nuspec_file, {'configuration': config})]
+    return _fingerprint([config, use_nuget_cli(), st.st_size, st.st_mtime_ns, inputs])
+
+def _build_fingerprint(key, config, index):
+    """Fingerprint the sources of the projects whose .artifacts outputs the package ships."""
+    projects = set()
+    for path, _ in read_nuspec_files(PACKAGES[key][1], {'configuration': config}):
+        if path.startswith(index.artifacts_dir + os.sep):
+            projects.add(os.path.relpath(path, index.artifacts_dir).split(os.sep, 1)[0])
+    digests = []
+    for name in sorted(projects):
+        project_dir = index.project_dir(name)
+        digests.append((name, index.source_digest(project_dir) if project_dir else None))
+    return _fingerprint([config, digests])
+
+def _missing_inputs(problems):
+    missing = {}
+    for tfm, entries in problems.items():
+        entries = [entry for entry in entries if entry[2] == 'missing']
+        if entries:
+            missing[tfm] = entries
+    return missing
+
+def _publish_build(key, config, state):
+    # maui_build.py skips projects whose content is unchanged without touching
+    # their outputs, so after a checkout they stay older than their sources.
+    # A build recorded for the same source content therefore counts as done
+    # and only missing outputs still need one.
+    index = ArtifactIndex()
+    problems = find_invalid_inputs([key], index, {'configuration': config})
+    fingerprint = _build_fingerprint(key, config, index)
+    if state.is_done(key, 'build', fingerprint):
+        problems = _missing_inputs(problems)
+    if not problems:
+        state.done(key, 'build', fingerprint)
+        return 'cached'
+    report_invalid_inputs(problems)
+    build_missing_inputs(problems, config)
+    state.done(key, 'build', fingerprint)
+    return 'done'
+
+def _publish_validate(key, config, state):
+    index = ArtifactIndex()
+    problems = find_invalid_inputs([key], index, {'configuration': config})
+    if problems and state.is_done(key, 'build', _build_fingerprint(key, config, index)):
+        problems = _missing_inputs(problems)
+    if problems:
+        report_invalid_inputs(problems)
+    if _missing_inputs(problems):
+        print('> Cannot pack %s, package inputs are missing' % PACKAGES[key][0])
+        sys.exit(1)
+    return 'done'
+
+def _publish_pack(key, config, state):
+    fingerprint = _inputs_fingerprint(key, config)
+    nupkg = os.path.join(PUBLISH_OUTPUT_DIR, package_file_name(PACKAGES[key][1]))
+    if os.path.isfile(nupkg) and state.is_done(key, 'pack', fingerprint):
+        return 'cached'
+    os.makedirs(PACK_STAGING_DIR, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=PACK_STAGING_DIR)
+    try:
+        path, _ = pack_package(config, key, staging_dir, True)
+        os.makedirs(PUBLISH_OUTPUT_DIR, exist_ok=True)
+        os.replace(path, nupkg)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    state.done(key, 'pack', fingerprint)
+    return 'done'
+
+def _publish_feed(key, config, state):
+    nupkg = os.path.join(PUBLISH_OUTPUT_DIR, package_file_name(PACKAGES[key][1]))
+    st = os.stat(nupkg)
+    fingerprint = _fingerprint([st.st_size, st.st_mtime_ns])
+    if os.path.isfile(os.path.join(NUGET_LOCAL_SOURCE, os.path.basename(nupkg))) \
+            and state.is_done(key, 'feed', fingerprint):
+        return 'cached'
+    publish_packages([nupkg], NUGET_LOCAL_SOURCE)
+    clean_package(key)
+    state.done(key, 'feed', fingerprint)
+    return 'done'
+
+PUBLISH_STAGES = [
+    ('build', _publish_build),
+    ('validate', _publish_validate),
+    ('pack', _publish_pack),
+    ('feed', _publish_feed),
+]
+
+def _run_publish_stages(key, config, state, stages, results):
+    """Run `stages` for one package in order; returns False once one of them fails."""
+    for stage, func in stages:
+        start = time.monotonic()
+        try:
+            status = func(key, config, state)
+        except SystemExit as e:
+            status = 'failed (exit code: %s)' % e.code
+        with _OUTPUT_LOCK:
+            results.append((key, stage, status, time.monotonic() - start))
+        if status.startswith('failed'):
+            return False
+    return True
+
+def publish(config, target, use_cache=True):
+    """Build, validate, pack and feed the selected packages as one pipeline.
+
+    Builds run one package at a time, in PACKAGES order, since the plugins
+    build against the core SDK and maui_build.py owns the repo-wide build
+    state. As soon as a package is built its validate, pack and feed stages
+    start on a worker thread while the next package builds. Finished
+    stages are recorded in PUBLISH_STATE_FILE and skipped on the next run
+    while their inputs are unchanged.
+    """
+    keys = selected_packages(target)
+    state = PublishState(PUBLISH_STATE_FILE, use_cache)
+    results = []
+    ok = True
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, len(keys))) as executor:
+        futures = []
+        for key in keys:
+            print('> Publishing %s' % PACKAGES[key][0])
+            if not _run_publish_stages(key, config, state, PUBLISH_STAGES[:1], results):
+                # Later packages may depend on this one; do not build them
+                ok = False
+                break
+            futures.append(executor.submit(_run_publish_stages, key, config, state, PUBLISH_STAGES[1:], results))
+        for future in futures:
+            ok = future.result() and ok
+
+    print('> Publish summary')
+    for key, stage, status, elapsed in results:
+        print('    %-24s %-9s %-22s %.1fs' % (PACKAGES[key][0], stage, status, elapsed))
+    print('> Published in %.1fs' % (time.monotonic() - start))
+    if not ok:
+        print('> Publish failed; rerun to resume from the failed stage')
+        sys.exit(1)
 
 def main():
     parser = argparse.ArgumentParser(description='Publish the MAUI SDK')
@@ -119,6 +821,10 @@ def main():
 
     common = argparse.ArgumentParser(add_help=False)
     common.add_argument('--debug', action='store_true', default=False, help='Publish in Debug (default: Release)')
+    common.add_argument('--packer', choices=['auto', 'nuget', 'python'], default='auto',
+                        help='Pack with the nuget CLI or in-process (default: auto, nuget when installed)')
+    common.add_argument('--build-missing', action='store_true', default=False,
+                        help='Build the SDK targets whose outputs are missing or stale before packing')
 
     common.add_argument(
         'target',
@@ -131,22 +837,36 @@ def main():
     sub.add_parser('copy', help='Copy nuget package to the local source', parents=[common])
     sub.add_parser('clean', help='Clean the local source', parents=[common])
     sub.add_parser('all', help='Publish all targets', parents=[common])
+    sub.add_parser('validate', help='Check that the files the nuspecs list are built and up to date', parents=[common])
+    publish_parser = sub.add_parser('publish', help='Build, pack and feed packages in one resumable pipeline', parents=[common])
+    publish_parser.add_argument('--no-cache', action='store_true', default=False,
+                                help='Run every publish stage, ignoring the ones that finished before')
 
     args = parser.parse_args()
 
     print(args)
 
+    global PACKER
+    PACKER = args.packer
+
     config = 'Debug' if getattr(args, 'debug', False) else 'Release'
     target = args.target if getattr(args, 'target', None) else 'core'
 
     print(target)
     arg_found = False
 
+    packages = None
     if args.command in ('pack', 'all'):
-        pack(config, target)
+        packages = pack(config, target, args.build_missing)
+        arg_found = True
+    if args.command == 'publish':
+        publish(config, target, not args.no_cache)
+        arg_found = True
+    if args.command == 'validate':
+        validate_inputs(selected_packages(target), config, args.build_missing)
         arg_found = True
     if args.command in ('copy', 'all'):
-        copy(target)
+        copy(target, packages)
         arg_found = True
     if args.command in ('clean', 'all'):
         clean(target)
@@ -2,12 +2,18 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import glob
+import hashlib
 import os
+import plistlib
 import shutil
 import subprocess
 import sys
+import threading
 import time
 import json
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
 
 
@@ -19,8 +25,15 @@ EXAMPLE_NUGET_CSProj_NET10 = os.path.join(ROOT, 'ExampleApp', 'ExampleApp-Nuget-
 TESTAPP_CSProj = os.path.join(ROOT, 'TestApp', 'TestApp.csproj')
 TESTAPP_CSProj_NET10 = os.path.join(ROOT, 'TestApp', 'TestApp-Net10.csproj')
 
+_LOG_LOCK = threading.Lock()
+
+IOS_SIMULATOR_RID = 'iossimulator-arm64'
+IOS_DEVICE_RID = 'ios-arm64'
+
 def log(msg: str) -> None:
-    print(msg)
+    # run-matrix logs from several threads at once
+    with _LOG_LOCK:
+        print(msg, flush=True)
 
 def set_net_version(net_version: str):
     if net_version == 'net8':
@@ -32,6 +45,25 @@ def set_net_version(net_version: str):
         json.dump(global_json, f, indent=2)
 
 
+def wait_until(probe, description: str, timeout: float, interval: float = 0.5) -> bool:
+    """Poll `probe` until it returns True or `timeout` seconds have passed.
+
+    Reports how long the wait took and returns whether the probe succeeded.
+    """
+    start = time.monotonic()
+    while True:
+        ready = probe()
+        if ready or time.monotonic() - start >= timeout:
+            break
+        time.sleep(interval)
+    elapsed = time.monotonic() - start
+    if ready:
+        log('Waited %.1fs for %s' % (elapsed, description))
+    else:
+        log('Gave up waiting for %s after %.1fs' % (description, elapsed))
+    return ready
+
+
 def run(cmd, cwd=None, check=True) -> int:
     log('> ' + ' '.join(cmd))
     result = subprocess.run(cmd, cwd=cwd)
@@ -67,21 +99,195 @@ def ensure_test_exists(net_version: str) -> None:
         log('TestApp.csproj not found at: %s' % csproj)
         sys.exit(1)
 
-def boot_android_avd(avd_name: str) -> None:
+def find_emulator() -> Optional[str]:
     # Try system emulator first, fallback to default SDK location
     emu_bin = shutil.which('emulator')
     if not emu_bin:
         emu_bin = os.path.expanduser('~/Library/Android/sdk/emulator/emulator')
-    if not os.path.exists(emu_bin):
-        log('Android emulator not found. Ensure Android SDK is installed and emulator is on PATH.')
+    return emu_bin if os.path.exists(emu_bin) else None
+
+
+# Console ports emulators may use; each one takes two (console and adb)
+ANDROID_EMULATOR_BASE_PORT = 5554
+ANDROID_EMULATOR_MAX_PORT = 5584
+
+# Quick-boot snapshot of a booted (and, with --save-snapshot, app-ready) emulator
+ANDROID_SNAPSHOT_NAME = 'maui_ready'
+
+
+def android_avd_home() -> str:
+    return os.environ.get('ANDROID_AVD_HOME') or os.path.join(os.path.expanduser('~'), '.android', 'avd')
+
+
+class EmulatorPool:
+    """Reuses running emulators and boots new ones from a quick-boot snapshot.
+
+    Running instances are found with `adb devices` and `adb emu avd name`,
+    so an emulator started by an earlier run (or by hand) is reused instead
+    of launching a second one. A new instance loads ANDROID_SNAPSHOT_NAME
+    when the AVD has it and otherwise cold boots once and saves it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Ports of emulators this process started that may not be listed by adb yet
+        self._claimed_ports = set()
+
+    def running(self) -> dict:
+        """Return {serial: avd name} of the emulators attached to adb."""
+        adb = find_adb()
+        if not adb:
+            return {}
+        out = subprocess.run([adb, 'devices'], capture_output=True, text=True)
+        emulators = {}
+        for line in out.stdout.splitlines()[1:]:
+            fields = line.split()
+            if len(fields) >= 2 and fields[0].startswith('emulator-') and fields[1] == 'device':
+                name = subprocess.run([adb, '-s', fields[0], 'emu', 'avd', 'name'], capture_output=True, text=True)
+                lines = [line.strip() for line in name.stdout.splitlines() if line.strip() and line.strip() != 'OK']
+                emulators[fields[0]] = lines[0] if lines else ''
+        return emulators
+
+    def has_snapshot(self, avd_name: str) -> bool:
+        return os.path.isdir(os.path.join(android_avd_home(), avd_name + '.avd', 'snapshots', ANDROID_SNAPSHOT_NAME))
+
+    def _free_port(self, running: dict) -> int:
+        used = {int(serial.split('-', 1)[1]) for serial in running} | self._claimed_ports
+        for port in range(ANDROID_EMULATOR_BASE_PORT, ANDROID_EMULATOR_MAX_PORT + 1, 2):
+            if port not in used:
+                self._claimed_ports.add(port)
+                return port
+        log('No free emulator console port between %d and %d' % (ANDROID_EMULATOR_BASE_PORT, ANDROID_EMULATOR_MAX_PORT))
         sys.exit(1)
 
-    # Check if AVD is running; if not, start
-    # There's no simple cross-platform check; attempt to start headless
-    log('Booting Android AVD: %s' % avd_name)
-    subprocess.Popen([emu_bin, '-avd', avd_name, '-netdelay', 'none', '-netspeed', 'full', '-no-snapshot-load'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    # Give emulator time to boot
-    time.sleep(5)
+    def acquire(self, avd_name: str, port: Optional[int] = None, headless: bool = False,
+                exclude: tuple = ()) -> Optional[str]:
+        """Return the serial of a booted emulator running `avd_name`, starting one if needed.
+
+        Serials in `exclude` are not reused, so a caller can ask for
+        several instances of the same AVD.
+        """
+        with self._lock:
+            running = self.running()
+            for serial, name in running.items():
+                if name == avd_name and serial not in exclude:
+                    log('Reusing running emulator %s (%s)' % (serial, avd_name))
+                    return serial
+            if port is None or android_serial(port) in running:
+                port = self._free_port(running)
+            else:
+                self._claimed_ports.add(port)
+            # The AVD already runs elsewhere: further instances must not write to it
+            read_only = avd_name in running.values()
+        return self.start(avd_name, port, headless, read_only)
+
+    def start(self, avd_name: str, port: int, headless: bool = False, read_only: bool = False) -> Optional[str]:
+        emu_bin = find_emulator()
+        if not emu_bin:
+            log('Android emulator not found. Ensure Android SDK is installed and emulator is on PATH.')
+            sys.exit(1)
+        if not find_adb():
+            # Without adb there is no serial to hand out and no way to tell when the boot is done
+            log('adb not found. Ensure Android SDK platform-tools are installed and adb is on PATH.')
+            sys.exit(1)
+        snapshot = self.has_snapshot(avd_name)
+        log('Booting Android AVD: %s on port %d (%s)' % (avd_name, port, 'from snapshot %s' % ANDROID_SNAPSHOT_NAME
+                                                          if snapshot else 'cold boot'))
+        cmd = [emu_bin, '-avd', avd_name, '-port', str(port), '-netdelay', 'none', '-netspeed', 'full']
+        # Loading the snapshot must not save the session back into it on exit;
+        # only save_snapshot updates it
+        cmd += ['-snapshot', ANDROID_SNAPSHOT_NAME, '-no-snapshot-save'] if snapshot else ['-no-snapshot-load']
+        if headless:
+            cmd += ['-no-window', '-no-audio', '-no-boot-anim']
+        if read_only:
+            cmd.append('-read-only')
+        # Its own session, so the emulator outlives this script and stays warm for the next run
+        subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        serial = android_serial(port)
+        if not wait_for_android_boot(serial=serial):
+            return None
+        if not snapshot and not read_only:
+            self.save_snapshot(serial)
+        return serial
+
+    def save_snapshot(self, serial: str) -> bool:
+        adb = find_adb()
+        if not adb:
+            return False
+        log('Saving quick-boot snapshot %s of %s' % (ANDROID_SNAPSHOT_NAME, serial))
+        return run([adb, '-s', serial, 'emu', 'avd', 'snapshot', 'save', ANDROID_SNAPSHOT_NAME], check=False) == 0
+
+    def warm(self, avd_names: List[str], count: int) -> List[str]:
+        """Make sure `count` headless emulators run, spread over `avd_names`, booting them in parallel."""
+        wanted = [avd_names[i % len(avd_names)] for i in range(count)]
+        serials: List[str] = []
+        with ThreadPoolExecutor(max_workers=max(1, count), thread_name_prefix='warm') as executor:
+            # Instances of one AVD are acquired in order so each gets its own emulator
+            for avd_name in dict.fromkeys(wanted):
+                instances = wanted.count(avd_name)
+                executor.submit(self._warm_avd, avd_name, instances, serials)
+        return serials
+
+    def _warm_avd(self, avd_name: str, instances: int, serials: List[str]) -> None:
+        mine: List[str] = []
+        for _ in range(instances):
+            serial = self.acquire(avd_name, headless=True, exclude=tuple(mine))
+            if serial:
+                mine.append(serial)
+        with self._lock:
+            serials.extend(mine)
+
+    def stop(self) -> None:
+        adb = find_adb()
+        for serial, name in self.running().items():
+            log('Stopping %s (%s)' % (serial, name))
+            run([adb, '-s', serial, 'emu', 'kill'], check=False)
+
+
+_EMULATOR_POOL = EmulatorPool()
+
+
+def boot_android_avd(avd_name: str, port: Optional[int] = None) -> Optional[str]:
+    """Return the adb serial of a booted emulator for `avd_name`, reusing a running one."""
+    return _EMULATOR_POOL.acquire(avd_name, port)
+
+
+def find_adb() -> Optional[str]:
+    adb = shutil.which('adb') or os.path.expanduser('~/Library/Android/sdk/platform-tools/adb')
+    return adb if os.path.exists(adb) else None
+
+
+def android_serial(port: int) -> str:
+    return 'emulator-%d' % port
+
+
+def wait_for_android_boot(timeout: float = 300.0, serial: Optional[str] = None) -> bool:
+    """Wait until the emulator (the only one, or `serial`) is attached to adb and has finished booting."""
+    adb = find_adb()
+    if not adb:
+        log('adb not found, giving the emulator 5s to boot instead')
+        time.sleep(5)
+        return False
+    device = ['-s', serial] if serial else ['-e']
+    start = time.monotonic()
+    try:
+        subprocess.run([adb] + device + ['wait-for-device'], timeout=timeout,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except subprocess.TimeoutExpired:
+        log('Gave up waiting for the emulator to attach to adb after %.1fs' % timeout)
+        return False
+    log('Emulator attached to adb after %.1fs' % (time.monotonic() - start))
+
+    def boot_completed() -> bool:
+        try:
+            out = subprocess.run([adb] + device + ['shell', 'getprop', 'sys.boot_completed'],
+                                 capture_output=True, text=True, timeout=10)
+        except subprocess.TimeoutExpired:
+            return False
+        return out.stdout.strip() == '1'
+
+    remaining = max(0.0, timeout - (time.monotonic() - start))
+    return wait_until(boot_completed, '%s to boot' % (serial or 'Android emulator'), remaining)
 
 
 def boot_ios_sim(sim_name: str) -> None:
@@ -96,56 +302,172 @@ def boot_ios_sim(sim_name: str) -> None:
     run(['open', '-a', 'Simulator'], check=False)
 
 
+DEVICE_INVENTORY_FILE = os.path.join(ROOT, '.artifacts', 'device_inventory.json')
+
+# Seconds a scan stays fresh; older ones are still used, but rescanned in the background
+DEVICE_INVENTORY_TTL = 300.0
+
+
+def scan_android_avds() -> List[dict]:
+    emu = find_emulator()
+    if not emu:
+        return []
+    out = subprocess.run([emu, '-list-avds'], capture_output=True, text=True)
+    return [{'name': line.strip()} for line in out.stdout.splitlines() if line.strip() and not line.startswith('INFO')]
+
+
+def scan_ios_simulators() -> List[dict]:
+    out = subprocess.check_output(['xcrun', 'simctl', 'list', 'devices', 'available', '--json'])
+    simulators = []
+    for runtime, runtime_devices in json.loads(out).get('devices', {}).items():
+        for dev in runtime_devices:
+            if dev.get('udid'):
+                # No boot state: it changes too often to be cached (see booted_ios_simulators)
+                simulators.append({'name': dev.get('name'), 'udid': dev['udid'],
+                                   'runtime': runtime.rsplit('.', 1)[-1]})
+    return simulators
+
+
+def scan_ios_devices() -> List[dict]:
+    out = subprocess.check_output(['xcrun', 'xctrace', 'list', 'devices'], stderr=subprocess.DEVNULL)
+    devices = []
+    in_devices_section = False
+    for line in out.decode('utf-8').split('\n'):
+        line = line.strip()
+        if line == '== Devices ==':
+            in_devices_section = True
+            continue
+        if line.startswith('==') and line.endswith('=='):
+            in_devices_section = False
+            continue
+        if not in_devices_section:
+            continue
+        # Extract UDID from line like "uPhone (26.1) (00008120-001645063C43A01E)"
+        parts = line.split('(')
+        if len(parts) >= 3:
+            udid = parts[-1].rstrip(')').strip()
+            if len(udid) > 20:  # UDIDs are typically long
+                devices.append({'name': parts[0].strip(), 'udid': udid, 'os': parts[-2].rstrip(') ').strip(),
+                                'line': line})
+    return devices
+
+
+class DeviceInventory:
+    """On-disk cache of AVDs, simulators and physical devices.
+
+    Each kind is scanned on its own (`xctrace list devices` alone takes
+    seconds) and kept in DEVICE_INVENTORY_FILE. A scan younger than
+    DEVICE_INVENTORY_TTL is used as is; an older one is still used while a
+    background thread rescans. Lookups that miss rescan once in the
+    foreground, in case the device was only just created.
+    """
+
+    SCANNERS = {
+        'avds': scan_android_avds,
+        'simulators': scan_ios_simulators,
+        'devices': scan_ios_devices,
+    }
+
+    def __init__(self, path: str = DEVICE_INVENTORY_FILE, ttl: float = DEVICE_INVENTORY_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.force_refresh = False
+        self._lock = threading.Lock()
+        self._sections = None
+        self._refreshing = set()
+        self._refreshed = set()
+        self._threads: List[threading.Thread] = []
+
+    def _load(self) -> dict:
+        if self._sections is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._sections = json.load(f)
+            except (OSError, ValueError):
+                self._sections = {}
+        return self._sections
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        partial = '%s.%d.partial' % (self.path, os.getpid())
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(self._sections, f, indent=2)
+        os.replace(partial, self.path)
+
+    def refresh(self, kind: str) -> List[dict]:
+        try:
+            entries = self.SCANNERS[kind]()
+        except Exception as e:
+            log('Could not scan %s: %s' % (kind, e))
+            entries = []
+        with self._lock:
+            self._load()[kind] = {'scanned_at': time.time(), 'entries': entries}
+            self._refreshed.add(kind)
+            self._refreshing.discard(kind)
+            self._save()
+        return entries
+
+    def _refresh_in_background(self, kind: str) -> None:
+        with self._lock:
+            if kind in self._refreshing:
+                return
+            self._refreshing.add(kind)
+        thread = threading.Thread(target=self.refresh, args=(kind,), name='inventory-' + kind, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def wait(self) -> None:
+        """Let background rescans finish, so their results reach the cache file."""
+        for thread in self._threads:
+            thread.join()
+
+    def get(self, kind: str) -> List[dict]:
+        with self._lock:
+            section = self._load().get(kind)
+        if section is None or (self.force_refresh and kind not in self._refreshed):
+            return self.refresh(kind)
+        if time.time() - section.get('scanned_at', 0) > self.ttl:
+            self._refresh_in_background(kind)
+        return section.get('entries', [])
+
+    def find(self, kind: str, match) -> List[dict]:
+        """Entries of `kind` for which `match(entry)` holds, rescanning once when there are none."""
+        found = [entry for entry in self.get(kind) if match(entry)]
+        if not found and kind not in self._refreshed:
+            found = [entry for entry in self.refresh(kind) if match(entry)]
+        return found
+
+
+_INVENTORY = DeviceInventory()
+
+
+def booted_ios_simulators() -> set:
+    """Return the UDIDs of the simulators booted right now, queried live."""
+    try:
+        out = subprocess.check_output(['xcrun', 'simctl', 'list', 'devices', '--json'])
+    except (OSError, subprocess.CalledProcessError):
+        return set()
+    return {dev['udid'] for runtime_devices in json.loads(out).get('devices', {}).values()
+            for dev in runtime_devices if dev.get('udid') and dev.get('state') == 'Booted'}
+
+
 def get_ios_sim_udid(sim_name: str) -> Optional[str]:
     """Return UDID of the requested simulator name, preferring Booted if multiple."""
-    try:
-        out = subprocess.check_output(['xcrun', 'simctl', 'list', 'devices', 'available', '--json'])
-        data = json.loads(out)
-        booted: List[str] = []
-        matches: List[str] = []
-        for runtime_devices in data.get('devices', {}).values():
-            for dev in runtime_devices:
-                if dev.get('name') == sim_name:
-                    udid = dev.get('udid')
-                    if not udid:
-                        continue
-                    if dev.get('state') == 'Booted':
-                        booted.append(udid)
-                    else:
-                        matches.append(udid)
-        if booted:
-            return booted[0]
-        if matches:
-            return matches[0]
-    except Exception:
-        pass
+    matches = _INVENTORY.find('simulators', lambda dev: dev.get('name') == sim_name)
+    if len(matches) > 1:
+        booted = booted_ios_simulators()
+        for dev in matches:
+            if dev['udid'] in booted:
+                return dev['udid']
+    if matches:
+        return matches[0]['udid']
     return None
 
 
 def get_ios_device_udid(device_name: str) -> Optional[str]:
     """Return UDID of the requested physical device name."""
-    try:
-        out = subprocess.check_output(['xcrun', 'xctrace', 'list', 'devices'], stderr=subprocess.DEVNULL)
-        lines = out.decode('utf-8').split('\n')
-        in_devices_section = False
-        for line in lines:
-            line = line.strip()
-            if line == '== Devices ==':
-                in_devices_section = True
-                continue
-            if line.startswith('==') and line.endswith('=='):
-                in_devices_section = False
-                continue
-            if in_devices_section and device_name in line:
-                # Extract UDID from line like "uPhone (26.1) (00008120-001645063C43A01E)"
-                parts = line.split('(')
-                if len(parts) >= 3:
-                    udid = parts[-1].rstrip(')').strip()
-                    if len(udid) > 20:  # UDIDs are typically long
-                        return udid
-    except Exception as e:
-        log(f'Error getting device UDID: {e}')
-    return None
+    matches = _INVENTORY.find('devices', lambda dev: device_name in dev.get('line', dev.get('name', '')))
+    return matches[0]['udid'] if matches else None
 
 
 def resolve_csproj(app: str, net_version: str) -> str:
@@ -185,14 +507,30 @@ def get_ios_tfm(net_version: str) -> str:
     else:
         return 'net8.0-ios'  # .NET 8 doesn't require explicit version
 
-def run_android(config: str, avd_name: str, app: str, net_version: str) -> None:
+def run_android(config: str, avd_name: str, app: str, net_version: str, fast: bool = False,
+                save_snapshot: bool = False) -> None:
     csproj = resolve_csproj(app, net_version)
-    boot_android_avd(avd_name)
+    avds = _INVENTORY.get('avds')
+    if avds and not _INVENTORY.find('avds', lambda avd: avd['name'] == avd_name):
+        log('Error: AVD "%s" not found. Available AVDs: %s' % (avd_name, ', '.join(avd['name'] for avd in avds)))
+        sys.exit(1)
+    serial = boot_android_avd(avd_name)
     set_net_version(net_version)
     tfm = get_android_tfm(net_version)
-    run(['dotnet', 'build', csproj, '-c', config, '-f', tfm, '-t:Run'])
+    if fast:
+        fast_redeploy_android(config, avd_name, csproj, tfm, serial)
+    else:
+        cmd = ['dotnet', 'build', csproj, '-c', config, '-f', tfm, '-t:Run']
+        if serial:
+            # Deploy to this emulator even when other devices are attached
+            cmd.append('-p:AdbTarget=-s %s' % serial)
+            forget_deploy_state('android:%s:' % serial)
+        run(cmd)
+    if save_snapshot and serial:
+        _EMULATOR_POOL.save_snapshot(serial)
 
-def run_ios(config: str, sim_name: Optional[str], app: str, net_version: str, device_name: Optional[str] = None) -> None:
+def run_ios(config: str, sim_name: Optional[str], app: str, net_version: str, device_name: Optional[str] = None,
+            fast: bool = False) -> None:
     csproj = resolve_csproj(app, net_version)
     set_net_version(net_version)
     tfm = get_ios_tfm(net_version)
@@ -205,22 +543,12 @@ def run_ios(config: str, sim_name: Optional[str], app: str, net_version: str, de
             log(f'Error: Device "{device_name}" not found. Use "list-devices" to see available devices.')
             sys.exit(1)
         log(f'Found device UDID: {udid}')
-        # Clean iOS simulator build artifacts to ensure we rebuild for device
-        log('Cleaning iOS simulator build artifacts to ensure device build...')
-        app_name = os.path.basename(csproj).replace('.csproj', '')
-        artifacts_obj_dir = os.path.join(ROOT, '.artifacts', app_name, 'obj', config, tfm)
-        artifacts_bin_dir = os.path.join(ROOT, '.artifacts', app_name, 'bin', config, tfm)
-        # Remove all simulator-related build artifacts
-        for artifacts_dir in [artifacts_obj_dir, artifacts_bin_dir]:
-            if os.path.exists(artifacts_dir):
-                for item in os.listdir(artifacts_dir):
-                    item_path = os.path.join(artifacts_dir, item)
-                    if os.path.isdir(item_path) and 'simulator' in item.lower():
-                        log(f'Removing simulator build artifacts: {item}')
-                        shutil.rmtree(item_path, ignore_errors=True)
-        # Build and run for device (clean build to avoid simulator artifacts)
+        if fast:
+            log('--fast only applies to simulators; doing a full build and run')
+        # Device and simulator builds live in separate per-RID trees (see Directory.Build.props),
+        # so switching between them stays incremental
         log('Building for iOS device (this may take a moment)...')
-        cmd = ['dotnet', 'build', csproj, '-c', config, '-f', tfm, '-p:RuntimeIdentifier=ios-arm64', '-t:Run']
+        cmd = ['dotnet', 'build', csproj, '-c', config, '-f', tfm, '-p:RuntimeIdentifier=%s' % IOS_DEVICE_RID, '-t:Run']
         # Use just the UDID for _DeviceName (mlaunch expects UDID directly)
         cmd.append(f'-p:_DeviceName={udid}')
     else:
@@ -230,34 +558,500 @@ def run_ios(config: str, sim_name: Optional[str], app: str, net_version: str, de
             udid = get_ios_sim_udid(sim_name)
         else:
             udid = None
-        cmd = ['dotnet', 'build', csproj, '-c', config, '-f', tfm, '-p:RuntimeIdentifier=iossimulator-arm64', '-t:Run']
+        if fast and udid:
+            fast_redeploy_ios(config, sim_name, udid, csproj, tfm)
+            return
+        if fast:
+            log('--fast needs a simulator UDID; doing a full build and run')
+        cmd = ['dotnet', 'build', csproj, '-c', config, '-f', tfm, '-p:RuntimeIdentifier=%s' % IOS_SIMULATOR_RID, '-t:Run']
         if udid:
             cmd.append(f'-p:_DeviceName=:v2:udid={udid}')
+            forget_deploy_state('ios:%s:' % udid)
     
     run(cmd)
 
+DEPLOY_STATE_FILE = os.path.join(ROOT, '.artifacts', 'deploy_state.json')
+_DEPLOY_STATE_LOCK = threading.Lock()
+
+# Where Debug builds with fast deployment keep the app's assemblies on the device
+ANDROID_OVERRIDE_DIR = 'files/.__override__'
+ANDROID_PUSH_TMP_DIR = '/data/local/tmp'
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(paths: dict, previous: dict) -> dict:
+    """Map each name in `paths` ({name: path}) to [size, mtime_ns, sha256].
+
+    Files whose size and mtime match `previous` keep the recorded hash
+    instead of being read again.
+    """
+    hashes = {}
+    for name, path in paths.items():
+        st = os.stat(path)
+        known = previous.get(name)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            hashes[name] = known
+        else:
+            hashes[name] = [st.st_size, st.st_mtime_ns, _file_sha256(path)]
+    return hashes
+
+
+def changed_files(current: dict, deployed: dict) -> List[str]:
+    return sorted(name for name, entry in current.items() if name not in deployed or deployed[name][2] != entry[2])
+
+
+def load_deploy_state() -> dict:
+    try:
+        with open(DEPLOY_STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_deploy_state(state: dict) -> None:
+    os.makedirs(os.path.dirname(DEPLOY_STATE_FILE), exist_ok=True)
+    partial = DEPLOY_STATE_FILE + '.partial'
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(partial, DEPLOY_STATE_FILE)
+
+
+def save_deploy_state(key: str, record: dict) -> None:
+    with _DEPLOY_STATE_LOCK:
+        state = load_deploy_state()
+        state[key] = record
+        _write_deploy_state(state)
+
+
+def forget_deploy_state(prefix: str) -> None:
+    """Drop the fast redeploy records starting with `prefix`, after a deploy that bypassed them."""
+    # run-matrix deploys to several devices at once
+    with _DEPLOY_STATE_LOCK:
+        state = load_deploy_state()
+        keys = [key for key in state if key.startswith(prefix)]
+        for key in keys:
+            del state[key]
+        if keys:
+            _write_deploy_state(state)
+
+
+def timed_build(cmd) -> float:
+    start = time.monotonic()
+    run(cmd)
+    return time.monotonic() - start
+
+
+def report_fast_redeploy(build_time: float, install: str, install_time: float, launch_code: int, launch_time: float) -> None:
+    log('Build %.1fs, install %.1fs (%s), launch %.1fs%s' % (
+        build_time, install_time, install, launch_time, '' if launch_code == 0 else ' (exit %d)' % launch_code))
+    if launch_code != 0:
+        sys.exit(launch_code)
+
+
+def _android_apk_fast_deployed(apk: str) -> bool:
+    # With fast deployment the assemblies are pushed next to the APK instead of packed into it
+    try:
+        with zipfile.ZipFile(apk) as package:
+            return not any(name.startswith('assemblies/') for name in package.namelist())
+    except (OSError, zipfile.BadZipFile):
+        return False
+
+
+def android_install_stamp(adb: List[str], application_id: str) -> Optional[str]:
+    """Return the app's lastUpdateTime on the device, or None when it is not installed.
+
+    It changes with every install, whoever does it, and goes back with a
+    snapshot restore, so it tells whether the device still has what a fast
+    redeploy record describes.
+    """
+    result = subprocess.run(adb + ['shell', 'dumpsys', 'package', application_id], capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if line.startswith('lastUpdateTime='):
+            return line.split('=', 1)[1]
+    return None
+
+
+def _push_android_assemblies(adb: List[str], application_id: str, assemblies: dict, names: List[str], label: str) -> bool:
+    """Copy `names` into the app's fast deployment directory; False when that is not possible."""
+    listing = subprocess.run(adb + ['shell', 'run-as', application_id, 'find', ANDROID_OVERRIDE_DIR, '-type', 'f'],
+                             capture_output=True, text=True)
+    if listing.returncode != 0:
+        return False
+    on_device = {}
+    for line in listing.stdout.splitlines():
+        on_device.setdefault(os.path.basename(line.strip()), []).append(line.strip())
+    for name in names:
+        tmp = '%s/%s' % (ANDROID_PUSH_TMP_DIR, name)
+        if run_captured(adb + ['push', assemblies[name], tmp], label) != 0:
+            return False
+        # Per-ABI layouts keep a copy of the assembly in every ABI directory
+        for target in on_device.get(name, ['%s/%s' % (ANDROID_OVERRIDE_DIR, name)]):
+            if run_captured(adb + ['shell', 'run-as', application_id, 'cp', tmp, target], label) != 0:
+                return False
+        run_captured(adb + ['shell', 'rm', '-f', tmp], label)
+    return True
+
+
+def fast_redeploy_android(config: str, avd_name: str, csproj: str, tfm: str, serial: Optional[str] = None) -> None:
+    """Build, then relaunch, push changed assemblies or reinstall, whichever is the least needed.
+
+    What was deployed is recorded per device and app in DEPLOY_STATE_FILE by
+    hash, together with the app's install stamp on the device; the record
+    only counts while the device still reports that stamp. Same APK and
+    assemblies: only relaunch. Same APK, other assemblies, and a fast
+    deployment (Debug) build: push just the changed assemblies. Anything
+    else: a regular -t:Install.
+    """
+    build_time = timed_build(['dotnet', 'build', csproj, '-c', config, '-f', tfm])
+    output_dir = app_output_dir(csproj, config, tfm, None)
+    package = find_android_package(output_dir)
+    if not package:
+        log('No signed APK in %s' % output_dir)
+        sys.exit(1)
+    apk, application_id = package
+    adb_bin = find_adb() or 'adb'
+    adb = [adb_bin] + (['-s', serial] if serial else ['-e'])
+    key = 'android:%s:%s:%s:%s' % (serial or avd_name, os.path.basename(csproj), config, tfm)
+    deployed = load_deploy_state().get(key, {})
+    assembly_paths = {name: os.path.join(output_dir, name) for name in os.listdir(output_dir) if name.endswith('.dll')}
+    current = {'apk': hash_files({'apk': apk}, deployed.get('apk', {})),
+               'assemblies': hash_files(assembly_paths, deployed.get('assemblies', {}))}
+
+    stamp = android_install_stamp(adb, application_id)
+    start = time.monotonic()
+    install = None
+    if stamp and deployed.get('stamp') == stamp and not changed_files(current['apk'], deployed.get('apk', {})):
+        changed = changed_files(current['assemblies'], deployed.get('assemblies', {}))
+        if not changed:
+            install = 'unchanged, relaunch only'
+        elif _android_apk_fast_deployed(apk) and _push_android_assemblies(adb, application_id, assembly_paths, changed, avd_name):
+            install = 'pushed %d assemblies: %s' % (len(changed), ', '.join(changed))
+    if install is None:
+        cmd = ['dotnet', 'build', csproj, '-c', config, '-f', tfm, '-t:Install']
+        if serial:
+            cmd.append('-p:AdbTarget=-s %s' % serial)
+        run(cmd)
+        install = 'full install'
+        stamp = android_install_stamp(adb, application_id)
+    install_time = time.monotonic() - start
+    current['stamp'] = stamp
+    save_deploy_state(key, current)
+
+    start = time.monotonic()
+    run_captured(adb + ['shell', 'am', 'force-stop', application_id], avd_name)
+    launch_code = run_captured(adb + ['shell', 'monkey', '-p', application_id,
+                                      '-c', 'android.intent.category.LAUNCHER', '1'], avd_name)
+    report_fast_redeploy(build_time, install, install_time, launch_code, time.monotonic() - start)
+
+
+def _bundle_files(app_dir: str) -> dict:
+    files = {}
+    for dirpath, _, filenames in os.walk(app_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            files[os.path.relpath(path, app_dir)] = path
+    return files
+
+
+def fast_redeploy_ios(config: str, sim_name: str, udid: str, csproj: str, tfm: str) -> None:
+    """Simulator counterpart of fast_redeploy_android.
+
+    Simulator apps live on the host file system, so a changed bundle is
+    deployed by copying just the changed files into the installed app's
+    container; a full `simctl install` is only needed when the app is not
+    installed yet.
+    """
+    build_time = timed_build(['dotnet', 'build', csproj, '-c', config, '-f', tfm,
+                              '-p:RuntimeIdentifier=%s' % IOS_SIMULATOR_RID])
+    output_dir = app_output_dir(csproj, config, tfm, IOS_SIMULATOR_RID)
+    app = find_ios_app(output_dir)
+    if not app:
+        log('No .app bundle in %s' % output_dir)
+        sys.exit(1)
+    app_dir, bundle_id = app
+    key = 'ios:%s:%s:%s:%s' % (udid, os.path.basename(csproj), config, tfm)
+    deployed = load_deploy_state().get(key, {})
+    bundle = _bundle_files(app_dir)
+    current = {'bundle': hash_files(bundle, deployed.get('bundle', {}))}
+
+    container = subprocess.run(['xcrun', 'simctl', 'get_app_container', udid, bundle_id, 'app'],
+                               capture_output=True, text=True)
+    container_dir = container.stdout.strip() if container.returncode == 0 else ''
+    start = time.monotonic()
+    if container_dir and os.path.isdir(container_dir) and deployed:
+        changed = changed_files(current['bundle'], deployed.get('bundle', {}))
+        removed = sorted(set(deployed.get('bundle', {})) - set(bundle))
+        for name in changed:
+            target = os.path.join(container_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(bundle[name], target)
+        for name in removed:
+            try:
+                os.remove(os.path.join(container_dir, name))
+            except FileNotFoundError:
+                pass
+        if changed or removed:
+            install = 'copied %d changed files, removed %d' % (len(changed), len(removed))
+        else:
+            install = 'unchanged, relaunch only'
+    else:
+        run(['xcrun', 'simctl', 'install', udid, app_dir])
+        install = 'full install'
+    install_time = time.monotonic() - start
+    save_deploy_state(key, current)
+
+    start = time.monotonic()
+    launch_code = run_captured(['xcrun', 'simctl', 'launch', '--terminate-running-process', udid, bundle_id], sim_name)
+    report_fast_redeploy(build_time, install, install_time, launch_code, time.monotonic() - start)
+
+
+
+def run_captured(cmd, label: str) -> int:
+    """Run `cmd` and log its output as one block, prefixed with `label`."""
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except OSError as e:
+        log('[%s] > %s\n[%s] %s' % (label, ' '.join(cmd), label, e))
+        return 127
+    lines = ['[%s] > %s' % (label, ' '.join(cmd))]
+    lines += ['[%s] %s' % (label, line) for line in result.stdout.decode('utf-8', errors='replace').splitlines()]
+    log('\n'.join(lines))
+    return result.returncode
+
+
+def app_build(app: str, net_version: str, platform: str):
+    """Return (csproj, tfm, runtime identifier or None) of one build run-matrix needs."""
+    csproj = resolve_csproj(app, net_version)
+    if platform == 'android':
+        return csproj, get_android_tfm(net_version), None
+    return csproj, get_ios_tfm(net_version), IOS_SIMULATOR_RID
+
+
+def app_output_dir(csproj: str, config: str, tfm: str, rid: Optional[str]) -> str:
+    # Directory.Build.props puts outputs in .artifacts/{ProjectName}/bin/{Config}/{TFM}/,
+    # or in bin/{RID}/{Config}/{TFM}/{RID}/ for builds with a RuntimeIdentifier
+    project = os.path.splitext(os.path.basename(csproj))[0]
+    if rid:
+        return os.path.join(ROOT, '.artifacts', project, 'bin', rid, config, tfm, rid)
+    return os.path.join(ROOT, '.artifacts', project, 'bin', config, tfm)
+
+
+def find_android_package(output_dir: str):
+    """Return (signed apk, application id) from an Android build output, or None."""
+    apks = sorted(glob.glob(os.path.join(output_dir, '*-Signed.apk')))
+    if not apks:
+        return None
+    return apks[0], os.path.basename(apks[0])[:-len('-Signed.apk')]
+
+
+def find_ios_app(output_dir: str):
+    """Return (.app bundle, bundle identifier) from an iOS simulator build output, or None."""
+    for app_dir in sorted(glob.glob(os.path.join(output_dir, '*.app'))):
+        try:
+            with open(os.path.join(app_dir, 'Info.plist'), 'rb') as f:
+                return app_dir, plistlib.load(f).get('CFBundleIdentifier')
+        except (OSError, plistlib.InvalidFileException):
+            continue
+    return None
+
+
+def deploy_android(serial: str, output_dir: str) -> int:
+    package = find_android_package(output_dir)
+    if not package:
+        log('[%s] No signed APK in %s' % (serial, output_dir))
+        return 1
+    apk, application_id = package
+    adb = find_adb() or 'adb'
+    forget_deploy_state('android:%s:' % serial)
+    code = run_captured([adb, '-s', serial, 'install', '-r', apk], serial)
+    if code != 0:
+        return code
+    return run_captured([adb, '-s', serial, 'shell', 'monkey', '-p', application_id,
+                         '-c', 'android.intent.category.LAUNCHER', '1'], serial)
+
+
+def deploy_ios(sim_name: str, udid: str, output_dir: str) -> int:
+    app = find_ios_app(output_dir)
+    if not app:
+        log('[%s] No .app bundle in %s' % (sim_name, output_dir))
+        return 1
+    app_dir, bundle_id = app
+    forget_deploy_state('ios:%s:' % udid)
+    code = run_captured(['xcrun', 'simctl', 'install', udid, app_dir], sim_name)
+    if code != 0:
+        return code
+    return run_captured(['xcrun', 'simctl', 'launch', udid, bundle_id], sim_name)
+
+
+class MatrixDevice:
+    """An emulator or simulator run-matrix deploys to, booted in the background."""
+
+    def __init__(self, platform: str, name: str, port: Optional[int] = None):
+        self.platform = platform
+        self.name = name
+        self.port = port
+        self.device_id: Optional[str] = None
+        self.booted = None
+        # Apps are installed and launched one at a time per device
+        self.deploys = ThreadPoolExecutor(max_workers=1, thread_name_prefix='deploy-' + name)
+
+    def boot(self) -> bool:
+        start = time.monotonic()
+        if self.platform == 'android':
+            self.device_id = boot_android_avd(self.name, self.port)
+            ok = self.device_id is not None
+        else:
+            boot_ios_sim(self.name)
+            self.device_id = get_ios_sim_udid(self.name)
+            ok = self.device_id is not None
+        log('[%s] %s after %.1fs' % (self.name, 'Booted' if ok else 'Failed to boot', time.monotonic() - start))
+        return ok
+
+    def deploy(self, output_dir: str) -> int:
+        try:
+            booted = self.booted.result()
+        except SystemExit:
+            booted = False
+        if not booted:
+            return 1
+        if self.platform == 'android':
+            return deploy_android(self.device_id, output_dir)
+        return deploy_ios(self.name, self.device_id, output_dir)
+
+
+def run_matrix(config: str, apps: List[str], net_versions: List[str], avds: List[str], sims: List[str]) -> int:
+    """Run every app x .NET version on every given emulator and simulator.
+
+    Devices boot in the background while the apps build. Each distinct
+    csproj/TFM is built once (one .NET version at a time, as global.json
+    is shared) and, as soon as it is built, installed and launched on all
+    devices of its platform. Devices deploy concurrently; each one works
+    through its apps in order.
+    """
+    devices = [MatrixDevice('android', avd, ANDROID_EMULATOR_BASE_PORT + 2 * i) for i, avd in enumerate(avds)]
+    devices += [MatrixDevice('ios', sim) for sim in sims]
+    if not devices:
+        log('No devices given; pass --avd and/or --ios-sim')
+        return 1
+    platforms = [platform for platform in ('android', 'ios') if any(d.platform == platform for d in devices)]
+
+    start = time.monotonic()
+    boots = ThreadPoolExecutor(max_workers=len(devices), thread_name_prefix='boot')
+    for device in devices:
+        device.booted = boots.submit(device.boot)
+
+    builds = {}
+    rows = []
+    for net_version in net_versions:
+        set_net_version(net_version)
+        for app in apps:
+            for platform in platforms:
+                build = app_build(app, net_version, platform)
+                if build not in builds:
+                    csproj, tfm, rid = build
+                    cmd = ['dotnet', 'build', csproj, '-c', config, '-f', tfm]
+                    if rid:
+                        cmd.append('-p:RuntimeIdentifier=%s' % rid)
+                    if platform == 'android':
+                        # Debug builds otherwise leave the assemblies out of the APK for
+                        # fast deployment, and a plain `adb install` would ship an app without them
+                        cmd.append('-p:EmbedAssembliesIntoApk=true')
+                    build_start = time.monotonic()
+                    builds[build] = (run(cmd, check=False), time.monotonic() - build_start)
+                code, build_time = builds[build]
+                for device in devices:
+                    if device.platform != platform:
+                        continue
+                    deploy = None
+                    if code == 0:
+                        deploy = device.deploys.submit(_timed, device.deploy, app_output_dir(build[0], config, build[1], build[2]))
+                    rows.append((app, net_version, device, code, build_time, deploy))
+
+    results = []
+    failed = False
+    for app, net_version, device, build_code, build_time, deploy in rows:
+        deploy_code, deploy_time = deploy.result() if deploy else (None, 0.0)
+        failed = failed or build_code != 0 or deploy_code != 0
+        results.append((app, net_version, device, build_code, build_time, deploy_code, deploy_time))
+    for device in devices:
+        device.deploys.shutdown()
+    boots.shutdown()
+
+    log('')
+    log('%-14s %-6s %-8s %-20s %-12s %-12s' % ('App', '.NET', 'Platform', 'Device', 'Build', 'Deploy'))
+    for app, net_version, device, build_code, build_time, deploy_code, deploy_time in results:
+        build_status = ('ok' if build_code == 0 else 'exit %d' % build_code) + ' %.1fs' % build_time
+        if deploy_code is None:
+            deploy_status = 'skipped'
+        else:
+            deploy_status = ('ok' if deploy_code == 0 else 'exit %d' % deploy_code) + ' %.1fs' % deploy_time
+        log('%-14s %-6s %-8s %-20s %-12s %-12s' % (app, net_version, device.platform, device.name,
+                                                 build_status, deploy_status))
+    log('Matrix finished in %.1fs' % (time.monotonic() - start))
+    return 1 if failed else 0
+
+
+def _timed(func, *args):
+    start = time.monotonic()
+    code = func(*args)
+    return code, time.monotonic() - start
+
+
+def run_emulators(action: str, avd_names: List[str], count: int) -> int:
+    if action == 'warm':
+        start = time.monotonic()
+        serials = _EMULATOR_POOL.warm(avd_names, count)
+        log('%d emulator(s) warm after %.1fs: %s' % (len(serials), time.monotonic() - start, ', '.join(serials)))
+        return 0 if len(serials) == count else 1
+    if action == 'snapshot':
+        ok = all(_EMULATOR_POOL.save_snapshot(serial) for serial in _EMULATOR_POOL.running())
+        return 0 if ok else 1
+    if action == 'stop':
+        _EMULATOR_POOL.stop()
+        return 0
+    for serial, name in sorted(_EMULATOR_POOL.running().items()):
+        log('%-16s %-24s %s' % (serial, name, 'snapshot ' + ANDROID_SNAPSHOT_NAME
+                                if _EMULATOR_POOL.has_snapshot(name) else 'no snapshot'))
+    return 0
+
+
 def list_android_avds() -> None:
-    emu = shutil.which('emulator') or os.path.expanduser('~/Library/Android/sdk/emulator/emulator')
-    if not os.path.exists(emu):
+    if not find_emulator():
         log('Android emulator not found.')
         return
-    run([emu, '-list-avds'], check=False)
+    for avd in _INVENTORY.get('avds'):
+        log(avd['name'])
 
 
 def list_ios_sims() -> None:
-    run(['xcrun', 'simctl', 'list', 'devices', 'available'], check=False)
+    booted = booted_ios_simulators()
+    for sim in sorted(_INVENTORY.get('simulators'), key=lambda sim: (sim['runtime'], sim['name'])):
+        log('%-12s %-28s %s (%s)' % (sim['runtime'], sim['name'], sim['udid'],
+                                     'Booted' if sim['udid'] in booted else 'Shutdown'))
 
 
 def list_ios_devices() -> None:
     """List available physical iOS devices."""
-    run(['xcrun', 'xctrace', 'list', 'devices'], check=False)
+    for device in _INVENTORY.get('devices'):
+        log('%s (%s) (%s)' % (device['name'], device['os'], device['udid']))
 
 
 def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='Configure and run the MAUI Example/Test apps')
     sub = parser.add_subparsers(dest='command')
 
-    common = argparse.ArgumentParser(add_help=False)
+    inventory = argparse.ArgumentParser(add_help=False)
+    inventory.add_argument('--refresh', action='store_true', help='Rescan AVDs, simulators and devices instead of using the cached inventory')
+
+    common = argparse.ArgumentParser(add_help=False, parents=[inventory])
     common.add_argument('-c', '--config', default='Debug', choices=['Debug', 'Release'], help='Build configuration (default: Debug)')
 
     # Run
@@ -265,36 +1059,77 @@ def parse_args(argv=None):
     p_run_android.add_argument('app', choices=['test', 'example', 'example-nuget'], help='Which app to run')
     p_run_android.add_argument('--net10', action='store_true', help='Use .NET 10')
     p_run_android.add_argument('--avd', default=os.environ.get('ANDROID_AVD', 'Pixel_5_API_34'), help='Android AVD name')
+    p_run_android.add_argument('--fast', action='store_true',
+                               help='Relaunch or push only changed assemblies when the installed app is up to date')
+    p_run_android.add_argument('--save-snapshot', action='store_true',
+                               help='Save the emulator quick-boot snapshot after deploying, so later boots start app-ready')
 
     p_run_ios = sub.add_parser('run-ios', parents=[common], help='Run selected app on iOS simulator or device')
     p_run_ios.add_argument('app', choices=['test', 'example', 'example-nuget'], help='Which app to run')
     p_run_ios.add_argument('--net10', action='store_true', help='Use .NET 10')
     p_run_ios.add_argument('--ios-sim', default=os.environ.get('IOS_SIM', 'iPhone 15'), help='iOS Simulator name (used if --device not specified)')
     p_run_ios.add_argument('--device', help='Physical iOS device name (e.g., "uPhone"). Overrides --ios-sim.')
+    p_run_ios.add_argument('--fast', action='store_true',
+                           help='Simulator only: relaunch or copy only changed files when the installed app is up to date')
+
+    p_run_matrix = sub.add_parser('run-matrix', parents=[common],
+                                  help='Build each app once and run it on several emulators/simulators at once')
+    p_run_matrix.add_argument('--apps', nargs='+', default=['test', 'example'], choices=['test', 'example', 'example-nuget'],
+                              help='Apps to run (default: test example)')
+    p_run_matrix.add_argument('--net', nargs='+', default=['net8', 'net10'], choices=['net8', 'net10'],
+                              help='.NET versions to run (default: net8 net10)')
+    p_run_matrix.add_argument('--avd', action='append', default=[],
+                              help='Android AVD to run on; repeat for several (default: $ANDROID_AVD or Pixel_5_API_34)')
+    p_run_matrix.add_argument('--ios-sim', action='append', default=[],
+                              help='iOS Simulator to run on; repeat for several (default: $IOS_SIM or iPhone 15)')
+    p_run_matrix.add_argument('--platforms', nargs='+', default=['android', 'ios'], choices=['android', 'ios'],
+                              help='Platforms to run on (default: android ios)')
+
+    p_emulators = sub.add_parser('emulators', parents=[inventory], help='Manage the pool of running Android emulators')
+    p_emulators.add_argument('action', choices=['list', 'warm', 'snapshot', 'stop'],
+                             help='list running emulators, warm up headless ones, snapshot or stop the running ones')
+    p_emulators.add_argument('--avd', action='append', default=[],
+                             help='AVD to warm up; repeat for several (default: $ANDROID_AVD or Pixel_5_API_34)')
+    p_emulators.add_argument('-n', '--count', type=int, default=1, help='Number of emulators to keep warm (default: 1)')
 
     # List devices
-    sub.add_parser('list-avds', help='List Android AVDs')
-    sub.add_parser('list-sims', help='List available iOS simulators')
-    sub.add_parser('list-devices', help='List available physical iOS devices')
+    sub.add_parser('list-avds', parents=[inventory], help='List Android AVDs')
+    sub.add_parser('list-sims', parents=[inventory], help='List available iOS simulators')
+    sub.add_parser('list-devices', parents=[inventory], help='List available physical iOS devices')
 
     return parser.parse_args(argv)
 
 def main(argv=None) -> int:
     args = parse_args(argv)
+    try:
+        return run_command(args)
+    finally:
+        _INVENTORY.wait()
+
+
+def run_command(args) -> int:
     if not args.command:
-        print('Usage: maui_run.py [run-android|run-ios|list-avds|list-sims|list-devices] [options]')
+        print('Usage: maui_run.py [run-android|run-ios|run-matrix|emulators|list-avds|list-sims|list-devices] [options]')
         return 1
+    _INVENTORY.force_refresh = args.refresh
     net_version = 'net8'
     if hasattr(args, 'net10') and args.net10:
         net_version = 'net10'
     if args.command == 'run-android':
-        run_android(args.config, args.avd, args.app, net_version)
+        run_android(args.config, args.avd, args.app, net_version, args.fast, args.save_snapshot)
         return 0
     if args.command == 'run-ios':
         device_name = getattr(args, 'device', None)
         sim_name = args.ios_sim if not device_name else None
-        run_ios(args.config, sim_name, args.app, net_version, device_name)
+        run_ios(args.config, sim_name, args.app, net_version, device_name, args.fast)
         return 0
+    if args.command == 'run-matrix':
+        avds = (args.avd or [os.environ.get('ANDROID_AVD', 'Pixel_5_API_34')]) if 'android' in args.platforms else []
+        sims = (args.ios_sim or [os.environ.get('IOS_SIM', 'iPhone 15')]) if 'ios' in args.platforms else []
+        # An AVD can only run once at a time
+        return run_matrix(args.config, args.apps, args.net, list(dict.fromkeys(avds)), list(dict.fromkeys(sims)))
+    if args.command == 'emulators':
+        return run_emulators(args.action, args.avd or [os.environ.get('ANDROID_AVD', 'Pixel_5_API_34')], args.count)
     if args.command == 'list-avds':
         list_android_avds()
         return 0
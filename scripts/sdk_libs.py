@@ -2,12 +2,15 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import fcntl
+import hashlib
 import os
 import shutil
 import subprocess
 import sys
 import time
 import signal
+import threading
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
@@ -48,27 +51,46 @@ IOS_TEST_BINDING_DIR = os.path.join(ROOT, 'ios', 'TestLibrary.iOSBinding')
 PLATFORMS = ['android', 'ios']
 SDKS = ['core', 'oaid', 'meta_referrer', 'google_lvl', 'test', 'plugins']
 
+_OUTPUT_LOCK = threading.Lock()
+_pipeline = threading.local()
+
+def log(msg):
+    """Print a message, prefixing each line with the current pipeline's label."""
+    label = getattr(_pipeline, 'label', None)
+    if label:
+        msg = '\n'.join('[%s] %s' % (label, line) for line in str(msg).split('\n'))
+    with _OUTPUT_LOCK:
+        sys.stdout.write('%s\n' % msg)
+        sys.stdout.flush()
+
 def run(cmd, cwd=None, env=None, check=True):
-    print('> ' + ' '.join(cmd))
-    result = subprocess.run(cmd, cwd=cwd, env=env)
-    if check and result.returncode != 0:
-        sys.exit(result.returncode)
-    return result.returncode
+    log('> ' + ' '.join(cmd))
+    if getattr(_pipeline, 'label', None):
+        # Stream through log() so concurrent pipelines stay line-prefixed
+        process = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        for line in process.stdout:
+            log(line.decode('utf-8', errors='replace').rstrip('\r\n'))
+        returncode = process.wait()
+    else:
+        returncode = subprocess.run(cmd, cwd=cwd, env=env).returncode
+    if check and returncode != 0:
+        sys.exit(returncode)
+    return returncode
 
 
 def ensure_paths():
     if not os.path.isdir(ANDROID_SUBMODULE_ROOT):
-        print('Android submodule directory not found: %s' % ANDROID_SUBMODULE_ROOT)
+        log('Android submodule directory not found: %s' % ANDROID_SUBMODULE_ROOT)
         sys.exit(1)
     if not os.path.isfile(ANDROID_GRADLEW):
-        print('Gradle wrapper not found: %s' % ANDROID_GRADLEW)
+        log('Gradle wrapper not found: %s' % ANDROID_GRADLEW)
         sys.exit(1)
     if not os.path.isdir(ANDROID_BINDING_LIBS_DIR):
         os.makedirs(ANDROID_BINDING_LIBS_DIR, exist_ok=True)
     if not os.path.isdir(ANDROID_TEST_BINDING_LIBS_DIR):
         os.makedirs(ANDROID_TEST_BINDING_LIBS_DIR, exist_ok=True)
     if not os.path.isdir(IOS_SDK_ROOT):
-        print('iOS SDK directory not found: %s' % IOS_SDK_ROOT)
+        log('iOS SDK directory not found: %s' % IOS_SDK_ROOT)
         # iOS build is optional; don't exit here.
     if not os.path.isdir(IOS_BINDING_DIR):
         # Create if missing so copy succeeds when building iOS
@@ -77,6 +99,99 @@ def ensure_paths():
         # Create if missing so copy succeeds when copying test framework
         os.makedirs(IOS_TEST_BINDING_DIR, exist_ok=True)
 
+GRADLE_BATCH_OPTIONS = [
+    '--daemon',
+    '--parallel',
+    '--configuration-cache',
+    # Plugins that are not configuration-cache compatible only disable the
+    # cache for this run instead of failing the build
+    '--configuration-cache-problems=warn',
+]
+
+ANDROID_CORE_AAR = dict(
+    gradle_task_template=':sdk-core:adjustCoreAar{Variant}',
+    candidate_path_templates=[
+        os.path.join(ANDROID_SDK_CORE_DIR, 'build', 'libs', 'adjust-sdk-{variant}.aar'),
+        os.path.join(ANDROID_SDK_CORE_DIR, 'build', 'outputs', 'aar', 'sdk-core-{variant}.aar'),
+    ],
+    dest_path=os.path.join(ANDROID_BINDING_LIBS_DIR, 'adjust-android.aar'),
+    search_dir=None,
+    search_prefix=None,
+)
+
+ANDROID_TEST_LIBRARY_AAR = dict(
+    gradle_task_template=':tests:test-library:adjustTestLibraryAar{Variant}',
+    candidate_path_templates=[
+        os.path.join(ANDROID_TEST_LIBRARY_DIR, 'build', 'libs', 'test-library-{variant}.aar'),
+        os.path.join(ANDROID_TEST_LIBRARY_DIR, 'build', 'outputs', 'aar', 'test-library-{variant}.aar'),
+    ],
+    dest_path=os.path.join(ANDROID_TEST_BINDING_LIBS_DIR, 'test-library.aar'),
+    search_dir=None,
+    search_prefix=None,
+)
+
+ANDROID_TEST_OPTIONS_AAR = dict(
+    gradle_task_template=':tests:test-options:assemble{Variant}',
+    candidate_path_templates=[
+        os.path.join(ANDROID_TEST_OPTIONS_DIR, 'build', 'outputs', 'aar', 'test-options-{variant}.aar'),
+    ],
+    dest_path=os.path.join(ANDROID_TEST_BINDING_LIBS_DIR, 'test-options.aar'),
+    search_dir=os.path.join(ANDROID_TEST_OPTIONS_DIR, 'build', 'outputs', 'aar'),
+    search_prefix='test-options-'
+)
+
+ANDROID_OAID_AAR = dict(
+    # OAID module defines a single copy task that always depends on assembleRelease.
+    # There is no variant-suffixed task (e.g., ...AarDebug), so call the fixed task.
+    gradle_task_template=':plugins:sdk-plugin-oaid:adjustOaidAndroidAar',
+    candidate_path_templates=[
+        # Direct output from assembleRelease
+        os.path.join(ANDROID_OAID_DIR, 'build', 'outputs', 'aar', 'sdk-plugin-oaid-release.aar'),
+        # Or the copied/renamed artifact produced by adjustOaidAndroidAar
+        os.path.join(ANDROID_OAID_DIR, 'build', 'libs', 'sdk-plugin-oaid.aar'),
+    ],
+    dest_path=os.path.join(ANDROID_OAID_BINDING_LIBS_DIR, 'adjust-android-oaid.aar'),
+    search_dir=None,
+    search_prefix=None,
+)
+
+ANDROID_META_REFERRER_AAR = dict(
+    # Meta Referrer module defines a single copy task that always depends on assembleRelease.
+    # There is no variant-suffixed task (e.g., ...AarDebug), so call the fixed task.
+    gradle_task_template=':plugins:sdk-plugin-meta-referrer:adjustMetaReferrerPluginAar',
+    candidate_path_templates=[
+        # Direct output from assembleRelease
+        os.path.join(ANDROID_META_REFERRER_DIR, 'build', 'outputs', 'aar', 'sdk-plugin-meta-referrer-release.aar'),
+        # Or the copied/renamed artifact produced by adjustMetaReferrerPluginAar
+        os.path.join(ANDROID_META_REFERRER_DIR, 'build', 'libs', 'sdk-plugin-meta-referrer.aar'),
+    ],
+    dest_path=os.path.join(ANDROID_META_REFERRER_BINDING_LIBS_DIR, 'adjust-android-meta-referrer.aar'),
+    search_dir=None,
+    search_prefix=None,
+)
+
+ANDROID_GOOGLE_LVL_AAR = dict(
+    gradle_task_template=':plugins:sdk-plugin-google-lvl:adjustLvlPluginAar',
+    candidate_path_templates=[
+        os.path.join(ANDROID_GOOGLE_LVL_DIR, 'build', 'outputs', 'aar', 'sdk-plugin-google-lvl-release.aar'),
+        os.path.join(ANDROID_GOOGLE_LVL_DIR, 'build', 'libs', 'sdk-plugin-google-lvl.aar'),
+    ],
+    dest_path=os.path.join(ANDROID_GOOGLE_LVL_BINDING_LIBS_DIR, 'adjust-android-google-lvl.aar'),
+    search_dir=None,
+    search_prefix=None,
+)
+
+VARIANT_CAP = 'Release'
+VARIANT_LOWER = 'release'
+
+def _ensure_gradlew_executable():
+    try:
+        st = os.stat(ANDROID_GRADLEW)
+        if not (st.st_mode & 0o111):
+            os.chmod(ANDROID_GRADLEW, st.st_mode | 0o111)
+    except Exception:
+        pass
+
 def _build_and_copy_aar_common(
     gradle_task_template,
     candidate_path_templates,
@@ -93,25 +208,50 @@ def _build_and_copy_aar_common(
     - search_dir/search_prefix: optional fallback directory and filename prefix to scan
     """
     ensure_paths()
+    _ensure_gradlew_executable()
 
-    variant_cap = 'Release'
-    variant_lower = 'release'
+    gradle_task = gradle_task_template.format(Variant=VARIANT_CAP)
+    run([ANDROID_GRADLEW, gradle_task, '--no-daemon'], cwd=ANDROID_SUBMODULE_ROOT)
 
-    # Ensure gradlew is executable
-    try:
-        st = os.stat(ANDROID_GRADLEW)
-        if not (st.st_mode & 0o111):
-            os.chmod(ANDROID_GRADLEW, st.st_mode | 0o111)
-    except Exception:
-        pass
+    return _copy_built_aar(candidate_path_templates, dest_path, search_dir, search_prefix)
 
-    gradle_task = gradle_task_template.format(Variant=variant_cap)
-    run([ANDROID_GRADLEW, gradle_task, '--no-daemon'], cwd=ANDROID_SUBMODULE_ROOT)
+def build_android_aars(aars, messages=None):
+    """Build several AARs in a single Gradle invocation, then copy each of them.
+
+    - aars: list of _build_and_copy_aar_common keyword dicts (e.g. ANDROID_CORE_AAR)
+    - messages: optional per-AAR step messages, logged before each copy so the
+      output reads the same as building them one by one
 
+    Runs all tasks against a warm Gradle daemon with parallel execution and
+    the configuration cache, so JVM startup and project configuration are
+    paid once instead of once per AAR.
+    """
+    if not aars:
+        return []
+    ensure_paths()
+    _ensure_gradlew_executable()
+
+    gradle_tasks = []
+    for aar in aars:
+        gradle_task = aar['gradle_task_template'].format(Variant=VARIANT_CAP)
+        if gradle_task not in gradle_tasks:
+            gradle_tasks.append(gradle_task)
+    run([ANDROID_GRADLEW, *gradle_tasks, *GRADLE_BATCH_OPTIONS], cwd=ANDROID_SUBMODULE_ROOT)
+
+    copied = []
+    for aar, message in zip(aars, messages or [None] * len(aars)):
+        if message:
+            log(message)
+        copied.append(_copy_built_aar(aar['candidate_path_templates'], aar['dest_path'],
+                                      aar.get('search_dir'), aar.get('search_prefix')))
+    return copied
+
+def _copy_built_aar(candidate_path_templates, dest_path, search_dir=None, search_prefix=None):
+    """Locate an AAR produced by gradle and copy it to destination."""
     produced_path = None
     tried_paths = []
     for tpl in candidate_path_templates:
-        candidate = tpl.format(variant=variant_lower)
+        candidate = tpl.format(variant=VARIANT_LOWER)
         tried_paths.append(candidate)
         if os.path.isfile(candidate):
             produced_path = candidate
@@ -124,148 +264,282 @@ def _build_and_copy_aar_common(
                 continue
             if search_prefix and not fn.startswith(search_prefix):
                 continue
-            if variant_lower in fn:
+            if VARIANT_LOWER in fn:
                 produced_path = os.path.join(search_dir, fn)
                 break
 
     if produced_path is None:
-        print('Failed to locate built AAR. Looked for:')
+        log('Failed to locate built AAR. Looked for:')
         for p in tried_paths:
-            print('  ' + p)
+            log('  ' + p)
         if search_dir:
-            print('Also searched dir: ' + search_dir)
+            log('Also searched dir: ' + search_dir)
         sys.exit(1)
 
-    print('Produced AAR: %s' % produced_path)
+    log('Produced AAR: %s' % produced_path)
 
-    final_dest = dest_path.format(variant=variant_lower)
-    os.makedirs(os.path.dirname(final_dest), exist_ok=True)
-    shutil.copyfile(produced_path, final_dest)
-    print('Copied AAR to %s' % final_dest)
+    final_dest = dest_path.format(variant=VARIANT_LOWER)
+    if sync_file(produced_path, final_dest):
+        log('Copied AAR to %s' % final_dest)
+    else:
+        log('AAR unchanged, keeping %s' % final_dest)
     return final_dest
 
 
-def build_android_core():
-    return _build_and_copy_aar_common(
-        gradle_task_template=':sdk-core:adjustCoreAar{Variant}',
-        candidate_path_templates=[
-            os.path.join(ANDROID_SDK_CORE_DIR, 'build', 'libs', 'adjust-sdk-{variant}.aar'),
-            os.path.join(ANDROID_SDK_CORE_DIR, 'build', 'outputs', 'aar', 'sdk-core-{variant}.aar'),
-        ],
-        dest_path=os.path.join(ANDROID_BINDING_LIBS_DIR, 'adjust-android.aar'),
-        search_dir=None,
-        search_prefix=None,
-    )
+# Linux FICLONE ioctl: share the source's data blocks (btrfs, xfs, ...)
+FICLONE = 0x40049409
 
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-def build_android_test_library():
-    return _build_and_copy_aar_common(
-        gradle_task_template=':tests:test-library:adjustTestLibraryAar{Variant}',
-        candidate_path_templates=[
-            os.path.join(ANDROID_TEST_LIBRARY_DIR, 'build', 'libs', 'test-library-{variant}.aar'),
-            os.path.join(ANDROID_TEST_LIBRARY_DIR, 'build', 'outputs', 'aar', 'test-library-{variant}.aar'),
-        ],
-        dest_path=os.path.join(ANDROID_TEST_BINDING_LIBS_DIR, 'test-library.aar'),
-        search_dir=None,
-        search_prefix=None,
+def _same_file_content(src, dst):
+    """Compare two files by size and mtime first, and by hash only when needed."""
+    try:
+        src_st = os.stat(src)
+        dst_st = os.stat(dst)
+    except OSError:
+        return False
+    if src_st.st_size != dst_st.st_size:
+        return False
+    # A destination hardlinked to the build output would change along with
+    # it, so it is replaced by a file of its own
+    if (src_st.st_dev, src_st.st_ino) == (dst_st.st_dev, dst_st.st_ino):
+        return False
+    # Destinations are always published with the source mtime (see
+    # _place_file), so a matching mtime means the file was synced before
+    if src_st.st_mtime_ns == dst_st.st_mtime_ns:
+        return True
+    return _file_digest(src) == _file_digest(dst)
+
+def _place_file(src, dst):
+    """Create `dst` (which must not exist) with the content, mode and mtime of `src`.
+
+    Tries a reflink and falls back to a copy. Never a hardlink: Gradle and
+    MSBuild may rewrite their outputs in place, which would silently change
+    the published file too.
+    """
+    try:
+        with open(src, 'rb') as src_file, open(dst, 'xb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        shutil.copystat(src, dst)
+        return
+    except OSError:
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+def _temp_sibling(path, tag):
+    return os.path.join(os.path.dirname(path), '.%s.%s-%d' % (os.path.basename(path), tag, os.getpid()))
+
+def sync_file(src, dst):
+    """Publish `src` at `dst` only when the content differs.
+
+    The new file is staged next to `dst` and swapped in with an atomic
+    rename, so MSBuild never sees a half-written file and an unchanged
+    artifact keeps its mtime. Returns True if `dst` was replaced.
+    """
+    if _same_file_content(src, dst):
+        return False
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = _temp_sibling(dst, 'tmp')
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        _place_file(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+    return True
+
+def _tree_entries(root):
+    """Map each relative path under `root` to its kind: 'dir', 'file' or ('link', target)."""
+    entries = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.normpath(os.path.join(rel_dir, name))
+            if os.path.islink(path):
+                entries[rel] = ('link', os.readlink(path))
+            elif os.path.isdir(path):
+                entries[rel] = 'dir'
+            else:
+                entries[rel] = 'file'
+        # Don't descend into symlinked directories (framework Versions/Current)
+        dirnames[:] = [d for d in dirnames if not os.path.islink(os.path.join(dirpath, d))]
+    return entries
+
+def _same_tree_content(src, dst):
+    if not os.path.isdir(dst):
+        return False
+    src_entries = _tree_entries(src)
+    if src_entries != _tree_entries(dst):
+        return False
+    return all(
+        _same_file_content(os.path.join(src, rel), os.path.join(dst, rel))
+        for rel, kind in src_entries.items() if kind == 'file'
     )
 
+def sync_tree(src, dst):
+    """Publish the directory `src` at `dst` only when any file in it differs.
+
+    The new tree is staged next to `dst` (reflinked or copied per file) and
+    swapped in by rename. Returns True if `dst` was replaced.
+    """
+    if _same_tree_content(src, dst):
+        return False
+    tmp = _temp_sibling(dst, 'tmp')
+    old = _temp_sibling(dst, 'old')
+    for leftover in (tmp, old):
+        if os.path.lexists(leftover):
+            shutil.rmtree(leftover)
+    try:
+        shutil.copytree(src, tmp, symlinks=True, copy_function=_place_file)
+        if os.path.lexists(dst):
+            os.rename(dst, old)
+        os.rename(tmp, dst)
+    finally:
+        if os.path.lexists(tmp):
+            shutil.rmtree(tmp)
+    if os.path.lexists(old):
+        shutil.rmtree(old)
+    return True
+
+def build_android_core():
+    return _build_and_copy_aar_common(**ANDROID_CORE_AAR)
+
+def build_android_test_library():
+    return _build_and_copy_aar_common(**ANDROID_TEST_LIBRARY_AAR)
 
 def build_android_test_options():
-    return _build_and_copy_aar_common(
-        gradle_task_template=':tests:test-options:assemble{Variant}',
-        candidate_path_templates=[
-            os.path.join(ANDROID_TEST_OPTIONS_DIR, 'build', 'outputs', 'aar', 'test-options-{variant}.aar'),
-        ],
-        dest_path=os.path.join(ANDROID_TEST_BINDING_LIBS_DIR, 'test-options.aar'),
-        search_dir=os.path.join(ANDROID_TEST_OPTIONS_DIR, 'build', 'outputs', 'aar'),
-        search_prefix='test-options-'
-    )
+    return _build_and_copy_aar_common(**ANDROID_TEST_OPTIONS_AAR)
 
 def build_android_oaid():
-    return _build_and_copy_aar_common(
-        # OAID module defines a single copy task that always depends on assembleRelease.
-        # There is no variant-suffixed task (e.g., ...AarDebug), so call the fixed task.
-        gradle_task_template=':plugins:sdk-plugin-oaid:adjustOaidAndroidAar',
-        candidate_path_templates=[
-            # Direct output from assembleRelease
-            os.path.join(ANDROID_OAID_DIR, 'build', 'outputs', 'aar', 'sdk-plugin-oaid-release.aar'),
-            # Or the copied/renamed artifact produced by adjustOaidAndroidAar
-            os.path.join(ANDROID_OAID_DIR, 'build', 'libs', 'sdk-plugin-oaid.aar'),
-        ],
-        dest_path=os.path.join(ANDROID_OAID_BINDING_LIBS_DIR, 'adjust-android-oaid.aar'),
-        search_dir=None,
-        search_prefix=None,
-    )
+    return _build_and_copy_aar_common(**ANDROID_OAID_AAR)
 
 def build_android_meta_referrer():
-    return _build_and_copy_aar_common(
-        # Meta Referrer module defines a single copy task that always depends on assembleRelease.
-        # There is no variant-suffixed task (e.g., ...AarDebug), so call the fixed task.
-        gradle_task_template=':plugins:sdk-plugin-meta-referrer:adjustMetaReferrerPluginAar',
-        candidate_path_templates=[
-            # Direct output from assembleRelease
-            os.path.join(ANDROID_META_REFERRER_DIR, 'build', 'outputs', 'aar', 'sdk-plugin-meta-referrer-release.aar'),
-            # Or the copied/renamed artifact produced by adjustMetaReferrerPluginAar
-            os.path.join(ANDROID_META_REFERRER_DIR, 'build', 'libs', 'sdk-plugin-meta-referrer.aar'),
-        ],
-        dest_path=os.path.join(ANDROID_META_REFERRER_BINDING_LIBS_DIR, 'adjust-android-meta-referrer.aar'),
-        search_dir=None,
-        search_prefix=None,
-    )
+    return _build_and_copy_aar_common(**ANDROID_META_REFERRER_AAR)
 
 def build_android_google_lvl():
-    return _build_and_copy_aar_common(
-        gradle_task_template=':plugins:sdk-plugin-google-lvl:adjustLvlPluginAar',
-        candidate_path_templates=[
-            os.path.join(ANDROID_GOOGLE_LVL_DIR, 'build', 'outputs', 'aar', 'sdk-plugin-google-lvl-release.aar'),
-            os.path.join(ANDROID_GOOGLE_LVL_DIR, 'build', 'libs', 'sdk-plugin-google-lvl.aar'),
-        ],
-        dest_path=os.path.join(ANDROID_GOOGLE_LVL_BINDING_LIBS_DIR, 'adjust-android-google-lvl.aar'),
-        search_dir=None,
-        search_prefix=None,
-    )
+    return _build_and_copy_aar_common(**ANDROID_GOOGLE_LVL_AAR)
 
 def has_none(from_list: list[str], in_list: list[str]) -> bool:
     return not any(arg in in_list for arg in from_list)
 
-def build_libs(targets):
+class BuildPlan:
+    """Build steps split into an Android and an iOS pipeline.
+
+    The two toolchains (Gradle and build_frameworks.sh) share no inputs or
+    outputs, so the pipelines run side by side, each with its own prefixed
+    log stream. Steps within a pipeline still run in order.
+    """
+
+    def __init__(self, batch_gradle=False):
+        self.android = []
+        self.ios = []
+        # With batch_gradle, Android AARs are only collected while walking the
+        # targets and are then built together in one Gradle invocation
+        self.aar_batch = [] if batch_gradle else None
+
+    def add_android_aar(self, message, aar):
+        if self.aar_batch is not None:
+            self.aar_batch.append((message, aar))
+        else:
+            self.android.append((message, lambda: _build_and_copy_aar_common(**aar)))
+
+    def add_ios(self, message, step):
+        self.ios.append((message, step))
+
+    def run(self, sequential=False):
+        """Run both pipelines and return the combined exit status (0 if both succeeded)."""
+        android = list(self.android)
+        if self.aar_batch:
+            messages = [message for message, _ in self.aar_batch]
+            batch = [aar for _, aar in self.aar_batch]
+            android.append(('> Building %d Android AARs in one Gradle invocation' % len(batch),
+                            lambda: build_android_aars(batch, messages)))
+        ios = self.ios
+        if ios and not os.path.isdir(IOS_SDK_ROOT):
+            log('> Skipping iOS pipeline: iOS SDK not found at %s' % IOS_SDK_ROOT)
+            ios = []
+
+        pipelines = [(label, steps) for label, steps in (('android', android), ('ios', ios)) if steps]
+        if sequential or len(pipelines) < 2:
+            for _, steps in pipelines:
+                code = _run_pipeline(steps)
+                if code:
+                    return code
+            return 0
+
+        results = {}
+        threads = []
+        for label, steps in pipelines:
+            thread = threading.Thread(
+                target=lambda label=label, steps=steps: results.update({label: _run_pipeline(steps, label)}),
+                name=label)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        for label, _ in pipelines:
+            if results.get(label):
+                log('> %s pipeline failed (exit code: %s)' % (label, results[label]))
+        return max(results.values(), default=0)
+
+def _run_pipeline(steps, label=None):
+    """Run `steps` in order, returning the exit code of the first failing one."""
+    _pipeline.label = label
+    try:
+        for message, step in steps:
+            log(message)
+            step()
+    except SystemExit as e:
+        # Steps report failure with sys.exit(); in a worker thread that would
+        # silently end the thread, so turn it into an exit status instead
+        code = e.code
+        return code if isinstance(code, int) else 1
+    finally:
+        _pipeline.label = None
+    return 0
+
+def build_libs(targets, batch_gradle=False, sequential=False):
+    plan = BuildPlan(batch_gradle)
     no_sdk_target = has_none(SDKS, targets)
     if 'core' in targets or no_sdk_target:
-        print('> Building Core SDK')
-        build_core(targets)
+        log('> Building Core SDK')
+        build_core(targets, plan)
     if 'oaid' in targets or 'plugins' in targets or no_sdk_target:
-        print('> Building OAID SDK plugin')
-        build_android_oaid()
+        plan.add_android_aar('> Building OAID SDK plugin', ANDROID_OAID_AAR)
     if 'meta_referrer' in targets or 'plugins' in targets or no_sdk_target:
-        print('> Building Meta Referrer SDK plugin')
-        build_android_meta_referrer()
+        plan.add_android_aar('> Building Meta Referrer SDK plugin', ANDROID_META_REFERRER_AAR)
     if 'google_lvl' in targets or 'plugins' in targets or no_sdk_target:
-        print('> Building Google LVL SDK plugin')
-        build_android_google_lvl()
+        plan.add_android_aar('> Building Google LVL SDK plugin', ANDROID_GOOGLE_LVL_AAR)
     if 'test' in targets or no_sdk_target:
-        print('> Building Test Library')
-        build_test(targets)
+        log('> Building Test Library')
+        build_test(targets, plan)
+    return plan.run(sequential)
 
-def build_core(targets):
+def build_core(targets, plan):
     no_platform_target = has_none(PLATFORMS, targets)
     if 'android' in targets or no_platform_target:
-        print('> Building Android Core SDK')
-        build_android_core()
+        plan.add_android_aar('> Building Android Core SDK', ANDROID_CORE_AAR)
     if 'ios' in targets or no_platform_target:
-        print('> Building iOS Core SDK')
-        build_ios_core_scripts()
+        plan.add_ios('> Building iOS Core SDK', build_ios_core_scripts)
 
-def build_test(targets):
+def build_test(targets, plan):
     no_platform_target = has_none(PLATFORMS, targets)
     if 'android' in targets or no_platform_target:
-        print('> Building Android Test Library')
-        build_android_test_library()
-        print('> Building Android Test Options')
-        build_android_test_options()
+        plan.add_android_aar('> Building Android Test Library', ANDROID_TEST_LIBRARY_AAR)
+        plan.add_android_aar('> Building Android Test Options', ANDROID_TEST_OPTIONS_AAR)
     if 'ios' in targets or no_platform_target:
-        print('> Building iOS Test Library')
-        build_ios_test_library_scripts()
+        plan.add_ios('> Building iOS Test Library', build_ios_test_library_scripts)
 
 def build_ios_test_library_scripts():
     """Build AdjustTestLibrary.framework using repo-provided bash scripts.
@@ -275,17 +549,17 @@ def build_ios_test_library_scripts():
     """
     ensure_paths()
     if not os.path.isdir(IOS_SDK_ROOT):
-        print('Skipping iOS build (scripts): iOS SDK not found at %s' % IOS_SDK_ROOT)
+        log('Skipping iOS build (scripts): iOS SDK not found at %s' % IOS_SDK_ROOT)
         return
 
     # Execute the framework build script for static test library framework
     # Script expects to be run from ios_sdk root directory
-    print('Before build_frameworks.sh')
+    log('Before build_frameworks.sh')
     env = os.environ.copy()
     env['SDK_CODE_SIGN_IDENTITY'] = '-'
     code = run(['bash', './scripts/build_frameworks.sh', '-test'], cwd=IOS_SDK_ROOT, env=env, check=False)
     #code = run(['bash', './scripts/build_frameworks.sh', '-test-sim'], cwd=IOS_SDK_ROOT, env=env, check=False)
-    print('After build_frameworks.sh (exit code: %s)' % code)
+    log('After build_frameworks.sh (exit code: %s)' % code)
 
     # Preferred static test library framework output path
     static_test_library_framework = os.path.join(
@@ -297,15 +571,15 @@ def build_ios_test_library_scripts():
     )
 
     if not os.path.isdir(static_test_library_framework):
-        print('Failed to locate produced AdjustTestLibrary.framework under sdk_distribution')
+        log('Failed to locate produced AdjustTestLibrary.framework under sdk_distribution')
         sys.exit(1)
 
     dest_test_library_framework = os.path.join(IOS_TEST_BINDING_DIR, 'AdjustTestLibrary.framework')
-    print('Copying Test Library Framework to %s' % dest_test_library_framework)
-    if os.path.isdir(dest_test_library_framework):
-        shutil.rmtree(dest_test_library_framework)
-    shutil.copytree(static_test_library_framework, dest_test_library_framework)
-    print('Copied Test Library Framework to %s' % dest_test_library_framework)
+    log('Copying Test Library Framework to %s' % dest_test_library_framework)
+    if sync_tree(static_test_library_framework, dest_test_library_framework):
+        log('Copied Test Library Framework to %s' % dest_test_library_framework)
+    else:
+        log('Test Library Framework unchanged, keeping %s' % dest_test_library_framework)
 
 def build_ios_core_scripts():
     """Build AdjustSdk.xcframework using repo-provided bash scripts.
@@ -315,16 +589,16 @@ def build_ios_core_scripts():
     """
     ensure_paths()
     if not os.path.isdir(IOS_SDK_ROOT):
-        print('Skipping iOS build (scripts): iOS SDK not found at %s' % IOS_SDK_ROOT)
+        log('Skipping iOS build (scripts): iOS SDK not found at %s' % IOS_SDK_ROOT)
         return
 
     # Execute the framework build script for dynamic xcframework (iOS + tvOS)
     # Script expects to be run from ios_sdk root directory
-    print('Before build_frameworks.sh')
+    log('Before build_frameworks.sh')
     env = os.environ.copy()
     env['SDK_CODE_SIGN_IDENTITY'] = '-'
     code = run(['bash', './scripts/build_frameworks.sh', '-xd', '-ios'], cwd=IOS_SDK_ROOT, env=env, check=False)
-    print('After build_frameworks.sh (exit code: %s)' % code)
+    log('After build_frameworks.sh (exit code: %s)' % code)
 
     dynamic_out = os.path.join(
         IOS_SDK_ROOT,
@@ -338,14 +612,14 @@ def build_ios_core_scripts():
         produced_xcframework = dynamic_out
 
     if not produced_xcframework:
-        print('Failed to locate produced AdjustSdk.xcframework under sdk_distribution')
+        log('Failed to locate produced AdjustSdk.xcframework under sdk_distribution')
         sys.exit(1)
 
     dest_xcframework = os.path.join(IOS_BINDING_DIR, 'AdjustSdk.xcframework')
-    if os.path.isdir(dest_xcframework):
-        shutil.rmtree(dest_xcframework)
-    shutil.copytree(produced_xcframework, dest_xcframework)
-    print('Copied XCFramework to %s' % dest_xcframework)
+    if sync_tree(produced_xcframework, dest_xcframework):
+        log('Copied XCFramework to %s' % dest_xcframework)
+    else:
+        log('XCFramework unchanged, keeping %s' % dest_xcframework)
 
 def main(argv=None):
     common = argparse.ArgumentParser(add_help=False)
@@ -357,6 +631,20 @@ def main(argv=None):
         help='Which targets (can specify multiple)'
     )
 
+    common.add_argument(
+        '--batch-gradle',
+        action='store_true',
+        default=False,
+        help='Build all requested Android AARs in one Gradle invocation on a warm daemon'
+    )
+
+    common.add_argument(
+        '--sequential',
+        action='store_true',
+        default=False,
+        help='Run the Android and iOS pipelines one after the other instead of concurrently'
+    )
+
     parser = argparse.ArgumentParser(description='Build SDK libraries for MAUI bindings')
     sub = parser.add_subparsers(dest='command')
     sub.add_parser('build', help='Build specified targets', parents=[common])
@@ -372,7 +660,7 @@ def main(argv=None):
     targets = args.targets
 
     if args.command == 'build':
-        build_libs(targets)
+        return build_libs(targets, args.batch_gradle, args.sequential)
 
     return 0
 